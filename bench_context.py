@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark del contexto de infraestructura enviado al LLM
+
+Compara el formato anterior (primeros 10 composes en orden arbitrario)
+con ContextBuilder sobre una flota simulada y un conjunto fijo de
+preguntas. Para cada pregunta mide:
+
+- tokens estimados del contexto (prefill que aporta el contexto)
+- si el compose por el que se pregunta está en el contexto
+
+Con ``--live`` además envía cada pregunta a GPT-OSS y comprueba que la
+respuesta mencione el compose esperado, informando los tokens de prompt
+que reporta el servidor.
+
+Uso:
+    python bench_context.py [--composes 150] [--budget 600] [--live]
+"""
+import argparse
+import asyncio
+import random
+from collections import Counter
+from typing import Dict, List
+
+from src.llm.context_builder import ContextBuilder, estimate_tokens
+
+QUESTIONS = [
+    ("¿Qué le pasa a billing-api?", "billing-api"),
+    ("¿Por qué falla el worker de notificaciones?", "notifications-worker"),
+    ("¿Está corriendo grafana?", "grafana"),
+    ("¿Qué composes están con error?", "billing-api"),
+    ("¿Qué cambió en la última hora?", "search-indexer"),
+    ("Dame el estado de keycloak en el proyecto Auth", "keycloak"),
+]
+
+KNOWN = [
+    ("billing-api", "Pagos", "error"),
+    ("notifications-worker", "Mensajería", "error"),
+    ("grafana", "Observabilidad", "done"),
+    ("search-indexer", "Búsqueda", "running"),
+    ("keycloak", "Auth", "done"),
+]
+
+
+def build_fleet(size: int) -> List[Dict]:
+    rng = random.Random(42)
+    fleet = [
+        {
+            "composeId": f"c{i}",
+            "name": f"service-{i:03d}",
+            "project_name": f"Proyecto {i % 12}",
+            "composeStatus": rng.choice(["done"] * 8 + ["idle"])
+        }
+        for i in range(size - len(KNOWN))
+    ]
+    for i, (name, project, status) in enumerate(KNOWN):
+        fleet.append({
+            "composeId": f"k{i}",
+            "name": name,
+            "project_name": project,
+            "composeStatus": status
+        })
+    rng.shuffle(fleet)
+    return fleet
+
+
+def legacy_format_context(context: Dict) -> str:
+    """Formato anterior: primeros 10 composes, sin ordenar"""
+    composes = context["composes"]
+    parts = [f"Composes disponibles: {len(composes)}", "\nComposes activos:"]
+    for compose in composes[:10]:
+        parts.append(f"  - {compose['name']} ({compose['project_name']}): {compose['composeStatus']}")
+    if len(composes) > 10:
+        parts.append(f"  ... y {len(composes) - 10} más")
+    stats = context["stats"]
+    parts.append("\nEstadísticas:")
+    parts.append(f"  Total composes: {stats['total_composes']}")
+    parts.append("  Distribución:")
+    for status, count in stats["status_distribution"].items():
+        parts.append(f"    - {status}: {count}")
+    return "\n".join(parts)
+
+
+async def ask_live(questions, context, budget: int) -> None:
+    from src.llm.gpt_oss_client import GPTOSSClient
+    from src.llm.response_cache import ResponseCache
+
+    for label in ("anterior", "builder"):
+        client = GPTOSSClient(cache=ResponseCache(max_entries=0))
+        if label == "anterior":
+            client._format_context = lambda ctx, question="": legacy_format_context(ctx)
+        else:
+            client.context_builder = ContextBuilder(token_budget=budget)
+
+        hits = 0
+        for question, expected in questions:
+            answer = await client.ask(question, context=context)
+            hits += expected in answer.lower()
+        print(f"  {label:9s} respuestas que mencionan el compose esperado: {hits}/{len(questions)}, "
+              f"tokens de prompt promedio: {client.stats()['prompt_tokens_avg']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--composes", type=int, default=150)
+    parser.add_argument("--budget", type=int, default=600)
+    parser.add_argument("--live", action="store_true", help="Consultar al modelo real")
+    args = parser.parse_args()
+
+    fleet = build_fleet(args.composes)
+    context = {
+        "composes": fleet,
+        "stats": {
+            "total_composes": len(fleet),
+            "status_distribution": dict(Counter(c["composeStatus"] for c in fleet))
+        },
+        "recent_changes": {"k3": 300.0}
+    }
+    builder = ContextBuilder(token_budget=args.budget)
+
+    print(f"Flota: {len(fleet)} composes, presupuesto {args.budget} tokens\n")
+    print(f"{'pregunta':50s} {'tok ant':>8s} {'tok new':>8s} {'ant':>4s} {'new':>4s}")
+
+    totals = Counter()
+    legacy = legacy_format_context(context)
+    for question, expected in QUESTIONS:
+        text = builder.build(question, context)
+        legacy_hit = expected in legacy
+        new_hit = expected in text
+        totals.update({
+            "legacy_tokens": estimate_tokens(legacy),
+            "new_tokens": estimate_tokens(text),
+            "legacy_hits": legacy_hit,
+            "new_hits": new_hit
+        })
+        print(f"{question[:50]:50s} {estimate_tokens(legacy):8d} {estimate_tokens(text):8d} "
+              f"{'sí' if legacy_hit else 'no':>4s} {'sí' if new_hit else 'no':>4s}")
+
+    n = len(QUESTIONS)
+    print(f"\nTokens de contexto promedio: anterior {totals['legacy_tokens'] / n:.0f}, "
+          f"builder {totals['new_tokens'] / n:.0f}")
+    print(f"Compose relevante presente: anterior {totals['legacy_hits']}/{n}, "
+          f"builder {totals['new_hits']}/{n}")
+
+    if args.live:
+        print("\nConsultando al modelo...")
+        asyncio.run(ask_live(QUESTIONS, context, args.budget))
+
+
+if __name__ == "__main__":
+    main()
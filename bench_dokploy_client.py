@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark del cliente Dokploy contra un servidor HTTP local simulado
+
+Compara una sesión aiohttp nueva por petición (comportamiento anterior)
+con la sesión compartida y el pool keep-alive de DokployClient.
+
+Uso:
+    python bench_dokploy_client.py [--requests 2000] [--concurrency 20]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import Awaitable, Callable, List
+
+import aiohttp
+from aiohttp import web
+
+os.environ.setdefault("DOKPLOY_API_KEY", "bench")
+
+from src.integrations.dokploy_client import DokployClient
+
+PROJECTS = [
+    {
+        "projectId": f"p{i}",
+        "name": f"Proyecto {i}",
+        "environments": [
+            {
+                "environmentId": f"e{i}",
+                "name": "production",
+                "compose": [
+                    {"composeId": f"c{i}-{j}", "name": f"compose-{i}-{j}", "composeStatus": "done"}
+                    for j in range(5)
+                ]
+            }
+        ]
+    }
+    for i in range(6)
+]
+
+
+async def start_stub_server() -> web.AppRunner:
+    """Levanta un servidor que imita /project.all en un puerto libre"""
+    async def project_all(request: web.Request) -> web.Response:
+        return web.json_response(PROJECTS)
+
+    app = web.Application()
+    app.router.add_get("/api/project.all", project_all)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner
+
+
+async def run_load(
+    call: Callable[[], Awaitable],
+    total: int,
+    concurrency: int
+) -> List[float]:
+    """Ejecuta `total` llamadas con `concurrency` workers y devuelve latencias"""
+    latencies: List[float] = []
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+def report(label: str, latencies: List[float], elapsed: float):
+    """Imprime req/s y percentiles de latencia"""
+    ordered = sorted(latencies)
+    p50 = statistics.median(ordered) * 1000
+    p99 = ordered[int(len(ordered) * 0.99) - 1] * 1000
+    rps = len(ordered) / elapsed
+    print(f"  {label:<22} {rps:>9.0f} req/s   p50 {p50:6.2f} ms   p99 {p99:6.2f} ms")
+
+
+async def main(total: int, concurrency: int):
+    runner = await start_stub_server()
+    port = runner.addresses[0][1]
+    base_url = f"http://127.0.0.1:{port}/api"
+    os.environ["DOKPLOY_API_URL"] = base_url
+
+    print(f"🏁 Benchmark DokployClient ({total} peticiones, concurrencia {concurrency})\n")
+
+    # Antes: una ClientSession nueva por petición
+    headers = {"x-api-key": "bench", "Accept": "application/json"}
+
+    async def per_request_session():
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{base_url}/project.all", headers=headers) as response:
+                response.raise_for_status()
+                return await response.json()
+
+    start = time.perf_counter()
+    latencies = await run_load(per_request_session, total, concurrency)
+    report("sesión por petición", latencies, time.perf_counter() - start)
+
+    # Después: sesión compartida con pool keep-alive
+    async with DokployClient() as client:
+        start = time.perf_counter()
+        latencies = await run_load(client.get_all_projects, total, concurrency)
+        report("sesión compartida", latencies, time.perf_counter() - start)
+
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.requests, args.concurrency))
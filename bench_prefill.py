@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark de prefill contra Ollama: layout anterior vs layout actual
+
+Layout anterior: [system prompt, system(contexto), usuario(pregunta)]
+Layout actual:   [system prompt, usuario(contexto + pregunta)]
+
+Envía una serie de preguntas con un estado de infraestructura que va
+cambiando entre llamadas (como en producción) y lee de la API nativa de
+Ollama cuántos tokens de prompt tuvo que evaluar cada petición y cuánto
+tardó (prompt_eval_count / prompt_eval_duration). Los tokens que Ollama
+reutiliza de su KV cache no se cuentan como evaluados.
+
+Sin servidor disponible (o con --offline) solo informa cuántos caracteres
+del prompt comparten dos llamadas consecutivas en cada layout.
+
+Uso:
+    python bench_prefill.py [--requests 20] [--composes 80] [--offline]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+from collections import Counter
+from typing import Dict, List
+
+import aiohttp
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from src.llm.gpt_oss_client import GPTOSSClient
+from src.llm.response_cache import ResponseCache
+
+QUESTIONS = [
+    "¿Qué composes tienen problemas?",
+    "¿Está todo funcionando?",
+    "¿Qué le pasa a service-007?",
+    "Resume el estado de la infraestructura",
+    "¿Cuántos composes hay en error?",
+]
+
+ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+
+def legacy_messages(client: GPTOSSClient, question: str, context_text: str) -> List[BaseMessage]:
+    """Layout anterior: el contexto como segundo mensaje de sistema"""
+    return [
+        SystemMessage(content=client.system_prompt),
+        SystemMessage(content=f"Contexto actual:\n{context_text}"),
+        HumanMessage(content=question),
+    ]
+
+
+def to_ollama(messages: List[BaseMessage]) -> List[Dict]:
+    return [{"role": ROLES[m.type], "content": m.content} for m in messages]
+
+
+def render(messages: List[BaseMessage]) -> str:
+    return "".join(f"<{m.type}>{m.content}" for m in messages)
+
+
+def common_prefix(a: str, b: str) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+def contexts(client: GPTOSSClient, count: int, size: int):
+    """Contextos sucesivos: en cada paso un compose cambia de estado"""
+    rng = random.Random(7)
+    fleet = [
+        {"composeId": f"c{i}", "name": f"service-{i:03d}",
+         "project_name": f"Proyecto {i % 8}", "composeStatus": "done"}
+        for i in range(size)
+    ]
+    for step in range(count):
+        flipped = rng.choice(fleet)
+        flipped["composeStatus"] = "error" if flipped["composeStatus"] == "done" else "done"
+        context = {
+            "composes": fleet,
+            "stats": {
+                "total_composes": size,
+                "status_distribution": dict(Counter(c["composeStatus"] for c in fleet))
+            },
+            "recent_changes": {flipped["composeId"]: 30.0}
+        }
+        question = QUESTIONS[step % len(QUESTIONS)]
+        yield question, client._format_context(context, question)
+
+
+async def measure(session, client: GPTOSSClient, messages: List[BaseMessage]) -> Dict:
+    payload = {
+        "model": client.model_name,
+        "messages": to_ollama(messages),
+        "stream": False,
+        "options": {"num_predict": 1}
+    }
+    if client.keep_alive:
+        payload["keep_alive"] = client.keep_alive
+    async with session.post(f"{client.ollama_url}/api/chat", json=payload) as response:
+        response.raise_for_status()
+        return await response.json()
+
+
+async def run_live(client: GPTOSSClient, samples, builders) -> None:
+    timeout = aiohttp.ClientTimeout(total=600)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        await client.warmup()
+        for label, build in builders:
+            tokens, millis = [], []
+            for question, context_text in samples:
+                data = await measure(session, client, build(question, context_text))
+                tokens.append(data.get("prompt_eval_count", 0))
+                millis.append(data.get("prompt_eval_duration", 0) / 1e6)
+            print(f"{label:9s} tokens evaluados: media {statistics.mean(tokens):7.1f}  "
+                  f"prefill: media {statistics.mean(millis):8.1f} ms  "
+                  f"p50 {statistics.median(millis):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--composes", type=int, default=80)
+    parser.add_argument("--offline", action="store_true", help="No consultar a Ollama")
+    args = parser.parse_args()
+
+    client = GPTOSSClient(cache=ResponseCache(max_entries=0))
+    samples = list(contexts(client, args.requests, args.composes))
+    builders = [
+        ("anterior", lambda q, ctx: legacy_messages(client, q, ctx)),
+        ("actual", client._build_messages),
+    ]
+
+    print(f"{args.requests} peticiones, {args.composes} composes\n")
+    for label, build in builders:
+        rendered = [render(build(q, ctx)) for q, ctx in samples]
+        shared = [common_prefix(a, b) for a, b in zip(rendered, rendered[1:])]
+        print(f"{label:9s} prefijo compartido entre llamadas consecutivas: "
+              f"media {statistics.mean(shared):.0f} de {statistics.mean(map(len, rendered)):.0f} caracteres")
+
+    if args.offline:
+        return
+
+    print(f"\nOllama en {client.ollama_url} ({client.model_name})")
+    try:
+        asyncio.run(run_live(client, samples, builders))
+    except aiohttp.ClientError as e:
+        print(f"No se pudo consultar a Ollama: {e}")
+
+
+if __name__ == "__main__":
+    main()
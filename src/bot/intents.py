@@ -0,0 +1,224 @@
+"""
+Router de intenciones: respuestas directas sin pasar por el LLM
+
+Muchas preguntas del chat son consultas simples sobre el estado ("¿cuántos
+composes tengo?", "¿cuáles están fallando?", "estado de granada") que se
+responden con el estado en memoria del monitor en milisegundos. El router
+reconoce esas intenciones con reglas y solo deja pasar al LLM lo demás.
+
+Intenciones:
+    - ``count``: cuántos composes (o proyectos) hay, opcionalmente por estado
+    - ``list``: cuáles composes hay, opcionalmente por estado
+    - ``status``: estado de un compose nombrado en el mensaje
+
+``count`` y ``list`` exigen que el mensaje hable del inventario propio
+("tengo", "mis", "hay", "están", "my", "I have", "los composes"), aunque
+filtre por estado: "¿qué servicios necesito para...?", "dame un ejemplo de
+compose" o "¿qué pasa si un compose está en error?" son preguntas
+generales y van al LLM.
+
+Las preguntas abiertas ("¿por qué...?", "¿cómo arreglo...?", "explica...")
+y las que mencionan un compose sin preguntar por su estado siempre pasan
+al LLM.
+"""
+import re
+import time
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional
+
+from ..llm.response_cache import normalize_question
+
+# Sinónimos -> composeStatus de Dokploy
+STATUS_WORDS = {
+    "error": ("error", "errores", "fallando", "fallan", "falla", "fallidos", "caido", "caidos",
+              "roto", "rotos", "failing", "failed", "down", "broken"),
+    "done": ("activo", "activos", "funcionando", "levantados", "arriba", "desplegados",
+             "healthy", "up", "ok"),
+    "running": ("desplegando", "desplegandose", "deployando", "deploying", "en deploy"),
+    "idle": ("detenido", "detenidos", "parado", "parados", "inactivo", "inactivos",
+             "idle", "stopped"),
+}
+
+STATUS_LABELS = {"error": "con error", "done": "activos", "running": "desplegándose", "idle": "detenidos"}
+STATUS_ICONS = {"done": "✅", "error": "❌", "running": "🔄", "idle": "⏸️"}
+
+_OPEN_ENDED = re.compile(
+    r"\b(por que|porque|why|como(?! (esta|estan|va|van)\b)|explica|explain|"
+    r"que significa|que es|que hace|que hago|que pasa|forma de|puede|pueden|"
+    r"what is|what does|diferencia|difference|deberia|should|"
+    r"recomienda|how (do|can|to))\b"
+)
+_COUNT = re.compile(r"\b(cuantos|cuantas|how many|numero de|cantidad de)\b")
+_LIST = re.compile(r"\b(cuales|que|which|lista|listar|list|muestrame|mostrar|dame|show)\b")
+_STATUS = re.compile(
+    r"\b(estado|status|como esta|como va|how is|esta (corriendo|funcionando|caido|arriba|activo))\b"
+)
+_COMPOSE_NOUN = re.compile(r"\b(composes?|servicios?|apps?|aplicaciones|stacks?|ones)\b")
+_PROJECT_NOUN = re.compile(r"\b(proyectos?|projects?)\b")
+# El mensaje se refiere a los composes del usuario y no a composes en general
+_INVENTORY = re.compile(
+    r"\b(tengo|tienes|tenemos|mis|hay|existen|estan|my|our|i have|we have|there are|are there)\b|"
+    r"\b(los|las|todos|all|the)\s+(composes|servicios|services|apps|aplicaciones|stacks|proyectos|projects)\b"
+)
+
+# Máximo de composes listados en una respuesta
+MAX_LISTED = 30
+
+
+class Intent(NamedTuple):
+    name: str
+    status: Optional[str] = None
+    compose: Optional[Dict] = None
+
+
+def _format_age(seconds: float) -> str:
+    if seconds < 60:
+        return f"{int(seconds)}s"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} min"
+    return f"{int(seconds // 3600)} h"
+
+
+class IntentRouter:
+    """Clasifica mensajes y responde los factuales desde el estado en memoria"""
+
+    def __init__(self):
+        self.messages = 0
+        self.answered = Counter()
+        self.total_ms = 0.0
+
+    def classify(self, text: str, composes: List[Dict]) -> Optional[Intent]:
+        """Intención del mensaje, o None si debe responderlo el LLM"""
+        normalized = normalize_question(text)
+        if not normalized or _OPEN_ENDED.search(normalized):
+            return None
+
+        status = self._status_filter(normalized)
+        inventory = bool(_INVENTORY.search(normalized))
+
+        compose = self._find_compose(normalized, composes)
+        if compose is not None:
+            if _STATUS.search(normalized) or normalized.startswith("esta "):
+                return Intent("status", compose=compose)
+            # Preguntas sobre un compose concreto que no son de estado: al LLM
+            return None
+
+        if _COUNT.search(normalized):
+            if _PROJECT_NOUN.search(normalized) and inventory:
+                return Intent("count_projects")
+            if inventory and (status or _COMPOSE_NOUN.search(normalized)):
+                return Intent("count", status=status)
+
+        if inventory and _LIST.search(normalized) and _COMPOSE_NOUN.search(normalized):
+            return Intent("list", status=status)
+
+        return None
+
+    @staticmethod
+    def _status_filter(normalized: str) -> Optional[str]:
+        for status, words in STATUS_WORDS.items():
+            for word in words:
+                if re.search(rf"\b{word}\b", normalized):
+                    return status
+        return None
+
+    @staticmethod
+    def _find_compose(normalized: str, composes: List[Dict]) -> Optional[Dict]:
+        """Compose nombrado en el mensaje (el nombre más largo que aparezca)"""
+        best, best_len = None, 0
+        for compose in composes:
+            for field in ("name", "appName"):
+                name = normalize_question(compose.get(field) or "")
+                if len(name) < 3 or len(name) <= best_len:
+                    continue
+                if re.search(rf"(?<![\w-]){re.escape(name)}(?![\w-])", normalized):
+                    best, best_len = compose, len(name)
+        return best
+
+    def route(
+        self,
+        text: str,
+        composes: List[Dict],
+        recent_changes: Optional[Dict[str, float]] = None
+    ) -> Optional[str]:
+        """
+        Responde el mensaje si es una consulta factual
+
+        Returns:
+            Texto de la respuesta, o None si debe pasar al LLM
+        """
+        started = time.perf_counter()
+        self.messages += 1
+
+        intent = self.classify(text, composes)
+        if intent is None:
+            return None
+
+        if intent.name == "status":
+            answer = self._answer_status(intent.compose, recent_changes or {})
+        elif intent.name == "count_projects":
+            answer = self._answer_count_projects(composes)
+        elif intent.name == "count":
+            answer = self._answer_count(composes, intent.status)
+        else:
+            answer = self._answer_list(composes, intent.status)
+
+        self.answered[intent.name] += 1
+        self.total_ms += (time.perf_counter() - started) * 1000
+        return answer
+
+    @staticmethod
+    def _answer_status(compose: Dict, recent_changes: Dict[str, float]) -> str:
+        status = compose.get("composeStatus", "unknown")
+        lines = [
+            f"{STATUS_ICONS.get(status, '❔')} {compose.get('name', 'Unknown')} "
+            f"({compose.get('project_name', 'Unknown')}): {status}",
+            f"ID: {compose.get('composeId')}"
+        ]
+        age = recent_changes.get(compose.get("composeId"))
+        if age is not None:
+            lines.append(f"Último cambio hace {_format_age(age)}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _answer_count(composes: List[Dict], status: Optional[str]) -> str:
+        if status is None:
+            distribution = Counter(c.get("composeStatus", "unknown") for c in composes)
+            detail = ", ".join(
+                f"{STATUS_ICONS.get(s, '❔')} {s}: {n}" for s, n in distribution.most_common()
+            )
+            return f"📦 Tienes {len(composes)} composes" + (f"\n{detail}" if detail else "")
+
+        count = sum(1 for c in composes if c.get("composeStatus") == status)
+        return f"{STATUS_ICONS.get(status, '📦')} {count} de {len(composes)} composes {STATUS_LABELS[status]}"
+
+    @staticmethod
+    def _answer_count_projects(composes: List[Dict]) -> str:
+        projects = Counter(c.get("project_name", "Unknown") for c in composes)
+        return f"📁 Tienes {len(projects)} proyectos con {len(composes)} composes"
+
+    @staticmethod
+    def _answer_list(composes: List[Dict], status: Optional[str]) -> str:
+        selected = [c for c in composes if status is None or c.get("composeStatus") == status]
+        if not selected:
+            return f"✅ No hay composes {STATUS_LABELS[status]}" if status else "No se encontraron composes."
+
+        selected.sort(key=lambda c: (c.get("project_name") or "", c.get("name") or ""))
+        title = f"composes {STATUS_LABELS[status]}" if status else "composes"
+        lines = [f"📦 {len(selected)} {title}:"]
+        for compose in selected[:MAX_LISTED]:
+            icon = STATUS_ICONS.get(compose.get("composeStatus"), "❔")
+            lines.append(f"{icon} {compose.get('name', 'Unknown')} ({compose.get('project_name', 'Unknown')})")
+        if len(selected) > MAX_LISTED:
+            lines.append(f"... y {len(selected) - MAX_LISTED} más (usa /composes para verlos todos)")
+        return "\n".join(lines)
+
+    def stats(self) -> Dict:
+        answered = sum(self.answered.values())
+        return {
+            "messages": self.messages,
+            "answered": answered,
+            "short_circuit_rate": round(answered / self.messages, 3) if self.messages else None,
+            "by_intent": dict(self.answered),
+            "avg_ms": round(self.total_ms / answered, 2) if answered else None
+        }
@@ -0,0 +1,190 @@
+"""
+Respuestas progresivas en Telegram a partir de un stream de texto
+
+``StreamingReply`` publica un mensaje provisional y lo va editando a medida
+que llegan fragmentos del modelo. El primer fragmento se muestra enseguida;
+después las ediciones se espacian al menos ``edit_interval`` segundos para
+no chocar con los límites de Telegram, y el texto que queda pendiente se
+publica al vencer el intervalo aunque el modelo no mande más. Cuando el
+texto supera el máximo de un mensaje se cierra el actual y la respuesta
+continúa en un mensaje nuevo.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import AsyncIterator, List, Optional
+
+from telegram import Message
+from telegram.error import BadRequest, RetryAfter
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_MAX_LENGTH = 4096
+DEFAULT_EDIT_INTERVAL = 1.0  # segundos
+DEFAULT_PLACEHOLDER = "💭 Pensando..."
+CURSOR = " ▌"
+
+
+class StreamingReply:
+    """Respuesta de Telegram que se actualiza mientras se genera"""
+
+    def __init__(
+        self,
+        message: Message,
+        edit_interval: Optional[float] = None,
+        max_length: int = TELEGRAM_MAX_LENGTH,
+        placeholder: str = DEFAULT_PLACEHOLDER
+    ):
+        """
+        Args:
+            message: Mensaje del usuario al que se responde
+            edit_interval: Segundos mínimos entre ediciones
+                (TELEGRAM_STREAM_EDIT_INTERVAL)
+            max_length: Máximo de caracteres por mensaje
+            placeholder: Texto del mensaje provisional
+        """
+        self.message = message
+        self.edit_interval = edit_interval or float(
+            os.getenv("TELEGRAM_STREAM_EDIT_INTERVAL", DEFAULT_EDIT_INTERVAL)
+        )
+        self.max_length = max_length
+        self.placeholder = placeholder
+
+        self.messages: List[Message] = []
+        self._text = ""  # texto del mensaje actual
+        self._shown = ""  # último texto enviado a Telegram
+        self._last_edit = 0.0
+        # Serializa las ediciones del stream y las del volcado diferido
+        self._lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self.started_at: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+        self.edits = 0
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        """Segundos hasta que el primer fragmento fue visible para el usuario"""
+        if self.started_at is None or self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    async def run(self, chunks: AsyncIterator[str]) -> str:
+        """
+        Consume el stream completo actualizando la respuesta
+
+        Returns:
+            Texto completo de la respuesta
+        """
+        full = []
+        await self.start()
+        async for chunk in chunks:
+            full.append(chunk)
+            await self.write(chunk)
+        await self.finish()
+        return "".join(full)
+
+    async def start(self):
+        """Envía el mensaje provisional"""
+        self.started_at = time.monotonic()
+        self.messages.append(await self.message.reply_text(self.placeholder))
+
+    async def write(self, chunk: str):
+        """Agrega un fragmento y edita el mensaje si toca"""
+        async with self._lock:
+            await self._write(chunk)
+
+    async def _write(self, chunk: str):
+        self._text += chunk
+
+        # Espacio reservado para el cursor mientras se sigue generando
+        limit = self.max_length - len(CURSOR)
+        while len(self._text) > limit:
+            cut = _split_point(self._text, limit)
+            head, self._text = self._text[:cut].rstrip(), self._text[cut:].lstrip()
+            await self._edit(head)
+            self.messages.append(await self.message.reply_text(self.placeholder))
+            self._shown = ""
+
+        if not self._text.strip():
+            return
+        if self.first_token_at is None or time.monotonic() - self._last_edit >= self.edit_interval:
+            await self._edit(self._text + CURSOR)
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_pending())
+
+    async def _flush_pending(self):
+        """Publica el texto pendiente al vencer el intervalo aunque no lleguen más fragmentos"""
+        while True:
+            delay = self._last_edit + self.edit_interval - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        async with self._lock:
+            if self._text.strip():
+                await self._edit(self._text + CURSOR)
+
+    async def _stop_flush(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+
+    async def set_placeholder(self, text: str):
+        """Cambia el texto provisional mientras no haya llegado respuesta"""
+        async with self._lock:
+            if self.messages and not self._text and len(self.messages) == 1:
+                await self._edit(text, content=False)
+
+    async def cancel(self, note: str):
+        """Cierra la respuesta con una nota (p. ej. al ser reemplazada)"""
+        await self._stop_flush()
+        if not self.messages:
+            return
+        async with self._lock:
+            text = self._text.strip()
+            await self._edit(f"{text}\n\n{note}" if text else note, content=False)
+
+    async def finish(self):
+        """Deja el texto final sin cursor"""
+        await self._stop_flush()
+        if self.started_at is None:
+            await self.start()
+        async with self._lock:
+            await self._edit(self._text.strip() or "🤷 Sin respuesta del modelo")
+
+    async def _edit(self, text: str, content: bool = True):
+        if text == self._shown:
+            return
+
+        try:
+            await self.messages[-1].edit_text(text)
+        except RetryAfter as e:
+            logger.warning(f"Límite de ediciones de Telegram, esperando {e.retry_after}s")
+            await asyncio.sleep(_seconds(e.retry_after))
+            await self.messages[-1].edit_text(text)
+        except BadRequest as e:
+            # "Message is not modified" no es un error real
+            if "not modified" not in str(e).lower():
+                raise
+
+        self._shown = text
+        self._last_edit = time.monotonic()
+        self.edits += 1
+        if content and self.first_token_at is None:
+            self.first_token_at = self._last_edit
+
+
+def _split_point(text: str, limit: int) -> int:
+    """Posición de corte <= limit, preferentemente en un salto de línea o espacio"""
+    for separator in ("\n\n", "\n", " "):
+        index = text.rfind(separator, limit // 2, limit)
+        if index > 0:
+            return index
+    return limit
+
+
+def _seconds(value) -> float:
+    # retry_after es int o timedelta según la versión de python-telegram-bot
+    return value.total_seconds() if hasattr(value, "total_seconds") else float(value)
@@ -4,8 +4,10 @@ Telegram Bot para InfraGuardian AI
 Bot para monitoreo y gestión de infraestructura Dokploy
 """
 import os
+import time
+import asyncio
 import logging
-from typing import Optional
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
 from telegram import Update
@@ -17,8 +19,24 @@ from telegram.ext import (
     filters
 )
 
+from .intents import IntentRouter
+from .streaming import StreamingReply
 from ..integrations.dokploy_client import DokployClient
 from ..llm.gpt_oss_client import GPTOSSClient
+from ..llm.agent import DokployToolkit
+from ..llm.knowledge_base import KnowledgeBase
+from ..monitor.service_monitor import ServiceMonitor
+from ..monitor.dispatcher import TelegramSink
+from ..monitor.alerts import AlertAggregator
+from ..monitor.history import HistoryStore
+from ..monitor.analytics import UptimeAnalytics, format_duration
+from ..monitor.logs import LogCollector
+from ..monitor.metrics import MetricsCollector
+from ..monitor.anomaly import AnomalyDetector
+from ..monitor.deploy_tracker import DeployTracker
+from ..monitor.bulk import ACTIONS as BULK_ACTIONS, BulkExecutor, select_composes
+from ..monitor.remediation import RemediationEngine
+from ..monitor.incidents import IncidentRecorder
 
 # Cargar variables de entorno
 load_dotenv()
@@ -30,6 +48,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Ventana máxima de /uptime en días
+MAX_UPTIME_DAYS = 90
+
+
+def parse_chat_ids(raw: str) -> List[int]:
+    """IDs de chat separados por comas; los que no son números se ignoran"""
+    chat_ids = []
+    for chat_id in raw.split(","):
+        chat_id = chat_id.strip()
+        if not chat_id:
+            continue
+        try:
+            chat_ids.append(int(chat_id))
+        except ValueError:
+            logger.warning(f"⚠️ ID de chat inválido en TELEGRAM_ALERT_CHAT_IDS: {chat_id!r}")
+    return chat_ids
+
 
 class InfraGuardianBot:
     """Bot de Telegram para gestión de Dokploy"""
@@ -40,10 +75,114 @@ class InfraGuardianBot:
             raise ValueError("TELEGRAM_BOT_TOKEN no configurado en .env")
 
         self.dokploy = DokployClient()
-        self.gpt_oss = GPTOSSClient()
-        self.app = Application.builder().token(self.token).build()
+        # Runbooks e incidentes resueltos para enriquecer los análisis
+        self.knowledge = (
+            KnowledgeBase() if os.getenv("KB_ENABLED", "true").lower() == "true" else None
+        )
+        self.gpt_oss = GPTOSSClient(knowledge=self.knowledge)
+        self.history = HistoryStore()
+        self.analytics = UptimeAnalytics(self.history)
+        # CPU/memoria/red/disco de los contenedores vía Docker (opcional)
+        self.metrics = (
+            MetricsCollector() if os.getenv("METRICS_ENABLED", "false").lower() == "true" else None
+        )
+        self.monitor = ServiceMonitor(
+            dokploy_client=self.dokploy,
+            check_interval=int(os.getenv("MONITOR_INTERVAL", 60)),
+            history=self.history,
+            metrics=self.metrics,
+            anomalies=(
+                AnomalyDetector() if os.getenv("ANOMALY_ENABLED", "true").lower() == "true" else None
+            )
+        )
+
+        # Espera el resultado real de /deploy, /start_compose y /stop_compose
+        self.deploy_tracker = DeployTracker(self.dokploy)
+        # Operaciones en lote (/deploy_project, /restart_unhealthy, /bulk)
+        self.bulk = BulkExecutor(self.dokploy, self.deploy_tracker)
+        self.bulk_edit_interval = float(os.getenv("BULK_EDIT_INTERVAL", 3))
+
+        # Acciones automáticas (restart/redeploy) según config/remediation.yaml
+        self.remediation = (
+            RemediationEngine(self.dokploy)
+            if os.getenv("REMEDIATION_ENABLED", "false").lower() == "true" else None
+        )
+
+        # Logs de contenedores vía Docker; LOG_FOLLOW=true los sigue en streaming
+        self.logs = LogCollector()
+        self.follow_logs = os.getenv("LOG_FOLLOW", "false").lower() == "true"
+
+        # Modo agente: el modelo consulta Dokploy con herramientas cuando lo necesita
+        self.agent_mode = os.getenv("LLM_AGENT_MODE", "false").lower() == "true"
+        self.toolkit = DokployToolkit(self.dokploy, resolve=self.monitor.resolve_compose)
+
+        # Respuestas directas (sin LLM) para consultas factuales simples
+        self.intent_router = (
+            IntentRouter() if os.getenv("INTENT_ROUTER_ENABLED", "true").lower() == "true" else None
+        )
+
+        # Chats que reciben las alertas del monitor (separados por comas)
+        self.alert_chat_ids = parse_chat_ids(os.getenv("TELEGRAM_ALERT_CHAT_IDS", ""))
+
+        self.app = (
+            Application.builder()
+            .token(self.token)
+            .concurrent_updates(True)
+            .post_init(self._post_init)
+            .post_shutdown(self._post_shutdown)
+            .build()
+        )
         self._register_handlers()
 
+    async def _post_init(self, application: Application):
+        """Arranca el monitor dentro del ciclo de vida de la aplicación"""
+        if self.alert_chat_ids:
+            telegram = TelegramSink(application.bot, self.alert_chat_ids)
+            self.monitor.dispatcher.add_sink(AlertAggregator(
+                deliver=lambda text: telegram.send({"text": text})
+            ))
+            if self.remediation is not None:
+                self.remediation.notify = lambda text: telegram.send({"text": text})
+        if self.remediation is not None:
+            self.monitor.dispatcher.add_sink(self.remediation)
+        if self.knowledge is not None:
+            self.monitor.dispatcher.add_sink(IncidentRecorder(self.knowledge, get_logs=self._incident_logs))
+
+        await self.monitor.start()
+        if self.follow_logs:
+            await self.logs.start()
+        if self.metrics is not None:
+            await self.metrics.start()
+
+        # Precarga del modelo en segundo plano para no demorar el arranque
+        application.create_task(self.gpt_oss.warmup())
+        if self.knowledge is not None:
+            application.create_task(self._index_knowledge())
+
+    async def _index_knowledge(self):
+        """Indexa los runbooks nuevos o modificados desde el último arranque"""
+        try:
+            await self.knowledge.refresh()
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo indexar la base de conocimiento: {e}")
+
+    async def _incident_logs(self, compose_id: str) -> Optional[str]:
+        """Patrones de error del compose caído para el registro del incidente"""
+        compose = await self._find_compose(compose_id)
+        if compose is None:
+            return None
+        return await self.logs.summarize(compose.get("appName", ""), errors_only=True)
+
+    async def _post_shutdown(self, application: Application):
+        """Libera recursos al detener la aplicación de Telegram"""
+        await self.deploy_tracker.aclose()
+        await self.monitor.aclose()
+        await self.logs.aclose()
+        if self.metrics is not None:
+            await self.metrics.aclose()
+        await self.gpt_oss.aclose()
+        logger.info("🔌 Monitor detenido y sesión HTTP de Dokploy cerrada")
+
     def _register_handlers(self):
         """Registra todos los command handlers"""
         self.app.add_handler(CommandHandler("start", self.start))
@@ -52,9 +191,16 @@ class InfraGuardianBot:
         self.app.add_handler(CommandHandler("composes", self.composes))
         self.app.add_handler(CommandHandler("status", self.status))
         self.app.add_handler(CommandHandler("services", self.services))
+        self.app.add_handler(CommandHandler("uptime", self.uptime))
+        self.app.add_handler(CommandHandler("logs", self.logs_command))
+        self.app.add_handler(CommandHandler("analyze", self.analyze))
         self.app.add_handler(CommandHandler("deploy", self.deploy))
         self.app.add_handler(CommandHandler("start_compose", self.start_compose))
         self.app.add_handler(CommandHandler("stop_compose", self.stop_compose))
+        self.app.add_handler(CommandHandler("deploy_project", self.deploy_project))
+        self.app.add_handler(CommandHandler("restart_unhealthy", self.restart_unhealthy))
+        self.app.add_handler(CommandHandler("bulk", self.bulk_command))
+        self.app.add_handler(CommandHandler("reset", self.reset))
 
         # Handler para mensajes no-comando (conversación con GPT-OSS)
         self.app.add_handler(
@@ -75,12 +221,16 @@ No necesitas usar comandos especiales, solo pregunta naturalmente.
 /composes - Lista todos los composes
 /status <compose_id> - Estado de un compose
 /services <compose_id> - Servicios de un compose
+/uptime [días] - Disponibilidad, MTTR y caídas
+/logs <compose> - Patrones de log y errores
+/analyze <compose> - Diagnóstico con IA usando los logs
 
 🔧 *Comandos de Gestión:*
 /deploy <compose_id> - Deploya un compose
 /start_compose <compose_id> - Inicia un compose
 /stop_compose <compose_id> - Detiene un compose
 
+🧹 /reset - Olvida la conversación actual
 ❓ /help - Ayuda detallada
 
 *Ejemplos de preguntas:*
@@ -114,20 +264,52 @@ No necesitas usar comandos especiales, solo pregunta naturalmente.
   Lista los servicios dentro de un compose
   Ejemplo: `/services abc123`
 
+• `/uptime [días]`
+  Disponibilidad, caídas, MTTR y MTBF por proyecto y compose
+  Ejemplo: `/uptime 30` (por defecto 7 días, máximo 90)
+
+• `/logs <compose>`
+  Resume los logs de los contenedores agrupados en patrones, errores primero
+  Ejemplo: `/logs granada`
+
+• `/analyze <compose>`
+  Diagnóstico con IA a partir del estado, los patrones de error y los runbooks
+  Ejemplo: `/analyze granada`
+
 *Comandos de Gestión:*
 
 • `/deploy <compose_id>`
-  Deploya/redeploya un compose
+  Deploya/redeploya un compose y avisa cuando termina
   Ejemplo: `/deploy abc123`
 
 • `/start_compose <compose_id>`
-  Inicia todos los servicios de un compose
+  Inicia todos los servicios de un compose y espera a que arranquen
   Ejemplo: `/start_compose abc123`
 
 • `/stop_compose <compose_id>`
-  Detiene todos los servicios de un compose
+  Detiene todos los servicios de un compose y espera a que paren
   Ejemplo: `/stop_compose abc123`
 
+*Operaciones en Lote:*
+
+• `/deploy_project <proyecto> [env=<entorno>]`
+  Redeploya todos los composes de un proyecto: bases de datos primero,
+  después APIs y después el resto, varios a la vez
+  Ejemplo: `/deploy_project SaaS RAG env=production`
+
+• `/restart_unhealthy [proyecto]`
+  Reinicia los composes en error
+
+• `/bulk <deploy|start|stop|restart> [project=..] [env=..] [status=..] [name=..]`
+  Acción sobre los composes que cumplen los filtros (admiten comodines)
+  Ejemplo: `/bulk restart project=prod-* status=error`
+
+*Conversación:*
+
+• `/reset`
+  Olvida el historial de la conversación (recuerdo los últimos mensajes
+  para entender preguntas de seguimiento)
+
 💡 Tip: Usa `/composes` para obtener los IDs de tus composes
         """
         await update.message.reply_text(
@@ -168,9 +350,7 @@ No necesitas usar comandos especiales, solo pregunta naturalmente.
     async def composes(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Comando /composes - Lista todos los composes"""
         try:
-            await update.message.reply_text("🔍 Obteniendo composes...")
-
-            composes = await self.dokploy.get_all_composes()
+            composes = await self.monitor.get_composes()
 
             if not composes:
                 await update.message.reply_text("No se encontraron composes.")
@@ -207,9 +387,7 @@ No necesitas usar comandos especiales, solo pregunta naturalmente.
         compose_id = context.args[0]
 
         try:
-            await update.message.reply_text(f"🔍 Obteniendo estado de {compose_id}...")
-
-            health = await self.dokploy.get_compose_health(compose_id)
+            health = await self.monitor.get_compose_status(compose_id)
 
             msg = f"🏥 *Estado del Compose*\n\n"
             msg += f"Nombre: *{health['name']}*\n"
@@ -241,9 +419,7 @@ No necesitas usar comandos especiales, solo pregunta naturalmente.
         compose_id = context.args[0]
 
         try:
-            await update.message.reply_text(f"🔍 Obteniendo servicios...")
-
-            services = await self.dokploy.get_compose_services(compose_id)
+            services = await self.monitor.get_compose_services(compose_id)
 
             if not services:
                 await update.message.reply_text("No se encontraron servicios.")
@@ -261,58 +437,213 @@ No necesitas usar comandos especiales, solo pregunta naturalmente.
             logger.error(f"Error en /services: {e}")
             await update.message.reply_text(f"❌ Error: {str(e)}")
 
-    async def deploy(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Comando /deploy <compose_id> - Deploya un compose"""
-        if not context.args:
+    async def uptime(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /uptime [días] - Disponibilidad y MTTR"""
+        try:
+            days = float(context.args[0]) if context.args else 7
+        except ValueError:
+            days = None
+        # Negar el rango (en lugar de comparar contra los bordes) descarta también nan
+        if days is None or not 0 < days <= MAX_UPTIME_DAYS:
             await update.message.reply_text(
-                "❌ Uso: /deploy <compose_id>\n"
-                "Obtén el ID con /composes"
+                f"❌ Uso: /uptime [días] (entre 0 y {MAX_UPTIME_DAYS})\nEjemplo: /uptime 30"
             )
             return
 
-        compose_id = context.args[0]
-
         try:
-            await update.message.reply_text(f"🚀 Iniciando deploy de {compose_id}...")
+            since = time.time() - days * 86400
+            projects = await self.analytics.project_stats(since)
+            composes = await self.analytics.compose_stats(since)
+
+            if not composes:
+                await update.message.reply_text(
+                    "Todavía no hay historial suficiente para calcular la disponibilidad."
+                )
+                return
+
+            msg = f"📈 *Disponibilidad ({days:g} días)*\n\n*Proyectos:*\n"
+            for project in sorted(projects.values(), key=lambda p: p["uptime_pct"] or 0):
+                msg += (
+                    f"• *{project['name']}*: {project['uptime_pct']}% "
+                    f"({project['failures']} caídas, MTTR {format_duration(project['mttr_s'])})\n"
+                )
+
+            # Los composes con peor disponibilidad primero
+            worst = sorted(composes.values(), key=lambda c: c["uptime_pct"] or 0)[:10]
+            msg += "\n*Composes con menor disponibilidad:*\n"
+            for compose in worst:
+                down = " 🔴" if compose["currently_down"] else ""
+                msg += (
+                    f"• {compose['name']} ({compose['project_name']}): "
+                    f"{compose['uptime_pct']}%{down}\n"
+                    f"  Caídas: {compose['failures']} · "
+                    f"MTTR: {format_duration(compose['mttr_s'])} · "
+                    f"MTBF: {format_duration(compose['mtbf_s'])} · "
+                    f"Peor caída: {format_duration(compose['longest_outage_s'])}\n"
+                )
 
-            result = await self.dokploy.deploy_compose(compose_id)
+            await update.message.reply_text(msg, parse_mode='Markdown')
 
+        except Exception as e:
+            logger.error(f"Error en /uptime: {e}")
+            await update.message.reply_text(f"❌ Error: {str(e)}")
+
+    async def _find_compose(self, reference: str) -> Optional[Dict]:
+        """Compose del estado del monitor por ID o nombre"""
+        compose_id = self.monitor.resolve_compose(reference)
+        for compose in await self.monitor.get_composes():
+            if compose.get("composeId") == compose_id:
+                return compose
+        return None
+
+    async def logs_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /logs <compose> - Patrones de log de un compose"""
+        if not context.args:
             await update.message.reply_text(
-                f"✅ Deploy iniciado correctamente\n"
-                f"ID: `{compose_id}`"
+                "❌ Uso: /logs <compose_id o nombre>\n"
+                "Obtén el ID con /composes"
             )
+            return
+
+        try:
+            compose = await self._find_compose(context.args[0])
+            if compose is None:
+                await update.message.reply_text(f"❌ Compose no encontrado: {context.args[0]}")
+                return
+
+            summary = await self.logs.summarize(compose.get("appName", ""))
+            if not summary:
+                await update.message.reply_text(
+                    f"No se encontraron contenedores de {compose.get('name')} en este host."
+                )
+                return
+
+            await update.message.reply_text(f"📜 Logs de {compose.get('name')}\n\n{summary}"[:4096])
 
         except Exception as e:
-            logger.error(f"Error en /deploy: {e}")
-            await update.message.reply_text(f"❌ Error al deployar: {str(e)}")
+            logger.error(f"Error en /logs: {e}")
+            await update.message.reply_text(f"❌ Error al leer logs: {str(e)}")
 
-    async def start_compose(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Comando /start_compose <compose_id> - Inicia un compose"""
+    async def analyze(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /analyze <compose> - Diagnóstico con IA de un compose"""
         if not context.args:
             await update.message.reply_text(
-                "❌ Uso: /start_compose <compose_id>\n"
+                "❌ Uso: /analyze <compose_id o nombre>\n"
                 "Obtén el ID con /composes"
             )
             return
 
-        compose_id = context.args[0]
+        try:
+            compose = await self._find_compose(context.args[0])
+            if compose is None:
+                await update.message.reply_text(f"❌ Compose no encontrado: {context.args[0]}")
+                return
+
+            message = await update.message.reply_text(f"🔍 Analizando {compose.get('name')}...")
+
+            try:
+                error_logs = await self.logs.summarize(compose.get("appName", ""), errors_only=True)
+            except Exception as e:
+                logger.warning(f"No se pudieron leer los logs de {compose.get('name')}: {e}")
+                error_logs = None
+
+            analysis = await self.gpt_oss.analyze_compose_issue(
+                compose.get("name", "Unknown"),
+                compose.get("composeStatus", "unknown"),
+                error_logs or None
+            )
+            await message.edit_text(analysis[:4096])
+
+        except Exception as e:
+            logger.error(f"Error en /analyze: {e}")
+            await update.message.reply_text(f"❌ Error al analizar: {str(e)}")
+
+    async def _run_tracked(self, update: Update, compose_id: str, action: str, labels: Dict[str, str]):
+        """
+        Lanza una acción sobre un compose y edita el mensaje hasta que termina
+
+        Args:
+            labels: Textos de la acción: "icon", "starting", "running", "done",
+                "failed" y "error"
+        """
+        message = await update.message.reply_text(f"{labels['icon']} {labels['starting']} {compose_id}...")
 
         try:
-            await update.message.reply_text(f"▶️ Iniciando compose {compose_id}...")
+            if action == "deploy":
+                await self.dokploy.deploy_compose(compose_id)
+            elif action == "start":
+                await self.dokploy.start_compose(compose_id)
+            else:
+                await self.dokploy.stop_compose(compose_id)
+        except Exception as e:
+            logger.error(f"Error en /{action}: {e}")
+            await message.edit_text(f"❌ {labels['error']}: {str(e)}")
+            return
+
+        async def on_progress(status: str, elapsed: float):
+            await message.edit_text(
+                f"⏳ {labels['running']}\n"
+                f"ID: `{compose_id}`\n"
+                f"Estado: {status} · {format_duration(elapsed)}"
+            )
 
-            result = await self.dokploy.start_compose(compose_id)
+        try:
+            result = await self.deploy_tracker.track(compose_id, action, on_progress)
+        except Exception as e:
+            logger.error(f"Error siguiendo /{action} de {compose_id}: {e}")
+            await message.edit_text(
+                f"⚠️ {labels['running']}, pero no se pudo seguir el resultado: {str(e)}\n"
+                f"Consulta /status {compose_id}"
+            )
+            return
 
+        icon, text = ("✅", labels["done"]) if result.ok else ("❌", labels["failed"])
+        msg = (
+            f"{icon} {text} ({result.status}) en {format_duration(result.duration)}\n"
+            f"ID: `{compose_id}`"
+        )
+        if result.detail:
+            msg += f"\n{result.detail}"
+        await message.edit_text(msg)
+
+    async def deploy(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /deploy <compose_id> - Deploya un compose y sigue el resultado"""
+        if not context.args:
             await update.message.reply_text(
-                f"✅ Compose iniciado correctamente\n"
-                f"ID: `{compose_id}`"
+                "❌ Uso: /deploy <compose_id>\n"
+                "Obtén el ID con /composes"
             )
+            return
 
-        except Exception as e:
-            logger.error(f"Error en /start_compose: {e}")
-            await update.message.reply_text(f"❌ Error al iniciar: {str(e)}")
+        await self._run_tracked(update, context.args[0], "deploy", {
+            "icon": "🚀",
+            "starting": "Iniciando deploy de",
+            "running": "Deploy en curso",
+            "done": "Deploy completado",
+            "failed": "Deploy fallido",
+            "error": "Error al deployar"
+        })
+
+    async def start_compose(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /start_compose <compose_id> - Inicia un compose y sigue el resultado"""
+        if not context.args:
+            await update.message.reply_text(
+                "❌ Uso: /start_compose <compose_id>\n"
+                "Obtén el ID con /composes"
+            )
+            return
+
+        await self._run_tracked(update, context.args[0], "start", {
+            "icon": "▶️",
+            "starting": "Iniciando compose",
+            "running": "Compose iniciándose",
+            "done": "Compose iniciado",
+            "failed": "El compose no arrancó",
+            "error": "Error al iniciar"
+        })
 
     async def stop_compose(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Comando /stop_compose <compose_id> - Detiene un compose"""
+        """Comando /stop_compose <compose_id> - Detiene un compose y sigue el resultado"""
         if not context.args:
             await update.message.reply_text(
                 "❌ Uso: /stop_compose <compose_id>\n"
@@ -320,35 +651,156 @@ No necesitas usar comandos especiales, solo pregunta naturalmente.
             )
             return
 
-        compose_id = context.args[0]
+        await self._run_tracked(update, context.args[0], "stop", {
+            "icon": "⏸️",
+            "starting": "Deteniendo compose",
+            "running": "Compose deteniéndose",
+            "done": "Compose detenido",
+            "failed": "El compose no se detuvo",
+            "error": "Error al detener"
+        })
+
+    async def _run_bulk(self, update: Update, action: str, composes: List[Dict], description: str):
+        """Ejecuta un lote y mantiene un único mensaje con el progreso"""
+        if not composes:
+            await update.message.reply_text(f"No hay composes para: {description}")
+            return
 
-        try:
-            await update.message.reply_text(f"⏸️ Deteniendo compose {compose_id}...")
+        plan = self.bulk.plan(composes, action)
+        text = f"📋 {description}\n\n{plan.render()}"
+        message = await update.message.reply_text(text)
+        last = {"text": text, "at": time.monotonic()}
 
-            result = await self.dokploy.stop_compose(compose_id)
+        async def edit(force: bool = False):
+            # Telegram limita las ediciones: como mucho una cada BULK_EDIT_INTERVAL
+            if not force and time.monotonic() - last["at"] < self.bulk_edit_interval:
+                return
+            text = f"📋 {description}\n\n{plan.render()}"
+            if text != last["text"]:
+                last["text"], last["at"] = text, time.monotonic()
+                await message.edit_text(text)
 
+        try:
+            await self.bulk.execute(plan, lambda plan: edit())
+        except Exception as e:
+            logger.error(f"Error en el lote {action}: {e}")
+            await update.message.reply_text(f"❌ Error en el lote: {str(e)}")
+        await edit(force=True)
+
+    async def deploy_project(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /deploy_project <proyecto> [env=<entorno>] - Redeploya un proyecto entero"""
+        args = list(context.args or [])
+        environment = args.pop()[len("env="):] if args and args[-1].startswith("env=") else None
+        if not args:
             await update.message.reply_text(
-                f"✅ Compose detenido correctamente\n"
-                f"ID: `{compose_id}`"
+                "❌ Uso: /deploy_project <proyecto> [env=<entorno>]\n"
+                "Ejemplo: /deploy_project SaaS RAG env=production"
             )
+            return
 
+        # El nombre del proyecto puede tener espacios
+        project = " ".join(args)
+        try:
+            composes = select_composes(
+                await self.monitor.get_composes(), project=project, environment=environment
+            )
         except Exception as e:
-            logger.error(f"Error en /stop_compose: {e}")
-            await update.message.reply_text(f"❌ Error al detener: {str(e)}")
+            logger.error(f"Error en /deploy_project: {e}")
+            await update.message.reply_text(f"❌ Error: {str(e)}")
+            return
+
+        where = f"{project}/{environment}" if environment else project
+        await self._run_bulk(update, "deploy", composes, f"Deploy del proyecto {where}")
+
+    async def restart_unhealthy(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /restart_unhealthy [proyecto] - Reinicia los composes con problemas"""
+        project = " ".join(context.args) if context.args else None
+        try:
+            composes = select_composes(
+                await self.monitor.get_composes(max_age=0), project=project, unhealthy=True
+            )
+        except Exception as e:
+            logger.error(f"Error en /restart_unhealthy: {e}")
+            await update.message.reply_text(f"❌ Error: {str(e)}")
+            return
+
+        where = f" de {project}" if project else ""
+        await self._run_bulk(update, "restart", composes, f"Reinicio de composes con problemas{where}")
+
+    async def bulk_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /bulk <acción> [project=..] [env=..] [status=..] [name=..]"""
+        usage = (
+            "❌ Uso: /bulk <deploy|start|stop|restart> [project=..] [env=..] [status=..] [name=..]\n"
+            "Los filtros aceptan comodines. Ejemplo: /bulk restart project=prod-* status=error"
+        )
+        if not context.args or context.args[0] not in BULK_ACTIONS:
+            await update.message.reply_text(usage)
+            return
+
+        filters_ = {}
+        for arg in context.args[1:]:
+            key, sep, value = arg.partition("=")
+            key = {"env": "environment"}.get(key, key)
+            if not sep or key not in ("project", "environment", "status", "name"):
+                await update.message.reply_text(usage)
+                return
+            filters_[key] = value
+
+        # Un lote sin filtros tocaría todos los composes
+        if not filters_:
+            await update.message.reply_text("❌ Indica al menos un filtro.\n" + usage[2:])
+            return
+
+        try:
+            composes = select_composes(await self.monitor.get_composes(max_age=0), **filters_)
+        except Exception as e:
+            logger.error(f"Error en /bulk: {e}")
+            await update.message.reply_text(f"❌ Error: {str(e)}")
+            return
+
+        description = " ".join(f"{k}={v}" for k, v in filters_.items())
+        await self._run_bulk(update, context.args[0], composes, f"{context.args[0]} de {description}")
+
+    async def reset(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /reset - Olvida el historial de conversación del chat"""
+        self.gpt_oss.reset_conversation(update.effective_chat.id)
+        await update.message.reply_text("🧹 Listo, empezamos una conversación nueva.")
 
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Maneja mensajes no-comando usando GPT-OSS"""
+        reply = None
         try:
             user_message = update.message.text
+            user_id = update.effective_user.id if update.effective_user else None
             logger.info(f"💬 Mensaje recibido: {user_message}")
 
-            # Indicador de "escribiendo..."
-            await update.message.chat.send_action(action="typing")
+            # Un mensaje nuevo reemplaza a la petición anterior del mismo usuario
+            self.gpt_oss.scheduler.supersede(user_id)
 
-            # Obtener contexto de Dokploy
+            # Obtener contexto de Dokploy desde el estado del monitor
             try:
-                composes = await self.dokploy.get_all_composes()
-
+                composes = await self.monitor.get_composes()
+                recent_changes = self.monitor.recent_changes()
+            except Exception as e:
+                logger.warning(f"No se pudo obtener contexto de Dokploy: {e}")
+                composes = None
+
+            # Consultas factuales: respuesta directa sin pasar por el LLM
+            if composes is not None and self.intent_router is not None:
+                answer = self.intent_router.route(user_message, composes, recent_changes)
+                if answer is not None:
+                    await update.message.reply_text(answer)
+                    # Queda en el historial para preguntas de seguimiento
+                    self.gpt_oss.memory.add_turn(update.effective_chat.id, user_message, answer)
+                    stats = self.intent_router.stats()
+                    logger.info(
+                        f"⚡ Respondido sin LLM ({stats['answered']}/{stats['messages']} mensajes, "
+                        f"{stats['avg_ms']} ms promedio)"
+                    )
+                    return
+
+            context_data = None
+            if composes is not None:
                 # Preparar estadísticas
                 status_counts = {}
                 for compose in composes:
@@ -360,17 +812,50 @@ No necesitas usar comandos especiales, solo pregunta naturalmente.
                     "stats": {
                         "total_composes": len(composes),
                         "status_distribution": status_counts
-                    }
+                    },
+                    "recent_changes": recent_changes
                 }
-            except Exception as e:
-                logger.warning(f"No se pudo obtener contexto de Dokploy: {e}")
-                context_data = None
+                if self.metrics is not None:
+                    context_data["resources"] = {
+                        compose.get("composeId"): summary
+                        for compose in composes
+                        if (summary := self.metrics.summary(compose.get("appName") or ""))
+                    }
 
-            # Consultar a GPT-OSS
-            response = await self.gpt_oss.ask(user_message, context=context_data)
+            # Indicador de "escribiendo..."
+            await update.message.chat.send_action(action="typing")
+
+            # Consultar a GPT-OSS mostrando la respuesta a medida que se genera
+            reply = StreamingReply(update.message)
 
-            # Enviar respuesta
-            await update.message.reply_text(response)
+            async def on_position(position: int):
+                await reply.set_placeholder(f"⏳ En cola para el modelo: posición {position}")
+
+            options = dict(
+                context=context_data,
+                user_id=user_id,
+                on_position=on_position,
+                chat_id=update.effective_chat.id
+            )
+            if self.agent_mode:
+                stream = self.gpt_oss.ask_agent_stream(user_message, self.toolkit, **options)
+            else:
+                stream = self.gpt_oss.ask_stream(user_message, **options)
+            await reply.run(stream)
+
+            if reply.time_to_first_token is not None:
+                logger.info(
+                    f"⏱️ Primer token visible en {reply.time_to_first_token:.2f}s "
+                    f"({reply.edits} ediciones, {len(reply.messages)} mensajes)"
+                )
+
+        except asyncio.CancelledError:
+            # Reemplazada por un mensaje más reciente del mismo usuario
+            if reply is not None:
+                try:
+                    await reply.cancel("⏭️ Cancelada: respondo a tu mensaje más reciente")
+                except Exception as e:
+                    logger.debug(f"No se pudo marcar la respuesta cancelada: {e}")
 
         except Exception as e:
             logger.error(f"Error en handle_message: {e}")
@@ -2,5 +2,6 @@
 Integration modules
 """
 from .dokploy_client import DokployClient
+from .topology_cache import TopologyCache
 
-__all__ = ["DokployClient"]
+__all__ = ["DokployClient", "TopologyCache"]
@@ -2,17 +2,66 @@
 Cliente para interactuar con la API de Dokploy
 """
 import aiohttp
+import asyncio
 import os
+import time
 from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
+from .topology_cache import TopologyCache
+
 load_dotenv()
 
+# Parámetros por defecto del pool de conexiones HTTP
+DEFAULT_POOL_LIMIT = 20
+DEFAULT_POOL_LIMIT_PER_HOST = 10
+DEFAULT_DNS_TTL = 300  # segundos
+DEFAULT_KEEPALIVE_TIMEOUT = 30  # segundos
+DEFAULT_REQUEST_TIMEOUT = 30  # segundos
+DEFAULT_CONNECT_TIMEOUT = 10  # segundos
 
-class DokployClient:
-    """Cliente asíncrono para la API de Dokploy"""
+# Caché de la topología proyecto/compose
+DEFAULT_TOPOLOGY_TTL = 15  # segundos
+DEFAULT_TOPOLOGY_STALE_TTL = 60  # segundos
 
-    def __init__(self):
+
+class DokployClient:
+    """
+    Cliente asíncrono para la API de Dokploy
+
+    Mantiene una única ``aiohttp.ClientSession`` con un pool de conexiones
+    keep-alive y caché de DNS, compartida por todas las peticiones. Debe
+    cerrarse con ``aclose()`` o usarse como context manager asíncrono:
+
+        async with DokployClient() as client:
+            await client.get_all_projects()
+    """
+
+    def __init__(
+        self,
+        pool_limit: Optional[int] = None,
+        pool_limit_per_host: Optional[int] = None,
+        dns_ttl: Optional[int] = None,
+        keepalive_timeout: Optional[float] = None,
+        request_timeout: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        topology_ttl: Optional[float] = None,
+        topology_stale_ttl: Optional[float] = None
+    ):
+        """
+        Args:
+            pool_limit: Máximo de conexiones abiertas en total
+            pool_limit_per_host: Máximo de conexiones por host
+            dns_ttl: Segundos que se cachean las resoluciones DNS
+            keepalive_timeout: Segundos que una conexión ociosa permanece abierta
+            request_timeout: Timeout total por petición en segundos
+            connect_timeout: Timeout de conexión en segundos
+            topology_ttl: Segundos que se considera fresca la lista de composes
+            topology_stale_ttl: Segundos extra que se sirve la lista vieja
+                mientras se refresca en background
+
+        Los valores no indicados se leen de las variables DOKPLOY_* del .env
+        """
         self.base_url = os.getenv("DOKPLOY_API_URL", "https://settings.sphyrnasolutions.com/api")
         self.api_key = os.getenv("DOKPLOY_API_KEY")
 
@@ -26,19 +75,94 @@ class DokployClient:
             "Accept": "application/json"
         }
 
+        # Configuración del pool de conexiones
+        self.pool_limit = pool_limit or int(
+            os.getenv("DOKPLOY_HTTP_POOL_LIMIT", DEFAULT_POOL_LIMIT)
+        )
+        self.pool_limit_per_host = pool_limit_per_host or int(
+            os.getenv("DOKPLOY_HTTP_POOL_LIMIT_PER_HOST", DEFAULT_POOL_LIMIT_PER_HOST)
+        )
+        self.dns_ttl = dns_ttl or int(
+            os.getenv("DOKPLOY_HTTP_DNS_TTL", DEFAULT_DNS_TTL)
+        )
+        self.keepalive_timeout = keepalive_timeout or float(
+            os.getenv("DOKPLOY_HTTP_KEEPALIVE", DEFAULT_KEEPALIVE_TIMEOUT)
+        )
+        self.timeout = aiohttp.ClientTimeout(
+            total=request_timeout or float(
+                os.getenv("DOKPLOY_HTTP_TIMEOUT", DEFAULT_REQUEST_TIMEOUT)
+            ),
+            connect=connect_timeout or float(
+                os.getenv("DOKPLOY_HTTP_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)
+            )
+        )
+
+        # Última acción (start/stop/deploy) lanzada por compose (time.time);
+        # el monitor sigue los deployments de estos composes aunque su
+        # estado no llegue a cambiar entre dos sweeps
+        self.last_action: Dict[str, float] = {}
+
+        # La sesión se crea de forma perezosa dentro del event loop
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_lock = asyncio.Lock()
+
+        # Caché compartida de la topología (proyectos -> environments -> composes)
+        self.topology = TopologyCache(
+            loader=self._fetch_all_composes,
+            ttl=topology_ttl if topology_ttl is not None else float(
+                os.getenv("DOKPLOY_TOPOLOGY_TTL", DEFAULT_TOPOLOGY_TTL)
+            ),
+            stale_ttl=topology_stale_ttl if topology_stale_ttl is not None else float(
+                os.getenv("DOKPLOY_TOPOLOGY_STALE_TTL", DEFAULT_TOPOLOGY_STALE_TTL)
+            )
+        )
+
+    async def __aenter__(self) -> "DokployClient":
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Devuelve la sesión compartida, creándola si no existe"""
+        if self._session is not None and not self._session.closed:
+            return self._session
+
+        async with self._session_lock:
+            if self._session is None or self._session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.pool_limit,
+                    limit_per_host=self.pool_limit_per_host,
+                    ttl_dns_cache=self.dns_ttl,
+                    keepalive_timeout=self.keepalive_timeout
+                )
+                self._session = aiohttp.ClientSession(
+                    connector=connector,
+                    headers=self.headers,
+                    timeout=self.timeout
+                )
+        return self._session
+
+    @property
+    def closed(self) -> bool:
+        """True si no hay una sesión HTTP abierta"""
+        return self._session is None or self._session.closed
+
+    async def aclose(self):
+        """Cierra la sesión HTTP y libera las conexiones del pool"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
     async def _request(self, method: str, endpoint: str, **kwargs) -> Dict:
         """Realiza una petición HTTP a la API de Dokploy"""
         url = f"{self.base_url}{endpoint}"
+        session = await self._get_session()
 
-        async with aiohttp.ClientSession() as session:
-            async with session.request(
-                method,
-                url,
-                headers=self.headers,
-                **kwargs
-            ) as response:
-                response.raise_for_status()
-                return await response.json()
+        async with session.request(method, url, **kwargs) as response:
+            response.raise_for_status()
+            return await response.json()
 
     # ========== PROJECT ENDPOINTS ==========
 
@@ -62,15 +186,24 @@ class DokployClient:
 
     async def start_compose(self, compose_id: str) -> Dict:
         """Inicia todos los servicios de un compose"""
-        return await self._request("POST", "/compose.start", json={"composeId": compose_id})
+        result = await self._request("POST", "/compose.start", json={"composeId": compose_id})
+        self.last_action[compose_id] = time.time()
+        self.topology.invalidate()
+        return result
 
     async def stop_compose(self, compose_id: str) -> Dict:
         """Detiene todos los servicios de un compose"""
-        return await self._request("POST", "/compose.stop", json={"composeId": compose_id})
+        result = await self._request("POST", "/compose.stop", json={"composeId": compose_id})
+        self.last_action[compose_id] = time.time()
+        self.topology.invalidate()
+        return result
 
     async def deploy_compose(self, compose_id: str) -> Dict:
         """Deploya/redeploya un compose"""
-        return await self._request("POST", "/compose.deploy", json={"composeId": compose_id})
+        result = await self._request("POST", "/compose.deploy", json={"composeId": compose_id})
+        self.last_action[compose_id] = time.time()
+        self.topology.invalidate()
+        return result
 
     # ========== DEPLOYMENT ENDPOINTS ==========
 
@@ -90,8 +223,26 @@ class DokployClient:
 
     # ========== HELPER METHODS ==========
 
-    async def get_all_composes(self) -> List[Dict]:
-        """Obtiene todos los composes de todos los proyectos"""
+    async def get_all_composes(self, force_refresh: bool = False) -> List[Dict]:
+        """
+        Obtiene todos los composes de todos los proyectos
+
+        Sirve desde la caché de topología; las llamadas concurrentes comparten
+        una única petición a /project.all.
+
+        Args:
+            force_refresh: Ignora la caché y fuerza una descarga nueva
+        """
+        composes = await self.topology.get(force_refresh=force_refresh)
+        # Copia de cada compose: los dicts cacheados se comparten entre llamadas
+        return [dict(compose) for compose in composes]
+
+    def topology_stats(self) -> Dict:
+        """Contadores de hit/miss/edad de la caché de topología"""
+        return self.topology.stats()
+
+    async def _fetch_all_composes(self) -> List[Dict]:
+        """Descarga /project.all y aplana los composes de todos los proyectos"""
         projects = await self.get_all_projects()
         composes = []
 
@@ -118,8 +269,10 @@ class DokployClient:
         Analiza el health de un compose
         Retorna información sobre el estado de los servicios
         """
-        compose_info = await self.get_compose(compose_id)
-        services = await self.get_compose_services(compose_id)
+        compose_info, services = await asyncio.gather(
+            self.get_compose(compose_id),
+            self.get_compose_services(compose_id)
+        )
 
         return {
             "compose_id": compose_id,
@@ -135,8 +288,10 @@ if __name__ == "__main__":
     import asyncio
 
     async def test():
-        client = DokployClient()
+        async with DokployClient() as client:
+            await run_checks(client)
 
+    async def run_checks(client: DokployClient):
         print("🔍 Probando cliente Dokploy...\n")
 
         # Test 1: Obtener proyectos
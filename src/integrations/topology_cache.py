@@ -0,0 +1,160 @@
+"""
+Caché TTL con stale-while-revalidate y single-flight para la topología de Dokploy
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TopologyCache:
+    """
+    Caché de un único valor cargado de forma asíncrona
+
+    - Dentro de ``ttl`` el valor se sirve directamente (hit).
+    - Entre ``ttl`` y ``ttl + stale_ttl`` se sirve el valor viejo y se
+      lanza un refresco en background (stale-while-revalidate).
+    - Pasado ese margen, o sin valor, el llamador espera una carga nueva.
+
+    Las llamadas concurrentes comparten una sola carga en vuelo, de modo que
+    una ráfaga de mensajes genera como máximo una petición al upstream.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float = 15.0,
+        stale_ttl: float = 60.0
+    ):
+        """
+        Args:
+            loader: Corrutina sin argumentos que obtiene el valor del upstream
+            ttl: Segundos durante los que el valor se considera fresco
+            stale_ttl: Segundos extra durante los que se sirve el valor viejo
+                mientras se refresca en background
+        """
+        self.loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+
+        self._value: Any = None
+        self._loaded_at: Optional[float] = None
+        self._inflight: Optional[asyncio.Task] = None
+        # Se incrementa en cada invalidate(): una carga lanzada antes de la
+        # última invalidación puede traer datos previos a una escritura
+        self._generation = 0
+        self._inflight_generation = 0
+
+        # Contadores
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.errors = 0
+
+    @property
+    def age(self) -> Optional[float]:
+        """Segundos desde la última carga correcta (None si nunca se cargó)"""
+        if self._loaded_at is None:
+            return None
+        return time.monotonic() - self._loaded_at
+
+    async def get(self, force_refresh: bool = False) -> Any:
+        """
+        Devuelve el valor cacheado, cargándolo si hace falta
+
+        Args:
+            force_refresh: Ignora el valor cacheado y espera una carga nueva
+        """
+        age = self.age
+
+        if not force_refresh and age is not None:
+            if age < self.ttl:
+                self.hits += 1
+                return self._value
+
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._start_refresh()
+                return self._value
+
+        self.misses += 1
+        if self._joinable():
+            self.coalesced += 1
+        return await asyncio.shield(self._start_refresh())
+
+    def peek(self) -> Any:
+        """Devuelve el último valor cargado sin tocar el upstream"""
+        return self._value
+
+    def invalidate(self):
+        """
+        Marca el valor como caducado; la próxima lectura esperará una carga
+
+        Una carga que ya estaba en vuelo no se reutiliza ni guarda su
+        resultado como fresco, porque pudo leer el estado anterior.
+        """
+        self._generation += 1
+        self._loaded_at = None
+
+    def stats(self) -> Dict:
+        """Contadores de uso de la caché"""
+        age = self.age
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "upstream_calls": self.upstream_calls,
+            "errors": self.errors,
+            "saved_calls": self.hits + self.stale_hits + self.coalesced,
+            "age": round(age, 2) if age is not None else None,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl
+        }
+
+    def _start_refresh(self) -> asyncio.Task:
+        """Lanza una carga o se une a la que ya está en vuelo"""
+        if self._joinable():
+            return self._inflight
+
+        self._inflight_generation = self._generation
+        self._inflight = asyncio.create_task(self._load(self._generation))
+        self._inflight.add_done_callback(self._consume_error)
+        return self._inflight
+
+    @staticmethod
+    def _consume_error(task: asyncio.Task):
+        """Evita avisos de excepción no recuperada en refrescos de background"""
+        if not task.cancelled():
+            task.exception()
+
+    def _joinable(self) -> bool:
+        """True si hay una carga en vuelo lanzada después de la última invalidación"""
+        return (
+            self._inflight is not None
+            and not self._inflight.done()
+            and self._inflight_generation == self._generation
+        )
+
+    async def _load(self, generation: int) -> Any:
+        """Ejecuta el loader y guarda el resultado si sigue vigente"""
+        self.upstream_calls += 1
+        try:
+            value = await self.loader()
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Error al refrescar la topología de Dokploy: {e}")
+            raise
+
+        if generation != self._generation:
+            # Invalidada mientras cargaba: quien la esperaba recibe el valor,
+            # pero no se cachea como fresco
+            return value
+
+        self._value = value
+        self._loaded_at = time.monotonic()
+        return value
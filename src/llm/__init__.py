@@ -2,5 +2,22 @@
 LLM module for GPT-OSS integration
 """
 from .gpt_oss_client import GPTOSSClient
+from .agent import DokployToolkit
+from .context_builder import ContextBuilder
+from .conversation import ConversationMemory
+from .knowledge_base import KnowledgeBase
+from .response_cache import ResponseCache
+from .scheduler import LLMScheduler, PRIORITY_BACKGROUND, PRIORITY_CHAT, PRIORITY_INCIDENT
 
-__all__ = ["GPTOSSClient"]
+__all__ = [
+    "GPTOSSClient",
+    "DokployToolkit",
+    "ContextBuilder",
+    "ConversationMemory",
+    "KnowledgeBase",
+    "ResponseCache",
+    "LLMScheduler",
+    "PRIORITY_CHAT",
+    "PRIORITY_INCIDENT",
+    "PRIORITY_BACKGROUND",
+]
@@ -0,0 +1,171 @@
+"""
+Herramientas de Dokploy para el modo agente del LLM
+
+En modo agente el modelo no recibe de antemano el detalle de cada compose:
+lo pide con function calling cuando lo necesita. ``DokployToolkit`` define
+las herramientas (esquemas OpenAI) y ``ToolSession`` las ejecuta durante un
+turno de conversación:
+
+- Las llamadas de una misma ronda se ejecutan en paralelo.
+- Los resultados se cachean por turno: pedir dos veces lo mismo no vuelve
+  a consultar Dokploy (y las llamadas idénticas simultáneas se comparten).
+- Un presupuesto de llamadas por turno evita bucles del modelo.
+- Los resultados se reducen a los campos útiles (sin variables de entorno
+  ni el compose file) y se truncan para acotar el prompt.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CALLS = 8
+MAX_RESULT_CHARS = 3000
+MAX_DEPLOYMENTS = 5
+
+COMPOSE_FIELDS = (
+    "composeId", "name", "appName", "description", "composeStatus", "sourceType",
+    "composeType", "branch", "createdAt", "project_name", "environment_name"
+)
+DEPLOYMENT_FIELDS = ("title", "status", "createdAt", "description", "errorMessage")
+DOMAIN_FIELDS = ("host", "path", "port", "https", "serviceName", "certificateType")
+
+_COMPOSE_PARAM = {
+    "type": "object",
+    "properties": {
+        "compose": {
+            "type": "string",
+            "description": "ID o nombre del compose"
+        }
+    },
+    "required": ["compose"]
+}
+
+
+def _tool(name: str, description: str) -> Dict:
+    return {
+        "type": "function",
+        "function": {"name": name, "description": description, "parameters": _COMPOSE_PARAM}
+    }
+
+
+TOOL_SCHEMAS = [
+    _tool("get_compose", "Detalle de un compose: estado, tipo, origen, rama y proyecto"),
+    _tool("get_compose_services", "Servicios definidos en un compose"),
+    _tool("get_compose_deployments", f"Últimos {MAX_DEPLOYMENTS} deployments de un compose con su estado"),
+    _tool("get_domains_by_compose", "Dominios configurados para un compose"),
+]
+
+
+def _pick(item: Dict, fields) -> Dict:
+    return {k: item[k] for k in fields if item.get(k) not in (None, "")}
+
+
+class DokployToolkit:
+    """Expone métodos de DokployClient como herramientas para el modelo"""
+
+    def __init__(
+        self,
+        dokploy_client,
+        resolve: Optional[Callable[[str], Optional[str]]] = None,
+        max_calls: Optional[int] = None
+    ):
+        """
+        Args:
+            dokploy_client: Cliente de Dokploy
+            resolve: Traduce lo que pide el modelo (nombre o ID) a un composeId;
+                None = se usa tal cual
+            max_calls: Llamadas a herramientas por turno (LLM_AGENT_MAX_CALLS)
+        """
+        self.client = dokploy_client
+        self.resolve = resolve
+        self.max_calls = max_calls or int(os.getenv("LLM_AGENT_MAX_CALLS", DEFAULT_MAX_CALLS))
+
+        self.calls = 0
+        self.cache_hits = 0
+        self.budget_exceeded = 0
+
+    @property
+    def schemas(self) -> List[Dict]:
+        return TOOL_SCHEMAS
+
+    def session(self) -> "ToolSession":
+        """Nueva sesión (caché y presupuesto) para un turno"""
+        return ToolSession(self)
+
+    async def fetch(self, name: str, compose_id: str):
+        """Ejecuta una herramienta y reduce el resultado a lo relevante"""
+        if name == "get_compose":
+            return _pick(await self.client.get_compose(compose_id), COMPOSE_FIELDS)
+        if name == "get_compose_services":
+            return await self.client.get_compose_services(compose_id)
+        if name == "get_compose_deployments":
+            deployments = await self.client.get_compose_deployments(compose_id) or []
+            deployments = sorted(deployments, key=lambda d: d.get("createdAt") or "", reverse=True)
+            return [_pick(d, DEPLOYMENT_FIELDS) for d in deployments[:MAX_DEPLOYMENTS]]
+        if name == "get_domains_by_compose":
+            return [_pick(d, DOMAIN_FIELDS) for d in await self.client.get_domains_by_compose(compose_id) or []]
+        raise ValueError(f"Herramienta desconocida: {name}")
+
+    def stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "budget_exceeded": self.budget_exceeded
+        }
+
+
+class ToolSession:
+    """Ejecución de herramientas durante un turno"""
+
+    def __init__(self, toolkit: DokployToolkit):
+        self.toolkit = toolkit
+        self.remaining = toolkit.max_calls
+        self._results: Dict[tuple, asyncio.Task] = {}
+
+    async def run(self, tool_calls: List[Dict]) -> List[str]:
+        """
+        Ejecuta en paralelo las llamadas pedidas por el modelo
+
+        Args:
+            tool_calls: ``AIMessage.tool_calls`` (dicts con name, args, id)
+
+        Returns:
+            Texto del resultado de cada llamada, en el mismo orden
+        """
+        return list(await asyncio.gather(*(self._run_one(call) for call in tool_calls)))
+
+    async def _run_one(self, call: Dict) -> str:
+        name = call.get("name")
+        reference = str((call.get("args") or {}).get("compose", "")).strip()
+
+        compose_id = reference
+        if self.toolkit.resolve is not None and reference:
+            compose_id = self.toolkit.resolve(reference)
+        if not compose_id:
+            return f"No encontré ningún compose llamado '{reference}'."
+
+        key = (name, compose_id)
+        task = self._results.get(key)
+        if task is not None:
+            self.toolkit.cache_hits += 1
+        else:
+            if self.remaining <= 0:
+                self.toolkit.budget_exceeded += 1
+                return "Límite de consultas alcanzado para esta pregunta: responde con lo que ya sabes."
+            self.remaining -= 1
+            self.toolkit.calls += 1
+            task = self._results[key] = asyncio.ensure_future(self.toolkit.fetch(name, compose_id))
+
+        try:
+            result = await asyncio.shield(task)
+        except Exception as e:
+            logger.warning(f"Error en herramienta {name}({compose_id}): {e}")
+            return f"Error al consultar {name}: {e}"
+
+        text = json.dumps(result, ensure_ascii=False, default=str, separators=(",", ":"))
+        if len(text) > MAX_RESULT_CHARS:
+            text = text[:MAX_RESULT_CHARS] + "... (truncado)"
+        return text
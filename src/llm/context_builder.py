@@ -0,0 +1,218 @@
+"""
+Construcción del contexto de infraestructura para el prompt
+
+En lugar de volcar los primeros N composes en orden arbitrario, se ordenan
+por relevancia para la pregunta y se empaquetan en una tabla compacta
+hasta agotar un presupuesto de tokens:
+
+1. Composes nombrados en la pregunta (por nombre, appName o proyecto)
+2. Composes con problemas (error) o en despliegue
+3. Composes con cambios recientes (según el monitor)
+4. El resto, en orden estable por proyecto y nombre
+
+Los composes sin ninguna señal de relevancia solo se listan si la flota
+entera cabe en el presupuesto; si no, no gastan tokens de prefill. Los que
+no se listan se resumen en una línea con su distribución de estados, así
+el modelo sigue sabiendo que existen.
+
+Ese texto depende de la pregunta y de la hora (edades de los cambios), así
+que no sirve para identificar el estado en la caché de respuestas:
+``snapshot`` da una firma estable (compose -> estado y, si los hay,
+recursos) para eso.
+"""
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from .response_cache import normalize_question
+
+DEFAULT_TOKEN_BUDGET = 600
+# Estimación conservadora para texto mixto español/identificadores
+CHARS_PER_TOKEN = 3.5
+
+SCORE_NAME_MENTION = 100.0
+SCORE_NAME_PARTIAL = 50.0
+SCORE_PROJECT_MENTION = 40.0
+SCORE_STATUS = {"error": 30.0, "running": 15.0}
+SCORE_RECENT_CHANGE = 20.0
+RECENT_WINDOW = 3600.0  # segundos
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokens aproximados de un texto (sin depender de un tokenizer)"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def _format_age(seconds: float) -> str:
+    if seconds < 60:
+        return f"{int(seconds)}s"
+    if seconds < 3600:
+        return f"{int(seconds // 60)}m"
+    return f"{int(seconds // 3600)}h"
+
+
+class ContextBuilder:
+    """Ordena los composes por relevancia y los ajusta a un presupuesto de tokens"""
+
+    def __init__(self, token_budget: Optional[int] = None):
+        """
+        Args:
+            token_budget: Tokens máximos del contexto (LLM_CONTEXT_TOKENS)
+        """
+        self.token_budget = token_budget or int(
+            os.getenv("LLM_CONTEXT_TOKENS", DEFAULT_TOKEN_BUDGET)
+        )
+        # Datos del último contexto construido (para medir)
+        self.last_stats: Dict = {}
+
+    def rank(
+        self,
+        question: str,
+        composes: List[Dict],
+        recent_changes: Optional[Dict[str, float]] = None
+    ) -> List[Tuple[float, Dict]]:
+        """
+        Puntúa cada compose según su relevancia para la pregunta
+
+        Returns:
+            Pares (puntaje, compose) de mayor a menor relevancia
+        """
+        text = normalize_question(question or "")
+        words = set(_WORD.findall(text))
+        recent_changes = recent_changes or {}
+
+        scored = []
+        for compose in composes:
+            score = 0.0
+
+            names = {
+                normalize_question(compose.get(field) or "")
+                for field in ("name", "appName")
+            } - {""}
+            if any(len(name) >= 3 and name in text for name in names):
+                score += SCORE_NAME_MENTION
+            else:
+                parts = {p for name in names for p in _WORD.findall(name) if len(p) >= 4}
+                if parts & words:
+                    score += SCORE_NAME_PARTIAL
+
+            project = normalize_question(compose.get("project_name") or "")
+            if len(project) >= 3 and project in text:
+                score += SCORE_PROJECT_MENTION
+
+            score += SCORE_STATUS.get(compose.get("composeStatus"), 0.0)
+
+            age = recent_changes.get(compose.get("composeId"))
+            if age is not None and age < RECENT_WINDOW:
+                score += SCORE_RECENT_CHANGE * (1 - age / RECENT_WINDOW)
+
+            scored.append((score, compose))
+
+        scored.sort(key=lambda item: (
+            -item[0],
+            item[1].get("project_name") or "",
+            item[1].get("name") or ""
+        ))
+        return scored
+
+    @staticmethod
+    def snapshot(context: Dict) -> str:
+        """
+        Firma del estado de la flota independiente de la pregunta y de la hora
+
+        Solo cambia cuando aparece o desaparece un compose, cambia su
+        estado o, si el contexto trae "resources", cambia su resumen de CPU
+        y memoria (el prompt los incluye, así que la respuesta también puede
+        depender de ellos); es lo que identifica el contexto en ResponseCache.
+        """
+        composes = context.get("composes") or []
+        resources = context.get("resources") or None
+        rows = []
+        for c in composes:
+            row = f"{c.get('composeId')}|{c.get('name', 'Unknown')}|{c.get('composeStatus', 'unknown')}"
+            if resources is not None:
+                row += f"|{resources.get(c.get('composeId')) or '-'}"
+            rows.append(row)
+        return "\n".join(sorted(rows)) or "sin composes"
+
+    @staticmethod
+    def _row(compose: Dict, recent_changes: Dict[str, float], resources: Optional[Dict[str, str]] = None) -> str:
+        age = recent_changes.get(compose.get("composeId"))
+        fields = [
+            compose.get("name", "Unknown"),
+            compose.get("project_name", "Unknown"),
+            compose.get("composeStatus", "unknown"),
+            _format_age(age) if age is not None else "-"
+        ]
+        if resources is not None:
+            fields.append(resources.get(compose.get("composeId")) or "-")
+        return "|".join(fields)
+
+    def build(self, question: str, context: Dict) -> str:
+        """
+        Texto de contexto para el prompt dentro del presupuesto de tokens
+
+        Args:
+            question: Pregunta del usuario (para ordenar por relevancia)
+            context: Dict con "composes", "stats" y opcionalmente
+                "recent_changes" (compose_id -> segundos desde el cambio) y
+                "resources" (compose_id -> resumen de CPU y memoria)
+        """
+        composes = context.get("composes") or []
+        stats = context.get("stats") or {}
+        recent_changes = context.get("recent_changes") or {}
+        resources = context.get("resources") or None
+
+        distribution = stats.get("status_distribution") or Counter(
+            c.get("composeStatus", "unknown") for c in composes
+        )
+        total = stats.get("total_composes", len(composes))
+        summary = ", ".join(f"{status} {count}" for status, count in sorted(distribution.items()))
+
+        lines = [f"Composes: {total} ({summary})" if summary else f"Composes: {total}"]
+        if not composes:
+            self.last_stats = {"composes_total": total, "composes_included": 0,
+                               "tokens": estimate_tokens(lines[0])}
+            return lines[0]
+
+        lines.append("nombre|proyecto|estado|cambio" + ("|recursos" if resources else ""))
+        used = estimate_tokens("\n".join(lines))
+        # Reserva para la línea de omitidos
+        reserve = estimate_tokens("(+9999 no listados: " + summary + ")")
+
+        ranked = self.rank(question, composes, recent_changes)
+        rows = [(score, compose, self._row(compose, recent_changes, resources)) for score, compose in ranked]
+        fits_all = used + sum(estimate_tokens(row) + 1 for _, _, row in rows) <= self.token_budget
+
+        included = 0
+        omitted: Counter = Counter()
+        for score, compose, row in rows:
+            status = compose.get("composeStatus", "unknown")
+            if omitted or (score <= 0 and not fits_all):
+                omitted[status] += 1
+                continue
+
+            cost = estimate_tokens(row) + 1
+            if used + cost + reserve > self.token_budget:
+                omitted[status] += 1
+                continue
+
+            lines.append(row)
+            used += cost
+            included += 1
+
+        if omitted:
+            detail = ", ".join(f"{status} {count}" for status, count in sorted(omitted.items()))
+            lines.append(f"(+{sum(omitted.values())} no listados: {detail})")
+
+        text = "\n".join(lines)
+        self.last_stats = {
+            "composes_total": total,
+            "composes_included": included,
+            "tokens": estimate_tokens(text)
+        }
+        return text
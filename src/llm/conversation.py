@@ -0,0 +1,287 @@
+"""
+Memoria de conversación por chat
+
+Guarda los últimos turnos (pregunta, respuesta) de cada chat para que el
+modelo entienda preguntas de seguimiento ("¿y el otro?"). El historial está
+acotado de tres formas:
+
+- Ventana: como mucho ``max_turns`` turnos literales por chat.
+- Presupuesto: cuando los turnos superan ``token_budget`` tokens, los más
+  antiguos se condensan en un resumen (lo genera el propio modelo); si no
+  hay resumidor o falla, simplemente se descartan.
+- Chats: como mucho ``max_chats`` conversaciones en memoria (LRU), y las
+  inactivas más de ``idle_ttl`` segundos se olvidan.
+
+En el prompt el historial va entre el system prompt y el mensaje final, y
+solo crece por el final: el prefijo de llamadas consecutivas de un mismo
+chat se mantiene y Ollama puede reutilizar su KV cache.
+
+``is_follow_up`` distingue las preguntas que se apoyan en turnos anteriores
+("¿y el otro?", "reinícialo") de las que se entienden solas; solo las
+primeras dependen del historial.
+
+Opcionalmente se persiste en un archivo JSON para sobrevivir reinicios.
+"""
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from .context_builder import estimate_tokens
+from .response_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_TURNS = 12
+DEFAULT_TOKEN_BUDGET = 1500
+DEFAULT_MAX_CHATS = 500
+DEFAULT_IDLE_TTL = 86400.0  # segundos
+# Turnos recientes que nunca se resumen
+KEEP_RECENT = 2
+
+# Referencias a algo dicho antes en la conversación
+_FOLLOW_UP = re.compile(
+    r"^(y|e|o|pero|entonces|tambien|and|but|so|also|what about)\b|"
+    r"\b(eso|esto|ese|esa|esos|esas|aquel|aquella|el otro|la otra|los otros|las otras|"
+    r"lo mismo|anterior|antes|dijiste|mencionaste|that|this one|these|those|it|them|"
+    r"the other|same|you said|previous)\b|"
+    r"\w+(lo|la|los|las)$"
+)
+# Mensajes tan cortos que casi siempre continúan el anterior ("¿y ahora?")
+FOLLOW_UP_MAX_WORDS = 3
+
+Turn = Tuple[str, str]
+Summarizer = Callable[[str, List[Turn]], Awaitable[str]]
+
+
+def is_follow_up(question: str) -> bool:
+    """True si la pregunta necesita los turnos anteriores para entenderse"""
+    text = normalize_question(question)
+    return len(text.split()) <= FOLLOW_UP_MAX_WORDS or bool(_FOLLOW_UP.search(text))
+
+
+class _Conversation:
+    __slots__ = ("summary", "turns", "last_used")
+
+    def __init__(self, summary: str = "", turns: Optional[List[Turn]] = None, last_used: float = 0.0):
+        self.summary = summary
+        self.turns: List[Turn] = turns or []
+        self.last_used = last_used or time.time()
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(
+            estimate_tokens(q) + estimate_tokens(a) for q, a in self.turns
+        )
+
+
+class ConversationMemory:
+    """Historial acotado por chat con resumen de los turnos antiguos"""
+
+    def __init__(
+        self,
+        max_turns: Optional[int] = None,
+        token_budget: Optional[int] = None,
+        max_chats: Optional[int] = None,
+        idle_ttl: Optional[float] = None,
+        path: Optional[str] = None
+    ):
+        """
+        Args:
+            max_turns: Turnos literales por chat (LLM_MEMORY_MAX_TURNS)
+            token_budget: Tokens de historial antes de resumir (LLM_MEMORY_TOKENS)
+            max_chats: Conversaciones en memoria (LLM_MEMORY_MAX_CHATS)
+            idle_ttl: Segundos de inactividad tras los que se olvida un chat
+                (LLM_MEMORY_IDLE_TTL)
+            path: Archivo JSON para persistir; vacío = solo memoria
+                (LLM_MEMORY_PATH)
+        """
+        self.max_turns = max_turns or int(os.getenv("LLM_MEMORY_MAX_TURNS", DEFAULT_MAX_TURNS))
+        self.token_budget = token_budget or int(os.getenv("LLM_MEMORY_TOKENS", DEFAULT_TOKEN_BUDGET))
+        self.max_chats = max_chats or int(os.getenv("LLM_MEMORY_MAX_CHATS", DEFAULT_MAX_CHATS))
+        self.idle_ttl = idle_ttl or float(os.getenv("LLM_MEMORY_IDLE_TTL", DEFAULT_IDLE_TTL))
+        self.path = path if path is not None else os.getenv("LLM_MEMORY_PATH", "")
+
+        self._chats: "OrderedDict[str, _Conversation]" = OrderedDict()
+        self._compacting = set()
+        self._dirty = False
+
+        self.summaries = 0
+        self.dropped_turns = 0
+        self.evicted_chats = 0
+
+        if self.path:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._chats)
+
+    def _get(self, chat_id) -> Optional[_Conversation]:
+        key = str(chat_id)
+        conversation = self._chats.get(key)
+        if conversation is None:
+            return None
+        if time.time() - conversation.last_used > self.idle_ttl:
+            del self._chats[key]
+            self._dirty = True
+            self.evicted_chats += 1
+            return None
+        return conversation
+
+    def has_history(self, chat_id) -> bool:
+        conversation = self._get(chat_id)
+        return bool(conversation and (conversation.turns or conversation.summary))
+
+    def messages(self, chat_id) -> List[BaseMessage]:
+        """Historial del chat como mensajes para el prompt"""
+        conversation = self._get(chat_id)
+        if conversation is None:
+            return []
+
+        messages: List[BaseMessage] = []
+        if conversation.summary:
+            messages.append(HumanMessage(
+                content=f"Resumen de nuestra conversación anterior:\n{conversation.summary}"
+            ))
+            messages.append(AIMessage(content="De acuerdo, lo tengo en cuenta."))
+        for question, answer in conversation.turns:
+            messages.append(HumanMessage(content=question))
+            messages.append(AIMessage(content=answer))
+        return messages
+
+    def add_turn(self, chat_id, question: str, answer: str):
+        """Agrega un turno y aplica la ventana y el límite de chats"""
+        key = str(chat_id)
+        conversation = self._get(chat_id)
+        if conversation is None:
+            conversation = self._chats[key] = _Conversation()
+
+        conversation.turns.append((question, answer))
+        conversation.last_used = time.time()
+        self._chats.move_to_end(key)
+        self._dirty = True
+
+        # Ventana dura: aunque el resumen esté pendiente, nunca más de max_turns
+        excess = len(conversation.turns) - self.max_turns
+        if excess > 0:
+            del conversation.turns[:excess]
+            self.dropped_turns += excess
+
+        while len(self._chats) > self.max_chats:
+            self._chats.popitem(last=False)
+            self.evicted_chats += 1
+
+    def needs_compaction(self, chat_id) -> bool:
+        conversation = self._get(chat_id)
+        return (
+            conversation is not None
+            and len(conversation.turns) > KEEP_RECENT
+            and conversation.tokens() > self.token_budget
+        )
+
+    async def compact(self, chat_id, summarize: Optional[Summarizer] = None):
+        """
+        Condensa los turnos antiguos si el historial supera el presupuesto
+
+        Args:
+            chat_id: Chat a compactar
+            summarize: Corrutina (resumen previo, turnos) -> nuevo resumen.
+                Sin ella, o si falla, los turnos antiguos se descartan.
+        """
+        key = str(chat_id)
+        if key in self._compacting or not self.needs_compaction(chat_id):
+            return
+
+        conversation = self._chats[key]
+        folded = conversation.turns[:-KEEP_RECENT]
+        self._compacting.add(key)
+        try:
+            summary = None
+            if summarize is not None:
+                try:
+                    summary = await summarize(conversation.summary, folded)
+                except Exception as e:
+                    logger.warning(f"No se pudo resumir la conversación {key}: {e}")
+
+            # El chat pudo borrarse o reiniciarse mientras se resumía
+            if self._chats.get(key) is not conversation or conversation.turns[:len(folded)] != folded:
+                return
+
+            del conversation.turns[:len(folded)]
+            if summary:
+                conversation.summary = summary.strip()
+                self.summaries += 1
+            else:
+                self.dropped_turns += len(folded)
+            self._dirty = True
+        finally:
+            self._compacting.discard(key)
+
+    def clear(self, chat_id):
+        """Olvida la conversación de un chat"""
+        if self._chats.pop(str(chat_id), None) is not None:
+            self._dirty = True
+
+    def load(self):
+        """Carga las conversaciones desde disco, ignorando las inactivas"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo leer la memoria de conversación {self.path}: {e}")
+            return
+
+        now = time.time()
+        for key, item in data.get("chats", []):
+            if now - item.get("last_used", 0) > self.idle_ttl:
+                continue
+            self._chats[key] = _Conversation(
+                summary=item.get("summary", ""),
+                turns=[tuple(turn) for turn in item.get("turns", [])],
+                last_used=item.get("last_used", now)
+            )
+        while len(self._chats) > self.max_chats:
+            self._chats.popitem(last=False)
+        logger.info(f"💾 Memoria de conversación cargada: {len(self._chats)} chats")
+
+    def save(self):
+        """Escribe las conversaciones a disco si cambiaron (escritura atómica)"""
+        if not self.path or not self._dirty:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({
+                    "chats": [
+                        (key, {
+                            "summary": c.summary,
+                            "turns": c.turns,
+                            "last_used": c.last_used
+                        })
+                        for key, c in self._chats.items()
+                    ]
+                }, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"No se pudo guardar la memoria de conversación {self.path}: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            "chats": len(self._chats),
+            "turns": sum(len(c.turns) for c in self._chats.values()),
+            "summaries": self.summaries,
+            "dropped_turns": self.dropped_turns,
+            "evicted_chats": self.evicted_chats
+        }
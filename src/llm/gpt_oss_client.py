@@ -4,32 +4,73 @@ Cliente GPT-OSS para análisis de infraestructura
 Usa LangChain-OpenAI apuntando a Ollama
 """
 import os
+import time
+import asyncio
 import logging
-from typing import Optional, Dict
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Set
+import aiohttp
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+from .agent import DokployToolkit
+from .context_builder import ContextBuilder
+from .conversation import ConversationMemory, Turn, is_follow_up
+from .knowledge_base import KnowledgeBase
+from .response_cache import ResponseCache
+from .scheduler import PRIORITY_BACKGROUND, PRIORITY_CHAT, PRIORITY_INCIDENT, LLMScheduler
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Rondas de herramientas por turno en modo agente (la última, sin herramientas)
+MAX_AGENT_ROUNDS = 4
+
 
 class GPTOSSClient:
     """Cliente para interactuar con GPT-OSS 20B"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        cache: Optional[ResponseCache] = None,
+        scheduler: Optional[LLMScheduler] = None,
+        memory: Optional[ConversationMemory] = None,
+        knowledge: Optional[KnowledgeBase] = None
+    ):
+        """
+        Args:
+            cache: Caché de respuestas (por defecto se configura desde .env)
+            scheduler: Planificador de peticiones al modelo (por defecto desde .env)
+            memory: Memoria de conversación por chat (por defecto desde .env)
+            knowledge: Base de runbooks e incidentes para los análisis (opcional)
+        """
         self.model_name = os.getenv("OPENAI_MODEL_NAME", "gpt-oss")
         self.base_url = os.getenv("OPENAI_API_BASE", "http://localhost:11434/v1")
         self.api_key = os.getenv("OPENAI_API_KEY", "ollama")
+        # Tiempo que Ollama mantiene el modelo cargado tras cada petición
+        self.keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
 
         self.llm = ChatOpenAI(
             model=self.model_name,
             base_url=self.base_url,
             api_key=self.api_key,
             temperature=0.7,
+            # Ollama informa los tokens de prompt también en streaming
+            stream_usage=True,
+            extra_body={"keep_alive": self.keep_alive} if self.keep_alive else None,
         )
 
+        self.cache = cache if cache is not None else ResponseCache()
+        self.scheduler = scheduler or LLMScheduler()
+        self.context_builder = ContextBuilder()
+        self.memory = memory if memory is not None else ConversationMemory()
+        self.knowledge = knowledge
+        self._background: Set[asyncio.Task] = set()
+        # Tokens de prompt de las últimas generaciones
+        self.prompt_tokens: Deque[int] = deque(maxlen=500)
+
         # System prompt para el agente
         self.system_prompt = """Eres InfraGuardian AI, un asistente experto en infraestructura Dokploy y Docker.
 
@@ -50,7 +91,11 @@ El usuario puede preguntarte cualquier cosa sobre Docker, Dokploy o su infraestr
     async def ask(
         self,
         question: str,
-        context: Optional[Dict] = None
+        context: Optional[Dict] = None,
+        user_id=None,
+        priority: int = PRIORITY_CHAT,
+        on_position: Optional[Callable[[int], Awaitable]] = None,
+        chat_id=None
     ) -> str:
         """
         Envía una pregunta a GPT-OSS
@@ -58,63 +103,313 @@ El usuario puede preguntarte cualquier cosa sobre Docker, Dokploy o su infraestr
         Args:
             question: Pregunta del usuario
             context: Contexto adicional (ej. info de composes)
+            user_id: Usuario que pregunta (equidad en la cola)
+            priority: Prioridad en la cola del modelo
+            on_position: Corrutina que recibe la posición en cola
+            chat_id: Chat de la conversación (None = pregunta sin historial)
 
         Returns:
             Respuesta de GPT-OSS
         """
         try:
-            messages = [SystemMessage(content=self.system_prompt)]
+            # La caché se indexa por el estado de la flota, no por el texto
+            # del prompt (que se ordena según la pregunta e incluye edades)
+            context_key = self.context_builder.snapshot(context) if context else None
+
+            # Solo las preguntas de seguimiento dependen del historial
+            use_cache = self._cacheable(question, chat_id)
+
+            cached = self.cache.get(question, context_key) if use_cache else None
+            if cached is not None:
+                logger.info("💾 Respuesta servida desde caché")
+                self._remember(chat_id, question, cached)
+                return cached
+
+            context_text = self._format_context(context, question) if context else None
+            messages = self._build_messages(question, context_text, chat_id)
+
+            # Invocar modelo cuando haya turno
+            async with self.scheduler.slot(user_id, priority, on_position):
+                started = time.monotonic()
+                response = await self.llm.ainvoke(messages)
+            self._record_usage(response.usage_metadata)
+            if use_cache:
+                self.cache.put(question, context_key, response.content, time.monotonic() - started)
+            self._remember(chat_id, question, response.content)
+
+            return response.content
+
+        except Exception as e:
+            logger.error(f"Error al consultar GPT-OSS: {e}")
+            return self._error_message(e)
+
+    async def ask_stream(
+        self,
+        question: str,
+        context: Optional[Dict] = None,
+        user_id=None,
+        priority: int = PRIORITY_CHAT,
+        on_position: Optional[Callable[[int], Awaitable]] = None,
+        chat_id=None
+    ) -> AsyncIterator[str]:
+        """
+        Envía una pregunta a GPT-OSS y entrega la respuesta a medida que se genera
+
+        Args:
+            question: Pregunta del usuario
+            context: Contexto adicional (ej. info de composes)
+            user_id: Usuario que pregunta (equidad en la cola)
+            priority: Prioridad en la cola del modelo
+            on_position: Corrutina que recibe la posición en cola
+            chat_id: Chat de la conversación (None = pregunta sin historial)
+
+        Yields:
+            Fragmentos de texto de la respuesta
+        """
+        try:
+            # La caché se indexa por el estado de la flota, no por el texto
+            # del prompt (que se ordena según la pregunta e incluye edades)
+            context_key = self.context_builder.snapshot(context) if context else None
+
+            # Solo las preguntas de seguimiento dependen del historial
+            use_cache = self._cacheable(question, chat_id)
+
+            cached = self.cache.get(question, context_key) if use_cache else None
+            if cached is not None:
+                logger.info("💾 Respuesta servida desde caché")
+                self._remember(chat_id, question, cached)
+                yield cached
+                return
+
+            context_text = self._format_context(context, question) if context else None
+            messages = self._build_messages(question, context_text, chat_id)
+
+            parts = []
+            async with self.scheduler.slot(user_id, priority, on_position):
+                started = time.monotonic()
+                async for chunk in self.llm.astream(messages):
+                    self._record_usage(chunk.usage_metadata)
+                    if chunk.content:
+                        parts.append(chunk.content)
+                        yield chunk.content
+
+            answer = "".join(parts)
+            if use_cache:
+                self.cache.put(question, context_key, answer, time.monotonic() - started)
+            self._remember(chat_id, question, answer)
 
-            # Agregar contexto si está disponible
-            if context:
-                context_text = self._format_context(context)
-                messages.append(SystemMessage(content=f"Contexto actual:\n{context_text}"))
+        except Exception as e:
+            logger.error(f"Error al consultar GPT-OSS (streaming): {e}")
+            yield self._error_message(e)
 
-            # Agregar pregunta del usuario
+    async def ask_agent_stream(
+        self,
+        question: str,
+        toolkit: DokployToolkit,
+        context: Optional[Dict] = None,
+        user_id=None,
+        priority: int = PRIORITY_CHAT,
+        on_position: Optional[Callable[[int], Awaitable]] = None,
+        chat_id=None
+    ) -> AsyncIterator[str]:
+        """
+        Modo agente: el modelo pide a Dokploy solo los datos que necesita
+
+        Cada ronda genera en streaming; si el modelo pide herramientas, se
+        ejecutan en paralelo (sin ocupar turno del modelo) y sus resultados
+        vuelven en la ronda siguiente. La última ronda no ofrece herramientas
+        para forzar una respuesta. Las respuestas no se cachean porque
+        dependen de datos consultados en vivo.
+
+        Args:
+            question: Pregunta del usuario
+            toolkit: Herramientas de Dokploy disponibles
+            context: Contexto adicional (ej. info de composes)
+            user_id: Usuario que pregunta (equidad en la cola)
+            priority: Prioridad en la cola del modelo
+            on_position: Corrutina que recibe la posición en cola
+            chat_id: Chat de la conversación (None = pregunta sin historial)
+
+        Yields:
+            Fragmentos de texto de la respuesta
+        """
+        try:
+            context_text = self._format_context(context, question) if context else None
+            messages = self._build_messages(question, context_text, chat_id)
+            with_tools = self.llm.bind_tools(toolkit.schemas)
+            session = toolkit.session()
+
+            parts = []
+            for round_number in range(MAX_AGENT_ROUNDS):
+                llm = with_tools if round_number < MAX_AGENT_ROUNDS - 1 else self.llm
+                message = None
+                async with self.scheduler.slot(user_id, priority, on_position):
+                    async for chunk in llm.astream(messages):
+                        self._record_usage(chunk.usage_metadata)
+                        message = chunk if message is None else message + chunk
+                        if chunk.content:
+                            parts.append(chunk.content)
+                            yield chunk.content
+
+                if message is None or not message.tool_calls:
+                    break
+
+                logger.info(f"🛠️ Herramientas pedidas: {[c['name'] for c in message.tool_calls]}")
+                results = await session.run(message.tool_calls)
+                messages.append(message)
+                messages.extend(
+                    ToolMessage(content=result, tool_call_id=call["id"])
+                    for call, result in zip(message.tool_calls, results)
+                )
+
+            self._remember(chat_id, question, "".join(parts))
+
+        except Exception as e:
+            logger.error(f"Error al consultar GPT-OSS (agente): {e}")
+            yield self._error_message(e)
+
+    def _build_messages(
+        self,
+        question: str,
+        context_text: Optional[str] = None,
+        chat_id=None
+    ) -> List[BaseMessage]:
+        """
+        Construye la lista de mensajes para el modelo
+
+        El system prompt va primero y es idéntico byte a byte en todas las
+        llamadas, de modo que Ollama/llama.cpp reutiliza su KV cache y solo
+        procesa lo nuevo. Todo lo que cambia entre llamadas (estado de la
+        infraestructura y pregunta) va al final, en el mensaje del usuario.
+        El historial del chat va en medio y solo crece por el final.
+        """
+        messages = [SystemMessage(content=self.system_prompt)]
+        if chat_id is not None:
+            messages.extend(self.memory.messages(chat_id))
+
+        # Contexto y pregunta al final del prompt
+        if context_text:
+            messages.append(HumanMessage(content=f"Contexto actual:\n{context_text}\n\n{question}"))
+        else:
             messages.append(HumanMessage(content=question))
 
-            # Invocar modelo
-            response = await self.llm.ainvoke(messages)
+        return messages
 
-            return response.content
+    @property
+    def ollama_url(self) -> str:
+        """URL de la API nativa de Ollama (sin el sufijo OpenAI /v1)"""
+        base = self.base_url.rstrip("/")
+        return base[:-3] if base.endswith("/v1") else base
+
+    async def warmup(self) -> bool:
+        """
+        Carga el modelo en Ollama y precalcula el system prompt
+
+        Envía solo el system prompt con ``keep_alive`` para que el modelo
+        quede residente y el prefijo común ya esté en la KV cache cuando
+        llegue la primera pregunta.
+
+        Returns:
+            True si Ollama respondió correctamente
+        """
+        payload = {
+            "model": self.model_name,
+            "messages": [{"role": "system", "content": self.system_prompt}],
+            "stream": False,
+            "options": {"num_predict": 1}
+        }
+        if self.keep_alive:
+            payload["keep_alive"] = self.keep_alive
 
+        try:
+            timeout = aiohttp.ClientTimeout(total=300)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with session.post(f"{self.ollama_url}/api/chat", json=payload) as response:
+                    response.raise_for_status()
+                    data = await response.json()
+            logger.info(
+                f"🔥 Modelo {self.model_name} precargado "
+                f"({data.get('prompt_eval_count', '?')} tokens de system prompt)"
+            )
+            return True
         except Exception as e:
-            logger.error(f"Error al consultar GPT-OSS: {e}")
-            return f"❌ Error al procesar tu pregunta: {str(e)}\n\nVerifica que GPT-OSS esté corriendo en Ollama."
-
-    def _format_context(self, context: Dict) -> str:
-        """Formatea el contexto para el prompt"""
-        parts = []
-
-        # Información de composes
-        if "composes" in context:
-            composes = context["composes"]
-            parts.append(f"Composes disponibles: {len(composes)}")
-
-            # Detalles de composes (máximo 10 para no saturar el contexto)
-            if composes:
-                parts.append("\nComposes activos:")
-                for compose in composes[:10]:
-                    name = compose.get("name", "Unknown")
-                    status = compose.get("composeStatus", "unknown")
-                    project = compose.get("project_name", "Unknown")
-                    parts.append(f"  - {name} ({project}): {status}")
-
-                if len(composes) > 10:
-                    parts.append(f"  ... y {len(composes) - 10} más")
-
-        # Estadísticas
-        if "stats" in context:
-            stats = context["stats"]
-            parts.append(f"\nEstadísticas:")
-            parts.append(f"  Total composes: {stats.get('total_composes', 0)}")
-
-            if "status_distribution" in stats:
-                parts.append(f"  Distribución:")
-                for status, count in stats["status_distribution"].items():
-                    parts.append(f"    - {status}: {count}")
-
-        return "\n".join(parts)
+            logger.warning(f"No se pudo precargar el modelo en Ollama: {e}")
+            return False
+
+    def _has_history(self, chat_id) -> bool:
+        return chat_id is not None and self.memory.has_history(chat_id)
+
+    def _cacheable(self, question: str, chat_id) -> bool:
+        """La respuesta no depende de la conversación: sin historial o pregunta autónoma"""
+        return not self._has_history(chat_id) or not is_follow_up(question)
+
+    def _remember(self, chat_id, question: str, answer: str):
+        """Guarda el turno y, si el historial se pasó del presupuesto, lo resume en background"""
+        if chat_id is None or not answer:
+            return
+        self.memory.add_turn(chat_id, question, answer)
+        if self.memory.needs_compaction(chat_id):
+            task = asyncio.create_task(self.memory.compact(chat_id, self._summarize))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+
+    async def _summarize(self, previous: str, turns: List[Turn]) -> str:
+        """Resume turnos antiguos de una conversación con el propio modelo"""
+        transcript = "\n".join(f"Usuario: {q}\nAsistente: {a}" for q, a in turns)
+        prompt = (
+            "Resume la siguiente conversación en no más de 8 líneas. Conserva nombres de "
+            "composes y proyectos, errores mencionados, decisiones y preguntas pendientes."
+        )
+        if previous:
+            prompt += f"\n\nResumen previo:\n{previous}"
+        prompt += f"\n\nConversación:\n{transcript}"
+
+        async with self.scheduler.slot(priority=PRIORITY_BACKGROUND):
+            response = await self.llm.ainvoke([
+                SystemMessage(content=self.system_prompt),
+                HumanMessage(content=prompt)
+            ])
+        return response.content
+
+    def reset_conversation(self, chat_id):
+        """Olvida el historial de un chat"""
+        self.memory.clear(chat_id)
+
+    async def aclose(self):
+        """Detiene los resúmenes pendientes y persiste caché y conversaciones"""
+        for task in list(self._background):
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        self.cache.save()
+        self.memory.save()
+
+    @staticmethod
+    def _error_message(error: Exception) -> str:
+        if isinstance(error, TimeoutError):
+            return "⏳ El modelo está ocupado o tardó demasiado en responder. Inténtalo de nuevo en un momento."
+        return f"❌ Error al procesar tu pregunta: {str(error)}\n\nVerifica que GPT-OSS esté corriendo en Ollama."
+
+    def _format_context(self, context: Dict, question: str = "") -> str:
+        """Formatea el contexto para el prompt (ordenado y acotado a LLM_CONTEXT_TOKENS)"""
+        return self.context_builder.build(question, context)
+
+    def _record_usage(self, usage: Optional[Dict]):
+        """Guarda los tokens de prompt (prefill) que informa el servidor"""
+        if usage and usage.get("input_tokens"):
+            self.prompt_tokens.append(usage["input_tokens"])
+
+    def stats(self) -> Dict:
+        """Métricas de caché, cola y tamaño de prompt"""
+        prompt_tokens = list(self.prompt_tokens)
+        return {
+            "cache": self.cache.stats(),
+            "scheduler": self.scheduler.stats(),
+            "memory": self.memory.stats(),
+            "knowledge": self.knowledge.stats() if self.knowledge is not None else None,
+            "prompt_tokens_avg": round(sum(prompt_tokens) / len(prompt_tokens)) if prompt_tokens else None,
+            "prompt_tokens_last": prompt_tokens[-1] if prompt_tokens else None,
+            "context": self.context_builder.last_stats
+        }
 
     async def analyze_compose_issue(
         self,
@@ -142,6 +437,10 @@ Estado actual: {compose_status}
         if error_logs:
             prompt += f"\nLogs de error:\n{error_logs}\n"
 
+        runbooks = await self._relevant_runbooks(compose_name, compose_status, error_logs)
+        if runbooks:
+            prompt += f"\nRunbooks e incidentes relevantes:\n{runbooks}\n"
+
         prompt += """
 Proporciona:
 1. Posibles causas del problema
@@ -149,7 +448,28 @@ Proporciona:
 3. Soluciones recomendadas
 """
 
-        return await self.ask(prompt)
+        return await self.ask(prompt, priority=PRIORITY_INCIDENT)
+
+    async def _relevant_runbooks(
+        self,
+        compose_name: str,
+        compose_status: str,
+        error_logs: Optional[str] = None
+    ) -> str:
+        """Fragmentos de la base de conocimiento más parecidos al problema"""
+        if self.knowledge is None or not len(self.knowledge):
+            return ""
+
+        query = f"{compose_name} {compose_status} {(error_logs or '')[-500:]}"
+        try:
+            results = await self.knowledge.search(query)
+        except Exception as e:
+            logger.warning(f"No se pudo consultar la base de conocimiento: {e}")
+            return ""
+
+        return "\n\n".join(
+            f"[{os.path.basename(r.source)} > {r.title}]\n{r.text}" for r in results
+        )
 
 
 # Test del cliente
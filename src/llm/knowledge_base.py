@@ -0,0 +1,457 @@
+"""
+Base de conocimiento local: runbooks e incidentes con búsqueda vectorial
+
+Indexa documentos markdown (runbooks, el documento de diseño en ``docs/`` e
+incidentes resueltos) partidos en fragmentos por sección. Cada fragmento se
+convierte en un vector con un modelo local de embeddings (Ollama) y se
+guarda en disco:
+
+    <index_dir>/vectors.npy   matriz float32 N x D, normalizada (se abre con mmap)
+    <index_dir>/meta.json     fragmentos, hash de cada fuente y modelo usado
+
+La búsqueda es un producto matricial contra la matriz mapeada en memoria
+(similitud coseno, porque los vectores están normalizados) y ``argpartition``
+para el top-k: con miles de fragmentos tarda menos de un milisegundo.
+
+La indexación es incremental: solo se procesan las fuentes cuyo contenido
+cambió, y los fragmentos cuyo texto ya estaba indexado reutilizan su vector.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import aiohttp
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = "data/kb"
+DEFAULT_SOURCES = "docs,runbooks,data/incidents"
+DEFAULT_INCIDENTS_DIR = "data/incidents"
+DEFAULT_EMBED_MODEL = "nomic-embed-text"
+DEFAULT_TOP_K = 3
+DEFAULT_MIN_SCORE = 0.3
+
+MAX_CHUNK_CHARS = 1200
+EMBED_BATCH = 32
+HASHING_DIM = 512
+
+_HEADING = re.compile(r"^(#{1,4})\s+(.*)$")
+
+
+class SearchResult(NamedTuple):
+    score: float
+    source: str
+    title: str
+    text: str
+
+
+def _sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def chunk_markdown(text: str, max_chars: int = MAX_CHUNK_CHARS) -> List[Dict]:
+    """
+    Parte un markdown por secciones (#..####) y, si hace falta, por párrafos
+
+    Los ``#`` dentro de bloques de código no se consideran títulos.
+
+    Returns:
+        Lista de {"title", "text"}; el título es la ruta de secciones
+    """
+    sections: List[Dict] = []
+    path: List[str] = []
+    lines: List[str] = []
+    in_code = False
+
+    def close():
+        body = "\n".join(lines).strip()
+        if body:
+            sections.append({"title": " > ".join(path) or "(inicio)", "text": body})
+        lines.clear()
+
+    for line in text.splitlines():
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+        heading = None if in_code else _HEADING.match(line)
+        if heading:
+            close()
+            level = len(heading.group(1))
+            del path[level - 1:]
+            path.append(heading.group(2).strip())
+            continue
+        lines.append(line)
+    close()
+
+    chunks = []
+    for section in sections:
+        body = section["text"]
+        if len(body) <= max_chars:
+            chunks.append(section)
+            continue
+        # Secciones largas: agrupar párrafos hasta max_chars
+        current = ""
+        for paragraph in re.split(r"\n\s*\n", body):
+            if current and len(current) + len(paragraph) + 2 > max_chars:
+                chunks.append({"title": section["title"], "text": current})
+                current = ""
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+            while len(current) > max_chars:
+                chunks.append({"title": section["title"], "text": current[:max_chars]})
+                current = current[max_chars:]
+        if current.strip():
+            chunks.append({"title": section["title"], "text": current})
+    return chunks
+
+
+class OllamaEmbedder:
+    """Embeddings con un modelo local servido por Ollama (/api/embed)"""
+
+    def __init__(self, model: Optional[str] = None, base_url: Optional[str] = None):
+        """
+        Args:
+            model: Modelo de embeddings (OLLAMA_EMBED_MODEL)
+            base_url: URL de Ollama; por defecto OPENAI_API_BASE sin /v1
+        """
+        self.model = model or os.getenv("OLLAMA_EMBED_MODEL", DEFAULT_EMBED_MODEL)
+        base = (base_url or os.getenv("OPENAI_API_BASE", "http://localhost:11434/v1")).rstrip("/")
+        self.base_url = base[:-3] if base.endswith("/v1") else base
+        self.name = f"ollama:{self.model}"
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = []
+        timeout = aiohttp.ClientTimeout(total=300)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            for start in range(0, len(texts), EMBED_BATCH):
+                batch = texts[start:start + EMBED_BATCH]
+                async with session.post(
+                    f"{self.base_url}/api/embed",
+                    json={"model": self.model, "input": batch}
+                ) as response:
+                    response.raise_for_status()
+                    data = await response.json()
+                vectors.extend(data["embeddings"])
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class HashingEmbedder:
+    """
+    Embeddings sin modelo: bolsa de palabras y bigramas con feature hashing
+
+    Sirve como alternativa sin Ollama y para pruebas; la calidad semántica
+    es la de una búsqueda por términos.
+    """
+
+    def __init__(self, dim: int = HASHING_DIM):
+        self.dim = dim
+        self.name = f"hashing:{dim}"
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"\w+", text.lower())
+            for term in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                digest = hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                matrix[row, value % self.dim] += 1.0 if value >> 63 else -1.0
+        return matrix
+
+
+def _default_embedder():
+    if os.getenv("KB_EMBEDDER", "ollama").lower() == "hashing":
+        return HashingEmbedder()
+    return OllamaEmbedder()
+
+
+class KnowledgeBase:
+    """Índice vectorial en disco de runbooks e incidentes"""
+
+    def __init__(
+        self,
+        index_dir: Optional[str] = None,
+        sources: Optional[Iterable[str]] = None,
+        incidents_dir: Optional[str] = None,
+        embedder=None
+    ):
+        """
+        Args:
+            index_dir: Carpeta del índice (KB_INDEX_DIR)
+            sources: Carpetas o archivos .md a indexar (KB_SOURCES, separadas por comas)
+            incidents_dir: Carpeta donde se guardan los incidentes resueltos
+                (KB_INCIDENTS_DIR)
+            embedder: Generador de embeddings (por defecto Ollama; KB_EMBEDDER=hashing
+                usa HashingEmbedder)
+        """
+        self.index_dir = index_dir or os.getenv("KB_INDEX_DIR", DEFAULT_INDEX_DIR)
+        self.sources = list(sources) if sources is not None else [
+            s.strip() for s in os.getenv("KB_SOURCES", DEFAULT_SOURCES).split(",") if s.strip()
+        ]
+        self.incidents_dir = incidents_dir or os.getenv("KB_INCIDENTS_DIR", DEFAULT_INCIDENTS_DIR)
+        if self.incidents_dir not in self.sources:
+            self.sources.append(self.incidents_dir)
+        self.embedder = embedder or _default_embedder()
+
+        self._vectors_path = os.path.join(self.index_dir, "vectors.npy")
+        self._meta_path = os.path.join(self.index_dir, "meta.json")
+
+        # chunks[i] describe la fila i de la matriz
+        self.chunks: List[Dict] = []
+        self.files: Dict[str, str] = {}  # ruta -> hash del contenido
+        self.vectors: Optional[np.ndarray] = None
+        self._lock = asyncio.Lock()
+
+        self.queries = 0
+        self.query_ms = 0.0
+
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def _load(self):
+        try:
+            with open(self._meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Índice de conocimiento ilegible, se reconstruirá: {e}")
+            return
+
+        if meta.get("embedder") != self.embedder.name:
+            logger.info("Cambió el modelo de embeddings: se reconstruirá el índice")
+            return
+
+        try:
+            vectors = np.load(self._vectors_path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudieron abrir los vectores del índice: {e}")
+            return
+        if len(vectors) != len(meta.get("chunks", [])):
+            logger.warning("Índice de conocimiento inconsistente, se reconstruirá")
+            return
+
+        self.chunks = meta["chunks"]
+        self.files = meta.get("files", {})
+        self.vectors = vectors
+
+    def _markdown_files(self) -> Dict[str, str]:
+        """Archivos .md de las fuentes configuradas -> contenido"""
+        found = {}
+        for source in self.sources:
+            if os.path.isfile(source) and source.endswith(".md"):
+                paths = [source]
+            elif os.path.isdir(source):
+                paths = [
+                    os.path.join(root, name)
+                    for root, _, names in os.walk(source)
+                    for name in names if name.endswith(".md")
+                ]
+            else:
+                continue
+            for path in sorted(paths):
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        found[os.path.normpath(path)] = f.read()
+                except OSError as e:
+                    logger.warning(f"No se pudo leer {path}: {e}")
+        return found
+
+    async def refresh(self) -> Dict:
+        """
+        Indexa de forma incremental las fuentes configuradas
+
+        Returns:
+            Resumen: fuentes nuevas/cambiadas/eliminadas y fragmentos embebidos
+        """
+        async with self._lock:
+            started = time.monotonic()
+            files = self._markdown_files()
+            hashes = {path: _sha(text) for path, text in files.items()}
+
+            changed = [p for p in files if self.files.get(p) != hashes[p]]
+            removed = [p for p in self.files if p not in files]
+            if not changed and not removed:
+                return {"changed": 0, "removed": 0, "embedded": 0, "chunks": len(self.chunks)}
+
+            # Vectores existentes reutilizables por hash de texto
+            reusable = {}
+            if self.vectors is not None:
+                for row, chunk in enumerate(self.chunks):
+                    reusable.setdefault(chunk["hash"], row)
+
+            dirty = set(changed) | set(removed)
+            kept = [(row, c) for row, c in enumerate(self.chunks) if c["source"] not in dirty]
+
+            new_chunks = []
+            for path in changed:
+                for chunk in chunk_markdown(files[path]):
+                    text = f"{chunk['title']}\n{chunk['text']}"
+                    new_chunks.append({
+                        "source": path,
+                        "title": chunk["title"],
+                        "text": chunk["text"],
+                        "hash": _sha(text)
+                    })
+
+            to_embed = [c for c in new_chunks if c["hash"] not in reusable]
+            embedded = {}
+            if to_embed:
+                matrix = await self.embedder.embed([f"{c['title']}\n{c['text']}" for c in to_embed])
+                for chunk, vector in zip(to_embed, _normalize(matrix)):
+                    embedded[chunk["hash"]] = vector
+
+            rows = []
+            for row, _ in kept:
+                rows.append(np.asarray(self.vectors[row]))
+            for chunk in new_chunks:
+                if chunk["hash"] in embedded:
+                    rows.append(embedded[chunk["hash"]])
+                else:
+                    rows.append(np.asarray(self.vectors[reusable[chunk["hash"]]]))
+
+            chunks = [c for _, c in kept] + new_chunks
+            vectors = np.vstack(rows).astype(np.float32) if rows else np.zeros((0, 0), np.float32)
+
+            self._save(chunks, hashes, vectors)
+            summary = {
+                "changed": len(changed),
+                "removed": len(removed),
+                "embedded": len(to_embed),
+                "chunks": len(self.chunks),
+                "seconds": round(time.monotonic() - started, 2)
+            }
+            logger.info(f"📚 Base de conocimiento actualizada: {summary}")
+            return summary
+
+    def _save(self, chunks: List[Dict], files: Dict[str, str], vectors: np.ndarray):
+        """Escribe índice y metadatos de forma atómica y vuelve a mapearlos"""
+        os.makedirs(self.index_dir, exist_ok=True)
+
+        tmp_vectors = f"{self._vectors_path}.tmp.npy"
+        np.save(tmp_vectors, vectors)
+        os.replace(tmp_vectors, self._vectors_path)
+
+        tmp_meta = f"{self._meta_path}.tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({
+                "embedder": self.embedder.name,
+                "updated_at": datetime.now().isoformat(),
+                "files": files,
+                "chunks": chunks
+            }, f, ensure_ascii=False)
+        os.replace(tmp_meta, self._meta_path)
+
+        self.chunks = chunks
+        self.files = files
+        self.vectors = np.load(self._vectors_path, mmap_mode="r") if len(chunks) else None
+
+    async def record_incident(self, title: str, body: str) -> str:
+        """
+        Guarda un incidente resuelto como markdown y lo indexa
+
+        Returns:
+            Ruta del archivo creado
+        """
+        os.makedirs(self.incidents_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        slug = re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-")[:60] or "incidente"
+        path = os.path.join(self.incidents_dir, f"{stamp}-{slug}.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"# Incidente: {title}\n\n_{datetime.now().isoformat(timespec='seconds')}_\n\n{body.strip()}\n")
+        await self.refresh()
+        return path
+
+    async def search(self, query: str, k: Optional[int] = None, min_score: Optional[float] = None) -> List[SearchResult]:
+        """Embebe la consulta y devuelve los fragmentos más similares"""
+        if self.vectors is None or not len(self.chunks):
+            return []
+        vector = await self.embedder.embed([query])
+        return self.search_vector(vector[0], k, min_score)
+
+    def search_vector(
+        self,
+        vector: np.ndarray,
+        k: Optional[int] = None,
+        min_score: Optional[float] = None
+    ) -> List[SearchResult]:
+        """Top-k por similitud coseno para un vector ya calculado"""
+        if self.vectors is None or not len(self.chunks):
+            return []
+        k = k or int(os.getenv("KB_TOP_K", DEFAULT_TOP_K))
+        min_score = float(os.getenv("KB_MIN_SCORE", DEFAULT_MIN_SCORE)) if min_score is None else min_score
+
+        started = time.perf_counter()
+        query = _normalize(np.asarray(vector, dtype=np.float32)[None, :])[0]
+        scores = self.vectors @ query
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = [
+            SearchResult(float(scores[i]), self.chunks[i]["source"], self.chunks[i]["title"], self.chunks[i]["text"])
+            for i in top if scores[i] >= min_score
+        ]
+        self.queries += 1
+        self.query_ms += (time.perf_counter() - started) * 1000
+        return results
+
+    def stats(self) -> Dict:
+        return {
+            "chunks": len(self.chunks),
+            "sources": len(self.files),
+            "embedder": self.embedder.name,
+            "dim": int(self.vectors.shape[1]) if self.vectors is not None else None,
+            "queries": self.queries,
+            "avg_query_ms": round(self.query_ms / self.queries, 3) if self.queries else None
+        }
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+# Benchmark de búsqueda
+if __name__ == "__main__":
+    import tempfile
+
+    async def bench():
+        print("📚 Benchmark de KnowledgeBase\n")
+        with tempfile.TemporaryDirectory() as tmp:
+            docs = os.path.join(tmp, "docs")
+            os.makedirs(docs)
+            rng = np.random.default_rng(0)
+            words = [f"w{i}" for i in range(3000)]
+            for n in range(200):
+                with open(os.path.join(docs, f"runbook-{n}.md"), "w", encoding="utf-8") as f:
+                    for s in range(25):
+                        f.write(f"## Sección {s}\n\n{' '.join(rng.choice(words, 80))}\n\n")
+
+            kb = KnowledgeBase(index_dir=os.path.join(tmp, "kb"), sources=[docs],
+                               incidents_dir=os.path.join(tmp, "inc"), embedder=HashingEmbedder())
+            print(f"Indexación completa: {await kb.refresh()}")
+
+            with open(os.path.join(docs, "runbook-0.md"), "a", encoding="utf-8") as f:
+                f.write("## Nueva sección\n\npostgres connection refused\n")
+            print(f"Indexación incremental: {await kb.refresh()}")
+
+            vectors = await kb.embedder.embed([" ".join(rng.choice(words, 10)) for _ in range(200)])
+            timings = []
+            for vector in vectors:
+                started = time.perf_counter()
+                kb.search_vector(vector, k=5, min_score=0)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            print(f"Búsqueda top-5 sobre {len(kb)} fragmentos: "
+                  f"p50 {timings[len(timings) // 2]:.3f} ms, p99 {timings[int(len(timings) * 0.99)]:.3f} ms")
+
+    asyncio.run(bench())
@@ -0,0 +1,247 @@
+"""
+Caché de respuestas del LLM
+
+La clave combina la pregunta normalizada con un hash del estado de la
+infraestructura (``ContextBuilder.snapshot``: compose -> estado y
+recursos, sin depender de la pregunta ni de la hora). Cuando el estado
+cambia, cambia el hash: las entradas ligadas al contexto anterior ya no
+pueden acertar y se descartan. Las preguntas sin contexto (conceptos de Docker, análisis
+de errores) no dependen del estado y sobreviven a esos cambios.
+
+Expulsión LRU con tope de entradas y TTL por entrada. Opcionalmente se
+persiste en un archivo JSON para conservar la caché entre reinicios.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL = 3600.0  # segundos
+
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = "¿?¡!.,;: "
+
+
+def normalize_question(question: str) -> str:
+    """Minúsculas, sin tildes, espacios colapsados y sin puntuación en los extremos"""
+    text = unicodedata.normalize("NFKD", question)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _WHITESPACE.sub(" ", text.lower())
+    return text.strip(_EDGE_PUNCTUATION)
+
+
+def context_hash(context_text: Optional[str]) -> str:
+    """Hash de la firma de estado ("" si no hay contexto)"""
+    if not context_text:
+        return ""
+    return hashlib.sha256(context_text.encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    """Caché LRU + TTL de respuestas, invalidada por cambios de contexto"""
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        path: Optional[str] = None
+    ):
+        """
+        Args:
+            max_entries: Máximo de respuestas guardadas; 0 desactiva la caché
+                (LLM_CACHE_SIZE)
+            ttl: Segundos de validez de cada respuesta (LLM_CACHE_TTL)
+            path: Archivo JSON para persistir la caché; vacío = solo memoria
+                (LLM_CACHE_PATH)
+        """
+        self.max_entries = int(os.getenv("LLM_CACHE_SIZE", DEFAULT_MAX_ENTRIES)) \
+            if max_entries is None else max_entries
+        self.ttl = ttl or float(os.getenv("LLM_CACHE_TTL", DEFAULT_TTL))
+        self.path = path if path is not None else os.getenv("LLM_CACHE_PATH", "")
+
+        # clave -> {"response", "context", "created", "generation_s"}
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        # Hash del contexto más reciente visto
+        self._context: Optional[str] = None
+        self._dirty = False
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.gpu_seconds_saved = 0.0
+
+        if self.path:
+            self.load()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(question: str, context_digest: str) -> str:
+        raw = f"{normalize_question(question)}\0{context_digest}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, question: str, context_text: Optional[str] = None) -> Optional[str]:
+        """Respuesta guardada para la pregunta y el contexto, o None"""
+        if not self.enabled:
+            return None
+
+        digest = context_hash(context_text)
+        self._observe_context(digest)
+
+        key = self.make_key(question, digest)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if time.time() - entry["created"] > self.ttl:
+            del self._entries[key]
+            self._dirty = True
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self.gpu_seconds_saved += entry["generation_s"]
+        return entry["response"]
+
+    def put(
+        self,
+        question: str,
+        context_text: Optional[str],
+        response: str,
+        generation_s: float = 0.0
+    ):
+        """
+        Guarda una respuesta
+
+        Args:
+            question: Pregunta original
+            context_text: Firma del estado con el que se respondió
+            response: Respuesta generada
+            generation_s: Segundos que tardó la generación (para medir el ahorro)
+        """
+        if not self.enabled or not response:
+            return
+
+        digest = context_hash(context_text)
+        self._observe_context(digest)
+
+        key = self.make_key(question, digest)
+        self._entries[key] = {
+            "response": response,
+            "context": digest,
+            "created": time.time(),
+            "generation_s": round(generation_s, 3)
+        }
+        self._entries.move_to_end(key)
+        self._dirty = True
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _observe_context(self, digest: str):
+        """Descarta las entradas del contexto anterior cuando el estado cambia"""
+        if not digest or digest == self._context:
+            return
+
+        previous, self._context = self._context, digest
+        if previous is None:
+            return
+
+        stale = [key for key, entry in self._entries.items() if entry["context"] == previous]
+        for key in stale:
+            del self._entries[key]
+        if stale:
+            self._dirty = True
+            self.invalidations += len(stale)
+            logger.debug(f"Caché LLM: {len(stale)} respuestas invalidadas por cambio de estado")
+
+    def invalidate(self, include_static: bool = False):
+        """
+        Descarta las respuestas que dependen del estado de la infraestructura
+
+        Args:
+            include_static: Si es True, vacía también las respuestas sin contexto
+        """
+        before = len(self._entries)
+        if include_static:
+            self._entries.clear()
+        else:
+            for key in [k for k, e in self._entries.items() if e["context"]]:
+                del self._entries[key]
+        removed = before - len(self._entries)
+        if removed:
+            self._dirty = True
+            self.invalidations += removed
+
+    def load(self):
+        """Carga la caché desde disco, ignorando entradas vencidas"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo leer la caché LLM {self.path}: {e}")
+            return
+
+        now = time.time()
+        self._context = data.get("context")
+        for key, entry in data.get("entries", []):
+            if now - entry.get("created", 0) <= self.ttl:
+                self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        logger.info(f"💾 Caché LLM cargada: {len(self._entries)} respuestas")
+
+    def save(self):
+        """Escribe la caché a disco si cambió (escritura atómica)"""
+        if not self.path or not self._dirty:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({
+                    "context": self._context,
+                    "entries": list(self._entries.items())
+                }, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"No se pudo guardar la caché LLM {self.path}: {e}")
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "gpu_seconds_saved": round(self.gpu_seconds_saved, 1),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,247 @@
+"""
+Planificador de peticiones al LLM
+
+Ollama sirve un único modelo en una sola GPU: si cada mensaje de Telegram
+lanza su propia generación, todas compiten entre sí y la latencia de todos
+los usuarios empeora. ``LLMScheduler`` limita las generaciones simultáneas
+(``max_in_flight``) y ordena la espera:
+
+- Prioridad: los análisis de incidentes pasan antes que la conversación, y
+  esta antes que las tareas de fondo (resúmenes de historial).
+- Equidad: dentro de una misma prioridad, la primera petición pendiente de
+  cada usuario va antes que la segunda de cualquier otro.
+- Posición en cola: quien espera recibe su posición cada vez que cambia.
+- Timeouts de espera en cola y de ejecución.
+- ``supersede``: un mensaje nuevo de un usuario cancela su petición anterior.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INCIDENT = 0
+PRIORITY_CHAT = 10
+PRIORITY_BACKGROUND = 20
+
+DEFAULT_MAX_IN_FLIGHT = 1
+DEFAULT_QUEUE_TIMEOUT = 120.0  # segundos
+DEFAULT_REQUEST_TIMEOUT = 300.0  # segundos
+
+# Muestras de espera guardadas para calcular percentiles
+WAIT_WINDOW = 500
+
+
+class QueueTimeout(TimeoutError):
+    """La petición no consiguió turno a tiempo"""
+
+
+class _Request:
+    __slots__ = ("key", "user_id", "granted", "cancelled")
+
+    def __init__(self, key: tuple, user_id):
+        self.key = key
+        self.user_id = user_id
+        self.granted = False
+        self.cancelled = False
+
+    def __lt__(self, other: "_Request") -> bool:
+        return self.key < other.key
+
+
+class LLMScheduler:
+    """Limita y ordena las generaciones concurrentes contra el modelo"""
+
+    def __init__(
+        self,
+        max_in_flight: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        request_timeout: Optional[float] = None
+    ):
+        """
+        Args:
+            max_in_flight: Generaciones simultáneas (LLM_MAX_IN_FLIGHT)
+            queue_timeout: Segundos máximos esperando turno (LLM_QUEUE_TIMEOUT)
+            request_timeout: Segundos máximos por generación (LLM_REQUEST_TIMEOUT)
+        """
+        self.max_in_flight = max_in_flight or int(
+            os.getenv("LLM_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT)
+        )
+        self.queue_timeout = queue_timeout or float(
+            os.getenv("LLM_QUEUE_TIMEOUT", DEFAULT_QUEUE_TIMEOUT)
+        )
+        self.request_timeout = request_timeout or float(
+            os.getenv("LLM_REQUEST_TIMEOUT", DEFAULT_REQUEST_TIMEOUT)
+        )
+
+        self._cond = asyncio.Condition()
+        self._queue: List[_Request] = []
+        self._seq = itertools.count()
+        self._pending_by_user: Dict[object, int] = {}
+        self._active_by_user: Dict[object, asyncio.Task] = {}
+        self.in_flight = 0
+
+        self.completed = 0
+        self.cancelled = 0
+        self.superseded = 0
+        self.queue_timeouts = 0
+        self.request_timeouts = 0
+        self.waits: Deque[float] = deque(maxlen=WAIT_WINDOW)
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for r in self._queue if not r.cancelled)
+
+    def supersede(self, user_id):
+        """
+        Registra la tarea actual como la petición vigente del usuario
+
+        Si el usuario tenía otra petición en curso (en cola o generando),
+        se cancela su tarea.
+        """
+        if user_id is None:
+            return
+
+        current = asyncio.current_task()
+        previous = self._active_by_user.get(user_id)
+        if previous is not None and previous is not current and not previous.done():
+            previous.cancel()
+            self.superseded += 1
+            logger.info(f"⏭️ Petición anterior del usuario {user_id} reemplazada")
+
+        self._active_by_user[user_id] = current
+
+        def _forget(task: asyncio.Task, user_id=user_id):
+            if self._active_by_user.get(user_id) is task:
+                del self._active_by_user[user_id]
+
+        current.add_done_callback(_forget)
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        user_id=None,
+        priority: int = PRIORITY_CHAT,
+        on_position: Optional[Callable[[int], Awaitable]] = None
+    ) -> AsyncIterator[None]:
+        """
+        Espera turno y lo mantiene mientras dura el bloque
+
+        Args:
+            user_id: Usuario que origina la petición (para la equidad)
+            priority: Menor = antes (PRIORITY_INCIDENT, PRIORITY_CHAT,
+                PRIORITY_BACKGROUND)
+            on_position: Corrutina que recibe la posición en cola cuando cambia
+
+        Raises:
+            QueueTimeout: si no hay turno en ``queue_timeout`` segundos
+            TimeoutError: si el bloque supera ``request_timeout`` segundos
+        """
+        await self._acquire(user_id, priority, on_position)
+        try:
+            async with asyncio.timeout(self.request_timeout):
+                yield
+        except TimeoutError:
+            self.request_timeouts += 1
+            raise
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        else:
+            self.completed += 1
+        finally:
+            await self._release()
+
+    async def _acquire(self, user_id, priority: int, on_position):
+        ahead = self._pending_by_user.get(user_id, 0)
+        request = _Request((priority, ahead, next(self._seq)), user_id)
+        self._pending_by_user[user_id] = ahead + 1
+        enqueued_at = time.monotonic()
+
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                heapq.heappush(self._queue, request)
+                last = None
+                while True:
+                    async with self._cond:
+                        self._dispatch()
+                        while not request.granted and self._position(request) == last:
+                            await self._cond.wait()
+                        if request.granted:
+                            break
+                        position = self._position(request)
+                    last = position
+                    if on_position is not None:
+                        try:
+                            await on_position(position)
+                        except Exception as e:
+                            logger.debug(f"Error al notificar posición en cola: {e}")
+        except BaseException as e:
+            if request.granted:
+                # El turno llegó junto con la cancelación: devolverlo
+                await self._release()
+            else:
+                request.cancelled = True
+                async with self._cond:
+                    self._cond.notify_all()
+            if isinstance(e, TimeoutError):
+                self.queue_timeouts += 1
+                raise QueueTimeout("Sin turno para el modelo") from None
+            if isinstance(e, asyncio.CancelledError):
+                self.cancelled += 1
+            raise
+        finally:
+            remaining = self._pending_by_user.get(user_id, 1) - 1
+            if remaining > 0:
+                self._pending_by_user[user_id] = remaining
+            else:
+                self._pending_by_user.pop(user_id, None)
+
+        self.waits.append(time.monotonic() - enqueued_at)
+
+    def _dispatch(self):
+        """Concede turnos mientras haya capacidad (con el lock tomado)"""
+        granted = False
+        while self._queue and self.in_flight < self.max_in_flight:
+            request = heapq.heappop(self._queue)
+            if request.cancelled:
+                continue
+            request.granted = True
+            self.in_flight += 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def _position(self, request: _Request) -> int:
+        """Posición (desde 1) entre las peticiones que esperan"""
+        return 1 + sum(
+            1 for other in self._queue
+            if not other.cancelled and other.key < request.key
+        )
+
+    async def _release(self):
+        async with self._cond:
+            self.in_flight -= 1
+            self._dispatch()
+            self._cond.notify_all()
+
+    def stats(self) -> Dict:
+        waits = sorted(self.waits)
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "superseded": self.superseded,
+            "queue_timeouts": self.queue_timeouts,
+            "request_timeouts": self.request_timeouts,
+            "wait_avg_s": round(sum(waits) / len(waits), 2) if waits else None,
+            "wait_p95_s": round(waits[max(0, int(round(0.95 * len(waits))) - 1)], 2) if waits else None
+        }
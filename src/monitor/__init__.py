@@ -2,5 +2,46 @@
 Monitoring module
 """
 from .service_monitor import ServiceMonitor
+from .scheduler import AdaptiveScheduler
+from .dispatcher import (
+    EventDispatcher,
+    NotificationSink,
+    CallbackSink,
+    LogSink,
+    TelegramSink,
+    WebhookSink,
+)
+from .alerts import AlertAggregator
+from .history import HistoryStore
+from .analytics import UptimeAnalytics
+from .logs import LogCollector, LogTemplateMiner
+from .metrics import MetricsCollector, MetricSeries
+from .anomaly import AnomalyDetector
+from .remediation import RemediationEngine
+from .deploy_tracker import DeployTracker
+from .bulk import BulkExecutor, ExecutionPlan
+from .incidents import IncidentRecorder
 
-__all__ = ["ServiceMonitor"]
+__all__ = [
+    "ServiceMonitor",
+    "AdaptiveScheduler",
+    "EventDispatcher",
+    "NotificationSink",
+    "CallbackSink",
+    "LogSink",
+    "TelegramSink",
+    "WebhookSink",
+    "AlertAggregator",
+    "HistoryStore",
+    "UptimeAnalytics",
+    "LogCollector",
+    "LogTemplateMiner",
+    "MetricsCollector",
+    "MetricSeries",
+    "AnomalyDetector",
+    "RemediationEngine",
+    "DeployTracker",
+    "BulkExecutor",
+    "ExecutionPlan",
+    "IncidentRecorder",
+]
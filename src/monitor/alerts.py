@@ -0,0 +1,240 @@
+"""
+Agregación de alertas: deduplicación, supresión de flapping y resúmenes
+
+``AlertAggregator`` es un sink del dispatcher que no envía cada evento:
+los acumula por compose y cada ``flush_interval`` segundos entrega un único
+resumen. Así el volumen de mensajes salientes queda acotado a uno por
+intervalo, sea cual sea el tamaño de la flota o la cantidad de transiciones.
+
+- Varias transiciones de un mismo compose en un intervalo se colapsan en
+  una línea ``A → C (N cambios)``.
+- Un compose con ``flap_threshold`` transiciones dentro de ``flap_window``
+  segundos se marca como oscilante y se informa una sola vez hasta que se
+  estabilice.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import Counter, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+from .dispatcher import NotificationSink, format_event
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 30.0  # segundos
+DEFAULT_FLAP_THRESHOLD = 4  # transiciones
+DEFAULT_FLAP_WINDOW = 600.0  # segundos
+DEFAULT_MAX_LINES = 20
+
+
+class AlertAggregator(NotificationSink):
+    """Sink que agrupa eventos y entrega resúmenes periódicos"""
+
+    name = "alerts"
+
+    def __init__(
+        self,
+        deliver: Callable[[str], Awaitable],
+        flush_interval: Optional[float] = None,
+        flap_threshold: Optional[int] = None,
+        flap_window: Optional[float] = None,
+        max_lines: int = DEFAULT_MAX_LINES,
+        **kwargs
+    ):
+        """
+        Args:
+            deliver: Corrutina que envía el texto del resumen (p. ej. a cada chat)
+            flush_interval: Segundos entre resúmenes (ALERT_FLUSH_INTERVAL)
+            flap_threshold: Transiciones que marcan un compose como oscilante
+                (ALERT_FLAP_THRESHOLD)
+            flap_window: Ventana en segundos para contar transiciones
+                (ALERT_FLAP_WINDOW)
+            max_lines: Máximo de líneas por resumen
+        """
+        super().__init__(**kwargs)
+        self.deliver = deliver
+        self.flush_interval = flush_interval or float(
+            os.getenv("ALERT_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL)
+        )
+        self.flap_threshold = flap_threshold or int(
+            os.getenv("ALERT_FLAP_THRESHOLD", DEFAULT_FLAP_THRESHOLD)
+        )
+        self.flap_window = flap_window or float(
+            os.getenv("ALERT_FLAP_WINDOW", DEFAULT_FLAP_WINDOW)
+        )
+        self.max_lines = max_lines
+
+        # Alertas pendientes del intervalo actual, por compose
+        self._pending: Dict[str, Dict] = {}
+        # Instantes de las últimas transiciones por compose
+        self._history: Dict[str, Deque[float]] = {}
+        # Composes oscilantes -> último estado visto
+        self._flapping: Dict[str, Dict] = {}
+
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self.received = 0
+        self.digests_sent = 0
+
+    async def send(self, event: Dict):
+        """Registra el evento; el envío real ocurre en el próximo flush"""
+        self.add(event)
+
+    def add(self, event: Dict, now: Optional[float] = None):
+        """Acumula un evento en el resumen pendiente"""
+        now = time.monotonic() if now is None else now
+        self.received += 1
+        self._ensure_flush_task()
+
+        compose_id = event.get("compose_id")
+        pending = self._pending.get(compose_id)
+        if pending is None:
+            pending = self._pending[compose_id] = {
+                "name": event.get("name", "Unknown"),
+                "project_name": event.get("project_name", "Unknown"),
+                "from": None,
+                "to": None,
+                "changes": 0,
+                "other": Counter()
+            }
+
+        if event.get("event", "status_change") != "status_change":
+            pending["other"][format_event(event)] += 1
+            return
+
+        if pending["changes"] == 0:
+            pending["from"] = event.get("previous_status")
+        pending["to"] = event.get("status")
+        # Un evento fusionado por el dispatcher cuenta todas sus transiciones
+        transitions = event.get("transitions", 1)
+        pending["changes"] += transitions
+
+        history = self._history.setdefault(compose_id, deque(maxlen=self.flap_threshold * 4))
+        history.extend([now] * transitions)
+        self._trim(history, now)
+
+        if len(history) >= self.flap_threshold:
+            flapping = self._flapping.setdefault(compose_id, {
+                "name": pending["name"],
+                "project_name": pending["project_name"],
+                "reported": False
+            })
+            flapping["status"] = pending["to"]
+        elif compose_id in self._flapping:
+            self._flapping[compose_id]["status"] = pending["to"]
+
+    def _trim(self, history: Deque[float], now: float):
+        while history and now - history[0] > self.flap_window:
+            history.popleft()
+
+    def build_digest(self, now: Optional[float] = None) -> Optional[str]:
+        """Construye el texto del resumen y vacía lo pendiente"""
+        now = time.monotonic() if now is None else now
+        lines: List[str] = []
+
+        for compose_id, pending in self._pending.items():
+            name = f"{pending['name']} ({pending['project_name']})"
+
+            flapping = self._flapping.get(compose_id)
+
+            if pending["changes"]:
+                if flapping is not None:
+                    # Un solo aviso por episodio de oscilación
+                    if not flapping["reported"]:
+                        flapping["reported"] = True
+                        window = self.flap_window / 60
+                        recent = len(self._history.get(compose_id, ()))
+                        lines.append(
+                            f"⚠️ {name} oscilando: {recent} cambios en {round(window, 1):g} min, "
+                            f"ahora {pending['to']}"
+                        )
+                elif pending["changes"] == 1:
+                    lines.append(f"🔄 {name}: {pending['from']} → {pending['to']}")
+                else:
+                    lines.append(
+                        f"🔄 {name}: {pending['from']} → {pending['to']} "
+                        f"({pending['changes']} cambios)"
+                    )
+
+            for line, count in pending["other"].items():
+                lines.append(line if count == 1 else f"{line} (x{count})")
+
+        # Composes que dejaron de oscilar
+        for compose_id in list(self._flapping):
+            history = self._history.get(compose_id)
+            if history is not None:
+                self._trim(history, now)
+            if history and len(history) >= self.flap_threshold:
+                continue
+            flapping = self._flapping.pop(compose_id)
+            if flapping["reported"]:
+                lines.append(
+                    f"✅ {flapping['name']} ({flapping['project_name']}) "
+                    f"estable de nuevo: {flapping['status']}"
+                )
+
+        # Liberar historiales de composes sin transiciones recientes
+        for compose_id in list(self._history):
+            history = self._history[compose_id]
+            self._trim(history, now)
+            if not history:
+                del self._history[compose_id]
+
+        self._pending = {}
+
+        if not lines:
+            return None
+        if len(lines) == 1:
+            return lines[0]
+
+        extra = len(lines) - self.max_lines
+        shown = lines[:self.max_lines]
+        if extra > 0:
+            shown.append(f"... y {extra} alertas más")
+        return f"📋 Resumen de alertas ({len(lines)}):\n\n" + "\n".join(shown)
+
+    async def flush(self):
+        """Envía el resumen pendiente, si lo hay"""
+        digest = self.build_digest()
+        if digest is None:
+            return
+        try:
+            await self.deliver(digest)
+            self.digests_sent += 1
+        except Exception as e:
+            logger.error(f"Error al enviar resumen de alertas: {e}")
+
+    def _ensure_flush_task(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        """Envía un resumen cada flush_interval mientras haya actividad"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if not self._pending and not self._flapping:
+                # Sin actividad: el próximo evento vuelve a arrancar el loop
+                self._flush_task = None
+                return
+
+    async def aclose(self):
+        """Detiene el loop y entrega lo que quede pendiente"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    def stats(self) -> Dict:
+        return {
+            "received": self.received,
+            "digests_sent": self.digests_sent,
+            "pending_composes": len(self._pending),
+            "flapping": len(self._flapping)
+        }
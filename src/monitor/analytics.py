@@ -0,0 +1,384 @@
+"""
+Analítica de disponibilidad (uptime, MTTR, MTBF) sobre el historial
+
+Las transiciones del ``HistoryStore`` se resumen de forma incremental en
+buckets horarios y diarios por compose (tabla ``uptime_rollups``). Una
+consulta sobre una ventana arbitraria suma los días completos, las horas
+de los bordes y solo recorre en crudo las transiciones posteriores a la
+última hora cerrada, de modo que 90 días se responden leyendo unos pocos
+cientos de filas.
+
+Una hora se resume ``rollup_lag`` segundos después de cerrarse, para que
+las transiciones que llegan con retraso al historial entren en su bucket.
+
+Un compose se considera caído mientras su estado está en ``DOWN_STATUSES``.
+El inicio de la ventana se redondea a la hora.
+"""
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .history import HistoryStore
+
+HOUR = 3600
+DAY = 86400
+
+DEFAULT_ROLLUP_LAG = 600  # segundos
+
+# Estados que cuentan como caída
+DOWN_STATUSES = {"error"}
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uptime_rollups (
+    granularity INTEGER NOT NULL,
+    compose_id TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    up_s INTEGER NOT NULL DEFAULT 0,
+    down_s INTEGER NOT NULL DEFAULT 0,
+    failures INTEGER NOT NULL DEFAULT 0,
+    recoveries INTEGER NOT NULL DEFAULT 0,
+    outage_s INTEGER NOT NULL DEFAULT 0,
+    max_outage_s INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (granularity, bucket, compose_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS uptime_state (
+    compose_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    since INTEGER NOT NULL,
+    outage_start INTEGER
+);
+CREATE TABLE IF NOT EXISTS uptime_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Índices de las métricas dentro de cada bucket
+UP, DOWN, FAILURES, RECOVERIES, OUTAGE, MAX_OUTAGE = range(6)
+
+
+def _new_bucket() -> List[int]:
+    return [0, 0, 0, 0, 0, 0]
+
+
+def _merge(target: List[int], source: Iterable[int]):
+    for i, value in enumerate(source):
+        if i == MAX_OUTAGE:
+            target[i] = max(target[i], value)
+        else:
+            target[i] += value
+
+
+class _Accumulator:
+    """Máquina de estados que reparte el tiempo de cada compose en buckets"""
+
+    def __init__(self, state: Dict[str, List], granularities: Tuple[int, ...]):
+        # compose_id -> [status, since, outage_start]
+        self.state = state
+        self.granularities = granularities
+        # (granularity, bucket, compose_id) -> métricas
+        self.buckets: Dict[Tuple[int, int, str], List[int]] = {}
+
+    def _bucket(self, granularity: int, ts: int, compose_id: str) -> List[int]:
+        key = (granularity, ts - ts % granularity, compose_id)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = _new_bucket()
+        return bucket
+
+    def _spend(self, compose_id: str, status: str, start: int, end: int):
+        """Suma [start, end) como tiempo arriba o abajo"""
+        index = DOWN if status in DOWN_STATUSES else UP
+        for granularity in self.granularities:
+            ts = start
+            while ts < end:
+                boundary = min(end, ts - ts % granularity + granularity)
+                self._bucket(granularity, ts, compose_id)[index] += boundary - ts
+                ts = boundary
+
+    def _count(self, compose_id: str, ts: int, index: int, value: int = 1):
+        for granularity in self.granularities:
+            bucket = self._bucket(granularity, ts, compose_id)
+            if index == MAX_OUTAGE:
+                bucket[index] = max(bucket[index], value)
+            else:
+                bucket[index] += value
+
+    def apply(self, ts: int, compose_id: str, event: str, status: Optional[str]):
+        """Incorpora una transición del historial"""
+        current = self.state.get(compose_id)
+
+        if current is not None:
+            self._spend(compose_id, current[0], current[1], ts)
+            current[1] = ts
+
+        if event == "removed":
+            self.state.pop(compose_id, None)
+            return
+        if status is None or event not in ("baseline", "added", "status_change"):
+            return
+
+        if current is None:
+            outage_start = ts if status in DOWN_STATUSES else None
+            if outage_start is not None:
+                self._count(compose_id, ts, FAILURES)
+            self.state[compose_id] = [status, ts, outage_start]
+            return
+
+        was_down = current[0] in DOWN_STATUSES
+        is_down = status in DOWN_STATUSES
+        if is_down and not was_down:
+            self._count(compose_id, ts, FAILURES)
+            current[2] = ts
+        elif was_down and not is_down and current[2] is not None:
+            duration = ts - current[2]
+            self._count(compose_id, ts, RECOVERIES)
+            self._count(compose_id, ts, OUTAGE, duration)
+            self._count(compose_id, ts, MAX_OUTAGE, duration)
+            current[2] = None
+        current[0] = status
+
+    def close(self, end: int):
+        """Acumula hasta ``end`` el tiempo de todos los composes seguidos"""
+        for compose_id, current in self.state.items():
+            if current[1] < end:
+                self._spend(compose_id, current[0], current[1], end)
+                current[1] = end
+
+
+class UptimeAnalytics:
+    """Uptime, MTTR, MTBF y caídas por compose y por proyecto"""
+
+    def __init__(self, history: HistoryStore, rollup_lag: Optional[float] = None):
+        """
+        Args:
+            history: Historial de transiciones
+            rollup_lag: Segundos que se espera tras el cierre de una hora antes
+                de resumirla, para que entren los eventos que seguían en la
+                cola del dispatcher o del HistoryStore (ANALYTICS_ROLLUP_LAG;
+                como mínimo dos volcados del historial)
+        """
+        self.history = history
+        self.rollup_lag = max(
+            rollup_lag or float(os.getenv("ANALYTICS_ROLLUP_LAG", DEFAULT_ROLLUP_LAG)),
+            2 * history.flush_interval
+        )
+
+    # ========== MANTENIMIENTO DE ROLLUPS ==========
+
+    async def refresh(self):
+        """Resume en buckets las transiciones hasta la última hora cerrada"""
+        await self.history.execute(self._refresh, int(time.time()))
+
+    def _refresh(self, conn, now: int):
+        conn.executescript(ROLLUP_SCHEMA)
+        # Una transición con ts anterior a la hora cerrada puede escribirse
+        # después (cola del dispatcher, lote pendiente del HistoryStore): esa
+        # hora solo se resume cuando pasó ``rollup_lag``
+        settled = int(now - self.rollup_lag)
+        closed = settled - settled % HOUR
+        watermark = self._watermark(conn)
+        if watermark is not None and watermark >= closed:
+            return
+
+        state = self._load_state(conn)
+        accumulator = _Accumulator(state, (HOUR, DAY))
+        rows = conn.execute(
+            "SELECT ts, compose_id, event, status FROM transitions "
+            "WHERE ts >= ? AND ts < ? ORDER BY ts, rowid",
+            (watermark or 0, closed)
+        )
+        for ts, compose_id, event, status in rows:
+            accumulator.apply(ts, compose_id, event, status)
+        accumulator.close(closed)
+
+        retention_cutoff = now - self.history.retention_days * DAY
+        with conn:
+            conn.executemany(
+                "INSERT INTO uptime_rollups (granularity, bucket, compose_id, up_s, down_s, "
+                "failures, recoveries, outage_s, max_outage_s) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (granularity, bucket, compose_id) DO UPDATE SET "
+                "up_s = up_s + excluded.up_s, down_s = down_s + excluded.down_s, "
+                "failures = failures + excluded.failures, "
+                "recoveries = recoveries + excluded.recoveries, "
+                "outage_s = outage_s + excluded.outage_s, "
+                "max_outage_s = MAX(max_outage_s, excluded.max_outage_s)",
+                [key + tuple(values) for key, values in accumulator.buckets.items()]
+            )
+            conn.execute("DELETE FROM uptime_state")
+            conn.executemany(
+                "INSERT INTO uptime_state (compose_id, status, since, outage_start) VALUES (?, ?, ?, ?)",
+                [(cid, s[0], s[1], s[2]) for cid, s in state.items()]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO uptime_meta (key, value) VALUES ('watermark', ?)",
+                (closed,)
+            )
+            conn.execute("DELETE FROM uptime_rollups WHERE bucket < ?", (retention_cutoff,))
+
+    @staticmethod
+    def _watermark(conn) -> Optional[int]:
+        row = conn.execute("SELECT value FROM uptime_meta WHERE key = 'watermark'").fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _load_state(conn) -> Dict[str, List]:
+        return {
+            cid: [status, since, outage_start]
+            for cid, status, since, outage_start in conn.execute(
+                "SELECT compose_id, status, since, outage_start FROM uptime_state"
+            )
+        }
+
+    # ========== CONSULTAS ==========
+
+    async def compose_stats(
+        self,
+        since: float,
+        until: Optional[float] = None,
+        compose_id: Optional[str] = None
+    ) -> Dict[str, Dict]:
+        """
+        Métricas por compose en la ventana [since, until)
+
+        Returns:
+            compose_id -> {name, project_name, uptime_pct, failures, mttr_s,
+            mtbf_s, longest_outage_s, down_s, up_s}
+        """
+        until = int(until or time.time())
+        await self.refresh()
+        totals = await self.history.execute(self._window_totals, int(since), until, compose_id)
+        return {cid: self._metrics(values) for cid, values in totals.items()}
+
+    async def project_stats(self, since: float, until: Optional[float] = None) -> Dict[str, Dict]:
+        """Métricas agregadas por proyecto en la ventana [since, until)"""
+        until = int(until or time.time())
+        await self.refresh()
+        totals = await self.history.execute(self._window_totals, int(since), until, None)
+
+        projects: Dict[str, Dict] = {}
+        for values in totals.values():
+            project = projects.setdefault(values["project_name"], {
+                "name": values["project_name"],
+                "project_name": values["project_name"],
+                "metrics": _new_bucket(),
+                "composes": 0
+            })
+            _merge(project["metrics"], values["metrics"])
+            project["composes"] += 1
+
+        result = {}
+        for name, project in projects.items():
+            metrics = self._metrics(project)
+            metrics["composes"] = project["composes"]
+            result[name] = metrics
+        return result
+
+    def _window_totals(self, conn, since: int, until: int, compose_id: Optional[str]) -> Dict[str, Dict]:
+        """Suma días completos + horas de borde + tramo en crudo posterior"""
+        watermark = self._watermark(conn) or 0
+        since -= since % HOUR
+        rolled_until = min(until - until % HOUR, watermark)
+
+        metrics: Dict[str, List[int]] = {}
+
+        def add(cid: str, values: Iterable[int]):
+            if compose_id is not None and cid != compose_id:
+                return
+            _merge(metrics.setdefault(cid, _new_bucket()), values)
+
+        if rolled_until > since:
+            first_day = since if since % DAY == 0 else since - since % DAY + DAY
+            last_day = rolled_until - rolled_until % DAY
+            ranges = []
+            if last_day > first_day:
+                ranges.append((DAY, first_day, last_day))
+                ranges.append((HOUR, since, first_day))
+                ranges.append((HOUR, last_day, rolled_until))
+            else:
+                ranges.append((HOUR, since, rolled_until))
+
+            for granularity, start, end in ranges:
+                if end <= start:
+                    continue
+                for row in conn.execute(
+                    "SELECT compose_id, up_s, down_s, failures, recoveries, outage_s, max_outage_s "
+                    "FROM uptime_rollups WHERE granularity = ? AND bucket >= ? AND bucket < ?",
+                    (granularity, start, end)
+                ):
+                    add(row[0], row[1:])
+
+        # Tramo posterior a la última hora resumida: simulación en memoria
+        ongoing = {}
+        if until > max(watermark, since):
+            state = self._load_state(conn)
+            accumulator = _Accumulator(state, (HOUR,))
+            rows = conn.execute(
+                "SELECT ts, compose_id, event, status FROM transitions "
+                "WHERE ts >= ? AND ts < ? ORDER BY ts, rowid",
+                (watermark, until)
+            )
+            for ts, cid, event, status in rows:
+                accumulator.apply(ts, cid, event, status)
+            accumulator.close(until)
+
+            # Solo cuentan las horas dentro de la ventana
+            for (_, bucket, cid), values in accumulator.buckets.items():
+                if bucket >= since:
+                    add(cid, values)
+
+            # Caídas todavía abiertas al final de la ventana
+            for cid, (_, _, outage_start) in state.items():
+                if outage_start is not None:
+                    ongoing[cid] = until - max(outage_start, since)
+
+        names = {
+            cid: (name, project)
+            for cid, name, project in conn.execute(
+                "SELECT compose_id, name, project_name FROM composes"
+            )
+        }
+
+        totals = {}
+        for cid, values in metrics.items():
+            values[MAX_OUTAGE] = max(values[MAX_OUTAGE], ongoing.get(cid, 0))
+            name, project = names.get(cid, ("Unknown", "Unknown"))
+            totals[cid] = {
+                "name": name,
+                "project_name": project,
+                "metrics": values,
+                "currently_down": cid in ongoing
+            }
+        return totals
+
+    @staticmethod
+    def _metrics(entry: Dict) -> Dict:
+        values = entry["metrics"]
+        observed = values[UP] + values[DOWN]
+        return {
+            "name": entry["name"],
+            "project_name": entry["project_name"],
+            "uptime_pct": round(values[UP] / observed * 100, 3) if observed else None,
+            "up_s": values[UP],
+            "down_s": values[DOWN],
+            "failures": values[FAILURES],
+            "recoveries": values[RECOVERIES],
+            "mttr_s": round(values[OUTAGE] / values[RECOVERIES]) if values[RECOVERIES] else None,
+            "mtbf_s": round(values[UP] / values[FAILURES]) if values[FAILURES] else None,
+            "longest_outage_s": values[MAX_OUTAGE],
+            "currently_down": entry.get("currently_down", False)
+        }
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """Duración legible: 45s, 12m, 3h 20m, 2d 4h"""
+    if seconds is None:
+        return "-"
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < HOUR:
+        return f"{seconds // 60}m"
+    if seconds < DAY:
+        return f"{seconds // HOUR}h {seconds % HOUR // 60}m"
+    return f"{seconds // DAY}d {seconds % DAY // HOUR}h"
@@ -0,0 +1,265 @@
+"""
+Detección de anomalías vectorizada sobre series del monitor
+
+El monitor solo reaccionaba a transiciones de estado: una fuga de memoria,
+un compose que cambia de estado cada vez más seguido o una API que se vuelve
+lenta pasaban desapercibidos hasta la caída. ``AnomalyDetector`` mantiene el
+estado estadístico de todas las series en arrays NumPy y las actualiza en
+una sola pasada por sweep (sin bucles de Python por serie):
+
+- Pico: z-score contra una media/varianza EWMA de la serie.
+- Línea base estacional: media/varianza EWMA por hora del día. Un pico que
+  es normal para esa hora (backups nocturnos, tráfico diurno) no se informa.
+- Deriva: la media EWMA se aleja de una línea base mucho más lenta (fugas
+  de memoria, latencia que crece, reinicios cada vez más frecuentes).
+
+Una anomalía se informa cuando se mantiene ``sustain`` sweeps seguidos y se
+da por resuelta cuando el puntaje baja de la mitad del umbral.
+"""
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_ALPHA = 0.05
+DEFAULT_BASELINE_HOURS = 24.0
+DEFAULT_SEASONAL_ALPHA = 0.3  # peso de cada día
+DEFAULT_Z_THRESHOLD = 4.0
+DEFAULT_DRIFT_THRESHOLD = 0.3
+DEFAULT_WARMUP = 30  # muestras
+DEFAULT_SUSTAIN = 2  # sweeps
+SEASONAL_WARMUP = 3  # muestras por hora del día
+# Piso de la desviación relativo a la media (series casi constantes)
+MIN_RELATIVE_STD = 0.02
+INITIAL_CAPACITY = 256
+
+
+class Anomaly(NamedTuple):
+    key: str
+    kind: str  # "spike" o "drift"
+    state: str  # "firing" o "resolved"
+    value: float
+    baseline: float
+    score: float
+
+
+class AnomalyDetector:
+    """Estadísticas móviles de muchas series actualizadas en lote"""
+
+    def __init__(
+        self,
+        alpha: Optional[float] = None,
+        z_threshold: Optional[float] = None,
+        drift_threshold: Optional[float] = None,
+        warmup: Optional[int] = None,
+        sustain: Optional[int] = None,
+        baseline_hours: Optional[float] = None,
+        seasonal_alpha: float = DEFAULT_SEASONAL_ALPHA
+    ):
+        """
+        Args:
+            alpha: Peso de cada muestra en la media EWMA (ANOMALY_ALPHA)
+            z_threshold: |z| a partir del cual una muestra es un pico (ANOMALY_Z)
+            drift_threshold: Desvío relativo de la media respecto de la línea
+                base lenta que se considera deriva (ANOMALY_DRIFT)
+            warmup: Muestras antes de evaluar una serie (ANOMALY_WARMUP)
+            sustain: Sweeps seguidos en anomalía antes de informarla
+                (ANOMALY_SUSTAIN)
+            baseline_hours: Constante de tiempo de la línea base lenta contra
+                la que se mide la deriva (ANOMALY_BASELINE_HOURS)
+            seasonal_alpha: Peso de cada día en la base de cada hora; las
+                muestras de una hora se reparten ese peso, así la base no
+                sigue una fuga dentro de la misma hora
+        """
+        self.alpha = alpha or float(os.getenv("ANOMALY_ALPHA", DEFAULT_ALPHA))
+        self.z_threshold = z_threshold or float(os.getenv("ANOMALY_Z", DEFAULT_Z_THRESHOLD))
+        self.drift_threshold = drift_threshold or float(
+            os.getenv("ANOMALY_DRIFT", DEFAULT_DRIFT_THRESHOLD)
+        )
+        self.warmup = warmup or int(os.getenv("ANOMALY_WARMUP", DEFAULT_WARMUP))
+        self.sustain = sustain or int(os.getenv("ANOMALY_SUSTAIN", DEFAULT_SUSTAIN))
+        self.baseline_hours = baseline_hours or float(
+            os.getenv("ANOMALY_BASELINE_HOURS", DEFAULT_BASELINE_HOURS)
+        )
+        self.seasonal_alpha = seasonal_alpha
+
+        self._index: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._last_keys: Optional[Sequence[str]] = None
+        self._last_idx: Optional[np.ndarray] = None
+        self._allocate(INITIAL_CAPACITY)
+
+        self._last_update: Optional[float] = None
+
+        self.updates = 0
+        self.fired = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _allocate(self, capacity: int):
+        old = getattr(self, "capacity", 0)
+
+        def grow(name: str, shape, dtype, fill=0):
+            array = np.full(shape, fill, dtype=dtype)
+            if old:
+                array[:old] = getattr(self, name)
+            setattr(self, name, array)
+
+        grow("n", capacity, np.int64)
+        grow("mean", capacity, np.float64)
+        grow("var", capacity, np.float64)
+        grow("base", capacity, np.float64)
+        grow("since", capacity, np.float64)
+        grow("season_mean", (capacity, 24), np.float64)
+        grow("season_var", (capacity, 24), np.float64)
+        grow("season_n", (capacity, 24), np.int32)
+        grow("spike_streak", capacity, np.int32)
+        grow("drift_streak", capacity, np.int32)
+        grow("spike_active", capacity, bool, False)
+        grow("drift_active", capacity, bool, False)
+        self.capacity = capacity
+
+    def _indices(self, keys: Sequence[str]) -> np.ndarray:
+        # Entre sweeps las claves suelen ser las mismas: reutilizar los índices
+        if self._last_keys is not None and len(keys) == len(self._last_keys) and list(keys) == list(self._last_keys):
+            return self._last_idx
+
+        idx = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            position = self._index.get(key)
+            if position is None:
+                position = self._index[key] = len(self._keys)
+                self._keys.append(key)
+            idx[i] = position
+        if len(self._keys) > self.capacity:
+            self._allocate(max(self.capacity * 2, len(self._keys)))
+
+        self._last_keys, self._last_idx = list(keys), idx
+        return idx
+
+    def update(
+        self,
+        keys: Sequence[str],
+        values,
+        now: Optional[float] = None,
+        min_std=0.0
+    ) -> List[Anomaly]:
+        """
+        Incorpora una muestra por serie y devuelve las anomalías nuevas o resueltas
+
+        Args:
+            keys: Identificador de cada serie (una muestra por serie)
+            values: Valor de cada serie (NaN = sin dato en este sweep)
+            now: Instante de la muestra (para la hora del día)
+            min_std: Desviación mínima, escalar o una por serie: cambios
+                menores nunca son anomalías (p. ej. 1 para conteos)
+        """
+        now = time.time() if now is None else now
+        idx = self._indices(keys)
+        x = np.asarray(values, dtype=np.float64)
+        floor = np.broadcast_to(np.asarray(min_std, dtype=np.float64), x.shape)
+        valid = ~np.isnan(x)
+        if not valid.all():
+            idx, x, floor = idx[valid], x[valid], floor[valid]
+        if not len(idx):
+            return []
+        self.updates += 1
+
+        hour = time.localtime(now).tm_hour
+        interval = 60.0 if self._last_update is None else min(max(now - self._last_update, 1.0), 3600.0)
+        self._last_update = now
+        n = self.n[idx]
+        mean = self.mean[idx]
+        var = self.var[idx]
+        first = n == 0
+
+        # ---- Picos: z-score contra la EWMA y contra la base de la hora ----
+        std = np.maximum(np.sqrt(var) + MIN_RELATIVE_STD * np.abs(mean), floor) + 1e-9
+        z = (x - mean) / std
+        warmed = n >= self.warmup
+
+        s_mean = self.season_mean[idx, hour]
+        s_var = self.season_var[idx, hour]
+        s_n = self.season_n[idx, hour]
+        s_z = (x - s_mean) / (np.maximum(np.sqrt(s_var) + MIN_RELATIVE_STD * np.abs(s_mean), floor) + 1e-9)
+        seasonal_ok = (s_n >= SEASONAL_WARMUP) & (np.abs(s_z) <= self.z_threshold)
+
+        spike_on = warmed & (np.abs(z) > self.z_threshold) & ~seasonal_ok
+        spike_off = np.abs(z) < self.z_threshold / 2
+
+        # ---- Actualizar estadísticas ----
+        # Las muestras fuera de rango pesan un 10%: un pico aislado no se vuelve
+        # "normal" enseguida, pero uno que se repite a la misma hora sí termina
+        # formando parte de la base estacional
+        outlier = warmed & (np.abs(z) > self.z_threshold)
+        weight = np.where(outlier, 0.1, 1.0)
+
+        alpha = self.alpha * weight
+        diff = x - mean
+        increment = alpha * diff
+        mean = np.where(first, x, mean + increment)
+        var = np.where(first, 0.0, (1 - alpha) * (var + diff * increment))
+        base_alpha = min(interval / (self.baseline_hours * 3600), 1.0)
+        base = np.where(first, x, self.base[idx] + base_alpha * (x - self.base[idx]))
+
+        s_first = s_n == 0
+        s_alpha = self.seasonal_alpha * interval / 3600 * weight
+        s_diff = x - s_mean
+        s_increment = s_alpha * s_diff
+        self.season_mean[idx, hour] = np.where(s_first, x, s_mean + s_increment)
+        self.season_var[idx, hour] = np.where(s_first, 0.0, (1 - s_alpha) * (s_var + s_diff * s_increment))
+        self.season_n[idx, hour] = s_n + 1
+
+        self.since[idx] = np.where(first, now, self.since[idx])
+        self.n[idx] = n + 1
+        self.mean[idx] = mean
+        self.var[idx] = var
+        self.base[idx] = base
+
+        # ---- Deriva: media EWMA contra la línea base lenta ----
+        drift = (mean - base) / (np.abs(base) + np.maximum(np.sqrt(var), floor) + 1e-9)
+        # La deriva se evalúa cuando la línea base ya cubre su constante de tiempo
+        baseline_ready = now - self.since[idx] >= self.baseline_hours * 3600
+        drift_on = baseline_ready & (np.abs(drift) > self.drift_threshold) & ~seasonal_ok
+        drift_off = np.abs(drift) < self.drift_threshold / 2
+
+        anomalies: List[Anomaly] = []
+        for kind, on, off, score, streak, active in (
+            ("spike", spike_on, spike_off, z, self.spike_streak, self.spike_active),
+            ("drift", drift_on, drift_off, drift, self.drift_streak, self.drift_active),
+        ):
+            streaks = np.where(on, streak[idx] + 1, 0)
+            streak[idx] = streaks
+            was_active = active[idx]
+            fire = ~was_active & (streaks >= self.sustain)
+            resolve = was_active & off
+            active[idx] = (was_active | fire) & ~resolve
+
+            for i in np.flatnonzero(fire | resolve):
+                anomalies.append(Anomaly(
+                    key=self._keys[idx[i]],
+                    kind=kind,
+                    state="firing" if fire[i] else "resolved",
+                    value=float(x[i]),
+                    baseline=float(base[i] if kind == "drift" else mean[i]),
+                    score=float(score[i])
+                ))
+            self.fired += int(fire.sum())
+        return anomalies
+
+    def stats(self) -> Dict:
+        return {
+            "series": len(self._keys),
+            "updates": self.updates,
+            "fired": self.fired,
+            "active_spikes": int(self.spike_active[:len(self._keys)].sum()),
+            "active_drifts": int(self.drift_active[:len(self._keys)].sum()),
+            "memory_bytes": sum(
+                getattr(self, name).nbytes for name in (
+                    "n", "mean", "var", "base", "since", "season_mean", "season_var", "season_n",
+                    "spike_streak", "drift_streak", "spike_active", "drift_active"
+                )
+            )
+        }
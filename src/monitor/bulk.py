@@ -0,0 +1,327 @@
+"""
+Operaciones en lote sobre varios composes
+
+``select_composes`` elige composes por proyecto, entorno, estado o nombre
+(globs, sin distinguir mayúsculas). ``BulkExecutor.plan`` los reparte en
+etapas según su nombre (por defecto: bases de datos y almacenamiento,
+después APIs/backends, después el resto; ``stop`` recorre las etapas al
+revés) y ``BulkExecutor.execute`` corre cada etapa en paralelo
+con un límite de concurrencia, esperando a que termine antes de pasar a la
+siguiente. Cada acción se sigue con ``DeployTracker`` hasta que el compose
+termina, de modo que una etapa solo se da por completa cuando sus composes
+están realmente arriba.
+
+Si una etapa tiene fallos, las siguientes se omiten (las APIs no se
+redeployan sobre una base de datos caída) salvo ``stop_on_failure=False``.
+"""
+import asyncio
+import logging
+import os
+import re
+import time
+from fnmatch import fnmatchcase
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from .analytics import format_duration
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARALLELISM = 4
+# Etapas separadas por ";" y patrones de cada etapa por ","; lo que no
+# coincide con ninguna va en una última etapa. Cada patrón se compara con
+# el nombre completo y con cada palabra del nombre ("feedback-web" no es
+# una base de datos, "users-db" sí)
+DEFAULT_STAGES = (
+    "db,*db,postgres*,mysql,mariadb,mongo*,redis,valkey,minio,rabbitmq;"
+    "api,backend"
+)
+
+ACTIONS = {"deploy", "start", "stop", "restart"}
+HEALTHY_STATUSES = {"done", "running", "idle"}
+
+_NAME_SEPARATORS = re.compile(r"[-_.\s]+")
+
+STATE_ICONS = {
+    "pending": "🕓",
+    "running": "⏳",
+    "ok": "✅",
+    "failed": "❌",
+    "skipped": "⏭️",
+}
+
+
+def _matches(value: Optional[str], pattern: Optional[str]) -> bool:
+    return pattern is None or fnmatchcase((value or "").lower(), pattern.lower())
+
+
+def select_composes(
+    composes: Iterable[Dict],
+    project: Optional[str] = None,
+    environment: Optional[str] = None,
+    status: Optional[str] = None,
+    name: Optional[str] = None,
+    unhealthy: bool = False
+) -> List[Dict]:
+    """
+    Filtra composes con el formato de DokployClient.get_all_composes
+
+    Args:
+        project: Glob sobre el nombre del proyecto
+        environment: Glob sobre el nombre del entorno
+        status: Glob sobre composeStatus
+        name: Glob sobre name o appName
+        unhealthy: Solo composes fuera de done/running/idle
+    """
+    return [
+        c for c in composes
+        if _matches(c.get("project_name"), project)
+        and _matches(c.get("environment_name"), environment)
+        and _matches(c.get("composeStatus"), status)
+        and (_matches(c.get("name"), name) or _matches(c.get("appName"), name))
+        and not (unhealthy and c.get("composeStatus") in HEALTHY_STATUSES)
+    ]
+
+
+def parse_stages(spec: str) -> List[List[str]]:
+    """'a,b;c' -> [['a', 'b'], ['c']]"""
+    return [
+        [p.strip() for p in stage.split(",") if p.strip()]
+        for stage in spec.split(";") if stage.strip()
+    ]
+
+
+class PlanItem:
+    """Un compose dentro de un plan y el resultado de su acción"""
+
+    def __init__(self, compose: Dict, stage: int):
+        self.compose = compose
+        self.stage = stage
+        self.state = "pending"
+        self.status: Optional[str] = None
+        self.detail: Optional[str] = None
+        self.duration: Optional[float] = None
+
+    @property
+    def compose_id(self) -> str:
+        return self.compose.get("composeId")
+
+    @property
+    def name(self) -> str:
+        return self.compose.get("name", "Unknown")
+
+
+class ExecutionPlan:
+    """Composes de una operación en lote agrupados en etapas ordenadas"""
+
+    def __init__(self, action: str, stages: List[List[PlanItem]], parallelism: int):
+        self.action = action
+        self.stages = stages
+        self.parallelism = parallelism
+        self.current_stage = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def items(self) -> List[PlanItem]:
+        return [item for stage in self.stages for item in stage]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def counts(self) -> Dict[str, int]:
+        counts = {state: 0 for state in STATE_ICONS}
+        for item in self.items:
+            counts[item.state] += 1
+        return counts
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def render(self, max_length: int = 4000) -> str:
+        """Resumen legible del progreso (apto para un mensaje de Telegram)"""
+        counts = self.counts()
+        done = counts["ok"] + counts["failed"] + counts["skipped"]
+        finished = self.finished_at is not None
+        header = "🏁" if finished else "🔄"
+
+        lines = [
+            f"{header} {self.action} de {len(self)} composes "
+            f"(paralelismo {self.parallelism}, {len(self.stages)} etapas)",
+            f"Progreso: {done}/{len(self)} · ✅ {counts['ok']} · ❌ {counts['failed']} · "
+            f"⏭️ {counts['skipped']} · {format_duration(self.elapsed)}",
+        ]
+
+        for index, stage in enumerate(self.stages, 1):
+            marker = "▶️ " if not finished and index - 1 == self.current_stage else ""
+            lines.append(f"\n{marker}Etapa {index}/{len(self.stages)}")
+            for item in stage:
+                line = f"{STATE_ICONS[item.state]} {item.name}"
+                if item.state == "running" and item.status:
+                    line += f" ({item.status})"
+                if item.duration is not None:
+                    line += f" · {format_duration(item.duration)}"
+                if item.detail and item.state in ("failed", "skipped"):
+                    line += f" · {item.detail}"
+                lines.append(line)
+
+        text = "\n".join(lines)
+        if len(text) > max_length:
+            text = text[:max_length - 2] + "\n…"
+        return text
+
+
+class BulkExecutor:
+    """Planifica y ejecuta acciones sobre varios composes con concurrencia acotada"""
+
+    def __init__(
+        self,
+        client,
+        tracker,
+        parallelism: Optional[int] = None,
+        stages: Optional[str] = None
+    ):
+        """
+        Args:
+            client: DokployClient (start/stop/deploy_compose)
+            tracker: DeployTracker con el que se espera cada acción
+            parallelism: Acciones simultáneas dentro de una etapa
+                (BULK_PARALLELISM)
+            stages: Etapas por nombre de compose, "globs;globs" (BULK_STAGES);
+                los globs se comparan con el nombre entero o con una de sus
+                palabras
+        """
+        self.client = client
+        self.tracker = tracker
+        self.parallelism = parallelism or int(os.getenv("BULK_PARALLELISM", DEFAULT_PARALLELISM))
+        self.stages = parse_stages(stages or os.getenv("BULK_STAGES", DEFAULT_STAGES))
+
+        self.plans = 0
+        self.actions = 0
+
+    def _stage_of(self, compose: Dict) -> int:
+        names = [(compose.get(k) or "").lower() for k in ("name", "appName")]
+        words = {w for n in names for w in [n, *_NAME_SEPARATORS.split(n)] if w}
+        for index, patterns in enumerate(self.stages):
+            if any(fnmatchcase(w, p.lower()) for w in words for p in patterns):
+                return index
+        return len(self.stages)
+
+    def plan(self, composes: Iterable[Dict], action: str) -> ExecutionPlan:
+        """
+        Agrupa los composes en etapas (vacías descartadas) sin ejecutar nada
+
+        ``stop`` usa el orden inverso: primero lo que depende de los demás,
+        las bases de datos al final
+        """
+        if action not in ACTIONS:
+            raise ValueError(f"Acción desconocida: {action}")
+
+        buckets: List[List[PlanItem]] = [[] for _ in range(len(self.stages) + 1)]
+        for compose in composes:
+            stage = self._stage_of(compose)
+            buckets[stage].append(PlanItem(compose, stage))
+
+        stages = [
+            sorted(bucket, key=lambda item: item.name.lower())
+            for bucket in buckets if bucket
+        ]
+        if action == "stop":
+            stages.reverse()
+        return ExecutionPlan(action, stages, self.parallelism)
+
+    async def execute(
+        self,
+        plan: ExecutionPlan,
+        on_progress: Optional[Callable[[ExecutionPlan], Awaitable]] = None,
+        stop_on_failure: bool = True
+    ) -> ExecutionPlan:
+        """
+        Ejecuta el plan etapa por etapa
+
+        Args:
+            on_progress: Callback async llamado con el plan en cada cambio
+            stop_on_failure: Omitir las etapas siguientes si una etapa falla
+        """
+        self.plans += 1
+        semaphore = asyncio.Semaphore(plan.parallelism)
+        plan.started_at = time.monotonic()
+
+        async def report():
+            if on_progress is not None:
+                try:
+                    await on_progress(plan)
+                except Exception as e:
+                    logger.debug(f"Error en el callback de progreso del lote: {e}")
+
+        async def run(item: PlanItem):
+            async with semaphore:
+                item.state = "running"
+                await report()
+                started = time.monotonic()
+
+                async def on_status(status: str, elapsed: float):
+                    item.status = status
+                    await report()
+
+                try:
+                    ok, item.status, item.detail = await self._run_action(plan.action, item, on_status)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    ok, item.detail = False, str(e)
+                item.state = "ok" if ok else "failed"
+                item.duration = time.monotonic() - started
+                await report()
+
+        for index, stage in enumerate(plan.stages):
+            plan.current_stage = index
+            await asyncio.gather(*(run(item) for item in stage))
+
+            failed = [item.name for item in stage if item.state == "failed"]
+            if failed and stop_on_failure:
+                for item in (i for later in plan.stages[index + 1:] for i in later):
+                    item.state = "skipped"
+                    item.detail = f"falló la etapa {index + 1}"
+                logger.warning(
+                    f"⏭️ Lote {plan.action} detenido en la etapa {index + 1}: "
+                    f"fallaron {', '.join(failed)}"
+                )
+                break
+
+        plan.finished_at = time.monotonic()
+        await report()
+        counts = plan.counts()
+        logger.info(
+            f"🏁 Lote {plan.action}: {counts['ok']} ok, {counts['failed']} fallidos, "
+            f"{counts['skipped']} omitidos en {format_duration(plan.elapsed)}"
+        )
+        return plan
+
+    async def _run_action(self, action: str, item: PlanItem, on_status):
+        """Lanza la acción y espera su resultado; devuelve (ok, estado, detalle)"""
+        steps = ["stop", "start"] if action == "restart" else [action]
+        result = None
+        for step in steps:
+            self.actions += 1
+            if step == "deploy":
+                await self.client.deploy_compose(item.compose_id)
+            elif step == "start":
+                await self.client.start_compose(item.compose_id)
+            else:
+                await self.client.stop_compose(item.compose_id)
+
+            result = await self.tracker.track(item.compose_id, step, on_status)
+            if not result.ok:
+                return False, result.status, result.detail or f"{step} terminó en {result.status}"
+        return True, result.status, result.detail
+
+    def stats(self) -> Dict:
+        return {
+            "parallelism": self.parallelism,
+            "stages": len(self.stages) + 1,
+            "plans": self.plans,
+            "actions": self.actions
+        }
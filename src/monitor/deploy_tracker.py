@@ -0,0 +1,312 @@
+"""
+Seguimiento de deploys, starts y stops hasta que terminan
+
+Dokploy responde a ``/compose.deploy``, ``/compose.start`` y ``/compose.stop``
+en cuanto acepta la orden, no cuando el compose termina. ``DeployTracker``
+espera el resultado real:
+
+- Un único watcher por compose: todos los que esperan el mismo compose
+  comparten sus consultas y su resultado.
+- Un único bucle de polling para todos los watchers: cada vuelta es una sola
+  petición a ``/project.all`` (vía la caché de topología) que trae el estado
+  de todos los composes a la vez, así que el costo no crece con la cantidad
+  de deploys en curso. Solo al terminar un deploy se consulta su historial
+  de deployments (una petición por deploy).
+- Backoff: el intervalo arranca en ``min_interval`` y crece hasta
+  ``max_interval`` mientras nada cambia; vuelve al mínimo cuando llega un
+  watcher nuevo o un compose cambia de estado.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_INTERVAL = 2.0  # segundos
+DEFAULT_MAX_INTERVAL = 15.0  # segundos
+DEFAULT_BACKOFF = 1.5
+DEFAULT_TIMEOUT = 900.0  # segundos
+# Segundos en los que un estado final igual al de partida todavía no cuenta
+# (Dokploy tarda un momento en pasar el compose a "running")
+DEFAULT_GRACE = 10.0
+
+TERMINAL_STATUSES = {"done", "error", "idle"}
+
+# Estado final esperado por acción
+EXPECTED_STATUS = {
+    "deploy": "done",
+    "start": "done",
+    "stop": "idle",
+}
+
+ProgressCallback = Callable[[str, float], Awaitable]
+
+
+class DeployResult(NamedTuple):
+    compose_id: str
+    action: str
+    ok: bool
+    status: str
+    duration: float
+    detail: Optional[str] = None
+
+
+class _Watch:
+    """Estado de seguimiento de un compose y quienes esperan su resultado"""
+
+    def __init__(self, compose_id: str, action: str, status: Optional[str]):
+        self.compose_id = compose_id
+        self.action = action
+        self.baseline = status
+        self.status = status
+        self.seen_running = False
+        self.started_at = time.monotonic()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.listeners: List[ProgressCallback] = []
+
+    def restart(self, action: str):
+        """Una orden nueva sobre el mismo compose: esperar su resultado"""
+        self.action = action
+        self.baseline = self.status
+        self.seen_running = False
+        self.started_at = time.monotonic()
+
+
+class DeployTracker:
+    """Espera a que las acciones sobre composes terminen con polling compartido"""
+
+    def __init__(
+        self,
+        client,
+        min_interval: Optional[float] = None,
+        max_interval: Optional[float] = None,
+        timeout: Optional[float] = None,
+        grace: Optional[float] = None,
+        backoff: float = DEFAULT_BACKOFF
+    ):
+        """
+        Args:
+            client: DokployClient (get_all_composes, get_compose,
+                get_compose_deployments)
+            min_interval: Segundos entre consultas al empezar
+                (DEPLOY_TRACK_MIN_INTERVAL)
+            max_interval: Tope del intervalo con backoff
+                (DEPLOY_TRACK_MAX_INTERVAL)
+            timeout: Segundos máximos de espera por acción (DEPLOY_TRACK_TIMEOUT)
+            grace: Segundos antes de aceptar como final el estado de partida
+                (DEPLOY_TRACK_GRACE)
+            backoff: Factor de crecimiento del intervalo
+        """
+        self.client = client
+        self.min_interval = min_interval or float(
+            os.getenv("DEPLOY_TRACK_MIN_INTERVAL", DEFAULT_MIN_INTERVAL)
+        )
+        self.max_interval = max_interval or float(
+            os.getenv("DEPLOY_TRACK_MAX_INTERVAL", DEFAULT_MAX_INTERVAL)
+        )
+        self.timeout = timeout or float(os.getenv("DEPLOY_TRACK_TIMEOUT", DEFAULT_TIMEOUT))
+        self.grace = grace if grace is not None else float(
+            os.getenv("DEPLOY_TRACK_GRACE", DEFAULT_GRACE)
+        )
+        self.backoff = backoff
+
+        self._watches: Dict[str, _Watch] = {}
+        self._poller: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self._interval = self.min_interval
+
+        self.polls = 0
+        self.api_calls = 0
+        self.completed = 0
+        self.joined = 0
+
+    async def track(
+        self,
+        compose_id: str,
+        action: str,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> DeployResult:
+        """
+        Espera a que termine una acción ya enviada a Dokploy
+
+        Args:
+            compose_id: Compose sobre el que se lanzó la acción
+            action: "deploy", "start" o "stop"
+            on_progress: Callback async (estado, segundos) en cada cambio de estado
+        """
+        if action not in EXPECTED_STATUS:
+            raise ValueError(f"Acción desconocida: {action}")
+
+        watch = self._watches.get(compose_id)
+        if watch is None:
+            status = self._cached_status(compose_id)
+            watch = self._watches[compose_id] = _Watch(compose_id, action, status)
+        else:
+            self.joined += 1
+            if watch.action != action:
+                watch.restart(action)
+
+        if on_progress is not None:
+            watch.listeners.append(on_progress)
+
+        self._interval = self.min_interval
+        self._wake.set()
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll_loop(), name="deploy-tracker")
+
+        return await asyncio.shield(watch.future)
+
+    def _cached_status(self, compose_id: str) -> Optional[str]:
+        """Estado de partida según la última topología cargada (sin consultar)"""
+        for compose in self.client.topology.peek() or []:
+            if compose.get("composeId") == compose_id:
+                return compose.get("composeStatus")
+        return None
+
+    @property
+    def in_progress(self) -> List[str]:
+        return list(self._watches)
+
+    async def _poll_loop(self):
+        """Consulta el estado de todos los composes vigilados hasta que no quede ninguno"""
+        while self._watches:
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self._interval)
+                # Llegó un watcher nuevo: consultar enseguida pero sin
+                # adelantarse al intervalo mínimo
+                await asyncio.sleep(self.min_interval)
+            except asyncio.TimeoutError:
+                pass
+
+            try:
+                changed = await self._poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Error al seguir deploys en curso: {e}")
+                changed = False
+            # Aunque la consulta haya fallado: nadie espera más que timeout
+            self._expire()
+
+            if changed:
+                self._interval = self.min_interval
+            else:
+                self._interval = min(self._interval * self.backoff, self.max_interval)
+
+    async def _poll(self) -> bool:
+        """Una vuelta de polling; True si algún compose cambió de estado"""
+        self.polls += 1
+        self.api_calls += 1
+        composes = await self.client.get_all_composes(force_refresh=True)
+        statuses = {c.get("composeId"): c.get("composeStatus") for c in composes}
+
+        changed = False
+        for compose_id, watch in list(self._watches.items()):
+            status = statuses.get(compose_id)
+            if status is None:
+                # Compose que no aparece en la topología: consulta directa
+                self.api_calls += 1
+                try:
+                    status = (await self.client.get_compose(compose_id)).get("composeStatus")
+                except Exception as e:
+                    # Un compose ilegible no frena a los demás; _expire lo cierra
+                    logger.warning(f"No se pudo leer el estado de {compose_id}: {e}")
+                    continue
+
+            elapsed = time.monotonic() - watch.started_at
+            if status != watch.status:
+                changed = True
+                watch.status = status
+                await self._report(watch, status, elapsed)
+            if status == "running":
+                watch.seen_running = True
+
+            if status in TERMINAL_STATUSES:
+                moved = watch.baseline is not None and status != watch.baseline
+                settled = watch.seen_running or moved or elapsed >= self.grace
+                if settled:
+                    await self._finish(watch, status, elapsed)
+        return changed
+
+    def _expire(self):
+        """
+        Cierra como fallidos los watchers que superaron ``timeout``
+
+        Se llama tras cada vuelta, haya fallado la consulta o no. También
+        cubre el compose en un estado final cuyo último deployment sigue
+        "running" (_finish no lo cerró).
+        """
+        now = time.monotonic()
+        for watch in list(self._watches.values()):
+            elapsed = now - watch.started_at
+            if elapsed >= self.timeout:
+                self._resolve(watch, DeployResult(
+                    watch.compose_id, watch.action, False, str(watch.status), elapsed,
+                    f"sin terminar tras {int(self.timeout)}s"
+                ))
+
+    async def _finish(self, watch: _Watch, status: str, elapsed: float) -> bool:
+        """
+        Cierra un watcher; en los deploys confirma con el último deployment
+
+        Returns:
+            False si el watcher sigue abierto (hay un deployment en curso)
+        """
+        detail = None
+        ok = status == EXPECTED_STATUS[watch.action]
+
+        if watch.action == "deploy":
+            self.api_calls += 1
+            try:
+                deployments = await self.client.get_compose_deployments(watch.compose_id)
+            except Exception as e:
+                logger.warning(f"No se pudo leer el deployment de {watch.compose_id}: {e}")
+                deployments = []
+            if deployments:
+                latest = max(deployments, key=lambda d: d.get("createdAt") or "")
+                if latest.get("status") == "running":
+                    # Hay otro deploy en cola detrás del que terminó
+                    return False
+                detail = latest.get("title") or latest.get("description")
+                ok = ok and latest.get("status") in (None, "done")
+
+        self._resolve(watch, DeployResult(watch.compose_id, watch.action, ok, status, elapsed, detail))
+        return True
+
+    def _resolve(self, watch: _Watch, result: DeployResult):
+        self._watches.pop(watch.compose_id, None)
+        self.completed += 1
+        if not watch.future.done():
+            watch.future.set_result(result)
+
+    @staticmethod
+    async def _report(watch: _Watch, status: str, elapsed: float):
+        for listener in watch.listeners:
+            try:
+                await listener(status, elapsed)
+            except Exception as e:
+                logger.debug(f"Error en el callback de progreso de {watch.compose_id}: {e}")
+
+    async def aclose(self):
+        """Detiene el polling; quienes esperaban reciben CancelledError"""
+        if self._poller is not None:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+            self._poller = None
+        for watch in self._watches.values():
+            watch.future.cancel()
+        self._watches.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "in_progress": len(self._watches),
+            "waiters": sum(len(w.listeners) for w in self._watches.values()),
+            "interval": round(self._interval, 1),
+            "polls": self.polls,
+            "api_calls": self.api_calls,
+            "completed": self.completed,
+            "joined": self.joined
+        }
@@ -0,0 +1,378 @@
+"""
+Dispatcher asíncrono de eventos del monitor hacia múltiples destinos
+
+El monitor publica eventos sin esperar a nadie (``publish`` no bloquea).
+Cada destino (sink) tiene su propia cola acotada con una política de
+backpressure y sus propios workers, de modo que un Telegram lento o un
+webhook caído no retrasan el siguiente sweep ni a los demás destinos.
+
+Políticas de cola llena:
+    - ``drop_oldest``: se descarta el evento más antiguo
+    - ``drop_newest``: se descarta el evento entrante
+    - ``coalesce``: un evento nuevo reemplaza al pendiente del mismo compose
+      y tipo (y métrica o deployment); si no hay ninguno se descarta el más
+      antiguo. Dos cambios de estado fusionados conservan los estados
+      intermedios en ``via``, así done → error → done no se pierde como
+      done → done
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_SEND_TIMEOUT = 10.0  # segundos
+
+BACKPRESSURE_POLICIES = {"drop_oldest", "drop_newest", "coalesce"}
+
+# Muestras de latencia guardadas por sink para calcular percentiles
+LATENCY_WINDOW = 500
+
+
+class NotificationSink:
+    """
+    Destino de eventos del monitor
+
+    Las subclases implementan ``send``. ``events`` limita los tipos de evento
+    que recibe el sink (None = todos).
+    """
+
+    name = "sink"
+
+    def __init__(
+        self,
+        events: Optional[Iterable[str]] = None,
+        policy: str = "drop_oldest",
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        workers: int = 1
+    ):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Política de backpressure desconocida: {policy}")
+
+        self.events: Optional[Set[str]] = set(events) if events else None
+        self.policy = policy
+        self.queue_size = queue_size
+        self.workers = workers
+
+    def accepts(self, event: Dict) -> bool:
+        """True si el sink está suscrito al tipo del evento"""
+        return self.events is None or event.get("event") in self.events
+
+    async def send(self, event: Dict):
+        raise NotImplementedError
+
+    async def aclose(self):
+        """Libera recursos del sink"""
+
+
+class LogSink(NotificationSink):
+    """Escribe cada evento en el log"""
+
+    name = "log"
+
+    def __init__(self, level: int = logging.INFO, **kwargs):
+        super().__init__(**kwargs)
+        self.level = level
+
+    async def send(self, event: Dict):
+        logger.log(self.level, f"🔔 {format_event(event)}")
+
+
+class CallbackSink(NotificationSink):
+    """Adapta un callback async (p. ej. on_status_change) como sink"""
+
+    def __init__(self, callback: Callable[[Dict], Awaitable], name: str = "callback", **kwargs):
+        super().__init__(**kwargs)
+        self.callback = callback
+        self.name = name
+
+    async def send(self, event: Dict):
+        await self.callback(event)
+
+
+class TelegramSink(NotificationSink):
+    """Envía los eventos a uno o varios chats de Telegram"""
+
+    name = "telegram"
+
+    def __init__(self, bot, chat_ids: Iterable[int], **kwargs):
+        """
+        Args:
+            bot: Instancia de ``telegram.Bot``
+            chat_ids: Chats que reciben las alertas
+        """
+        kwargs.setdefault("policy", "coalesce")
+        super().__init__(**kwargs)
+        self.bot = bot
+        self.chat_ids = list(chat_ids)
+
+    async def send(self, event: Dict):
+        text = event.get("text") or format_event(event)
+        for chat_id in self.chat_ids:
+            await self.bot.send_message(chat_id=chat_id, text=text)
+
+
+class WebhookSink(NotificationSink):
+    """Envía cada evento como JSON por POST a un endpoint HTTP"""
+
+    name = "webhook"
+
+    def __init__(self, url: str, timeout: float = DEFAULT_SEND_TIMEOUT, **kwargs):
+        kwargs.setdefault("workers", 2)
+        super().__init__(**kwargs)
+        self.url = url
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def send(self, event: Dict):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+
+        async with self._session.post(self.url, json=event) as response:
+            response.raise_for_status()
+
+    async def aclose(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+def format_event(event: Dict) -> str:
+    """Texto legible de un evento del monitor"""
+    kind = event.get("event", "status_change")
+    name = event.get("name", "Unknown")
+    project = event.get("project_name", "Unknown")
+
+    if kind == "added":
+        return f"🆕 Nuevo compose {name} ({project}): {event.get('status')}"
+    if kind == "removed":
+        return f"🗑️ Compose eliminado {name} ({project})"
+    if kind == "deployment":
+        title = event.get("title") or event.get("deployment_id")
+        return f"🚀 Deployment de {name} ({project}): {event.get('deployment_status')} — {title}"
+    if kind == "anomaly":
+        if event.get("state") == "resolved":
+            return f"✅ {name} ({project}): {event.get('metric')} volvió a la normalidad"
+        label = "deriva" if event.get("anomaly") == "drift" else "pico"
+        return (
+            f"📈 Anomalía ({label}) en {name} ({project}): {event.get('metric')} = "
+            f"{event.get('value_text', event.get('value'))} (normal ~{event.get('baseline_text', event.get('baseline'))})"
+        )
+    path = [event.get("previous_status"), *event.get("via", []), event.get("status")]
+    return f"🔄 {name} ({project}): {' → '.join(str(status) for status in path)}"
+
+
+def _merge(pending: Dict, event: Dict) -> Dict:
+    """
+    Fusiona un evento con el pendiente del mismo compose y tipo
+
+    A→B seguido de B→C se entrega como A→C con B en ``via`` y el total de
+    cambios en ``transitions``: si C vuelve a ser A, el aviso sigue mostrando
+    la caída intermedia.
+    """
+    if "previous_status" not in pending or event.get("event", "status_change") != "status_change":
+        return event
+
+    via = list(pending.get("via", []))
+    if pending.get("status") != pending.get("previous_status"):
+        via.append(pending.get("status"))
+    return {
+        **event,
+        "previous_status": pending["previous_status"],
+        "via": via,
+        "transitions": pending.get("transitions", 1) + event.get("transitions", 1)
+    }
+
+
+class _SinkQueue:
+    """Cola acotada de un sink con su política de backpressure y métricas"""
+
+    def __init__(self, sink: NotificationSink):
+        self.sink = sink
+        # Cada entrada: [clave de coalescencia, evento, instante de encolado]
+        self.entries: Deque[List] = deque()
+        self.pending: Dict[tuple, List] = {}
+        self.not_empty = asyncio.Event()
+
+        self.enqueued = 0
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.in_flight = 0
+        self.max_depth = 0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def put(self, event: Dict):
+        """Encola sin bloquear aplicando la política del sink"""
+        key = (
+            event.get("compose_id"),
+            event.get("event"),
+            event.get("metric"),
+            event.get("deployment_id")
+        )
+        now = time.monotonic()
+        self.enqueued += 1
+        full = len(self.entries) >= self.sink.queue_size
+
+        # Solo se fusiona bajo presión: con sitio en la cola cada evento se entrega
+        if full and self.sink.policy == "coalesce" and key in self.pending:
+            entry = self.pending[key]
+            entry[1] = _merge(entry[1], event)
+            self.coalesced += 1
+            return
+
+        if full:
+            if self.sink.policy == "drop_newest":
+                self.dropped += 1
+                return
+            self._forget(self.entries.popleft())
+            self.dropped += 1
+
+        entry = [key, event, now]
+        self.entries.append(entry)
+        if self.sink.policy == "coalesce":
+            self.pending[key] = entry
+
+        self.max_depth = max(self.max_depth, len(self.entries))
+        self.not_empty.set()
+
+    async def get(self) -> List:
+        """Espera y extrae la entrada más antigua"""
+        while not self.entries:
+            self.not_empty.clear()
+            await self.not_empty.wait()
+
+        entry = self.entries.popleft()
+        self._forget(entry)
+        return entry
+
+    def _forget(self, entry: List):
+        if self.pending.get(entry[0]) is entry:
+            del self.pending[entry[0]]
+
+    def stats(self) -> Dict:
+        latencies = sorted(self.latencies)
+        return {
+            "policy": self.sink.policy,
+            "depth": len(self.entries),
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight,
+            "latency_avg_ms": _ms(sum(latencies) / len(latencies)) if latencies else None,
+            "latency_p95_ms": _ms(_percentile(latencies, 0.95)) if latencies else None
+        }
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    """Percentil (nearest-rank) de una lista ya ordenada"""
+    index = max(0, min(len(ordered) - 1, int(round(q * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+class EventDispatcher:
+    """Reparte los eventos del monitor entre sinks con colas independientes"""
+
+    def __init__(
+        self,
+        sinks: Optional[Iterable[NotificationSink]] = None,
+        send_timeout: Optional[float] = None
+    ):
+        """
+        Args:
+            sinks: Destinos iniciales
+            send_timeout: Segundos máximos por entrega antes de darla por fallida
+        """
+        self.send_timeout = send_timeout or float(
+            os.getenv("MONITOR_SEND_TIMEOUT", DEFAULT_SEND_TIMEOUT)
+        )
+        self._queues: List[_SinkQueue] = []
+        self._workers: List[asyncio.Task] = []
+
+        for sink in sinks or []:
+            self.add_sink(sink)
+
+    @property
+    def sinks(self) -> List[NotificationSink]:
+        return [q.sink for q in self._queues]
+
+    def add_sink(self, sink: NotificationSink):
+        """Registra un sink (sus workers arrancan con el siguiente evento)"""
+        queue = _SinkQueue(sink)
+        self._queues.append(queue)
+        if self._workers:
+            self._spawn_workers(queue)
+
+    def publish(self, event: Dict):
+        """Encola un evento en todos los sinks suscritos sin bloquear"""
+        self._ensure_workers()
+        for queue in self._queues:
+            if queue.sink.accepts(event):
+                queue.put(event)
+
+    def _ensure_workers(self):
+        if not self._workers:
+            for queue in self._queues:
+                self._spawn_workers(queue)
+
+    def _spawn_workers(self, queue: _SinkQueue):
+        for i in range(queue.sink.workers):
+            task = asyncio.create_task(self._worker(queue), name=f"sink-{queue.sink.name}-{i}")
+            self._workers.append(task)
+
+    async def _worker(self, queue: _SinkQueue):
+        """Drena la cola de un sink"""
+        while True:
+            _, event, enqueued_at = await queue.get()
+            queue.in_flight += 1
+            try:
+                await asyncio.wait_for(queue.sink.send(event), timeout=self.send_timeout)
+                queue.delivered += 1
+                queue.latencies.append(time.monotonic() - enqueued_at)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                queue.failed += 1
+                logger.error(f"Error al entregar evento al sink {queue.sink.name}: {e}")
+            finally:
+                queue.in_flight -= 1
+
+    async def drain(self, timeout: float = 5.0):
+        """Espera (como mucho ``timeout`` segundos) a que se vacíen las colas"""
+        deadline = time.monotonic() + timeout
+        while any(q.entries or q.in_flight for q in self._queues) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """Intenta entregar lo pendiente, detiene los workers y cierra los sinks"""
+        if self._workers:
+            await self.drain(drain_timeout)
+
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        for queue in self._queues:
+            try:
+                await queue.sink.aclose()
+            except Exception as e:
+                logger.warning(f"Error al cerrar el sink {queue.sink.name}: {e}")
+
+    def stats(self) -> Dict:
+        """Profundidad de cola, entregas y latencia por sink"""
+        return {q.sink.name: q.stats() for q in self._queues}
@@ -0,0 +1,401 @@
+"""
+Historial persistente de estados de composes y tiempos de sweep
+
+SQLite en modo WAL con escrituras por lotes en un hilo dedicado, para que
+el event loop nunca espere al disco. Formato compacto:
+
+- ``composes``: nombre y proyecto una sola vez por compose
+- ``transitions``: (ts, compose, evento, estado anterior, estado nuevo)
+- ``sweeps``: duración de cada sweep completo (se conservan en crudo
+  ``sweep_raw_days`` días y después se resumen por hora en ``sweep_rollups``)
+
+Las transiciones se conservan ``retention_days`` días.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .dispatcher import NotificationSink
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_PATH = "data/history.db"
+DEFAULT_RETENTION_DAYS = 365
+DEFAULT_SWEEP_RAW_DAYS = 7
+DEFAULT_FLUSH_INTERVAL = 5.0  # segundos
+DEFAULT_BATCH_SIZE = 500
+MAINTENANCE_INTERVAL = 3600  # segundos
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS composes (
+    compose_id TEXT PRIMARY KEY,
+    name TEXT,
+    project_name TEXT
+);
+CREATE TABLE IF NOT EXISTS transitions (
+    ts INTEGER NOT NULL,
+    compose_id TEXT NOT NULL,
+    event TEXT NOT NULL,
+    previous_status TEXT,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transitions_compose_ts ON transitions (compose_id, ts);
+CREATE INDEX IF NOT EXISTS idx_transitions_ts ON transitions (ts);
+CREATE TABLE IF NOT EXISTS sweeps (
+    ts INTEGER NOT NULL,
+    duration_ms INTEGER NOT NULL,
+    composes INTEGER NOT NULL,
+    changes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sweeps_ts ON sweeps (ts);
+CREATE TABLE IF NOT EXISTS sweep_rollups (
+    hour INTEGER PRIMARY KEY,
+    sweeps INTEGER NOT NULL,
+    avg_ms REAL NOT NULL,
+    max_ms INTEGER NOT NULL,
+    changes INTEGER NOT NULL
+);
+"""
+
+
+def _event_ts(event: Dict) -> int:
+    """Instante (epoch) de un evento a partir de checked_at"""
+    checked_at = event.get("checked_at")
+    if checked_at:
+        try:
+            return int(datetime.fromisoformat(checked_at).timestamp())
+        except ValueError:
+            pass
+    return int(time.time())
+
+
+class HistoryStore(NotificationSink):
+    """
+    Almacén append-only del historial del monitor
+
+    Funciona como sink del dispatcher para los eventos y expone
+    ``record_sweep`` para los tiempos de sweep. Las escrituras se acumulan en
+    memoria y se vuelcan cada ``flush_interval`` segundos o al llegar a
+    ``batch_size`` filas.
+    """
+
+    name = "history"
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        retention_days: Optional[int] = None,
+        sweep_raw_days: Optional[int] = None,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        **kwargs
+    ):
+        """
+        Args:
+            path: Fichero SQLite (MONITOR_HISTORY_PATH)
+            retention_days: Días que se conservan las transiciones
+                (MONITOR_HISTORY_RETENTION_DAYS)
+            sweep_raw_days: Días que se conservan los sweeps sin resumir
+                (MONITOR_HISTORY_SWEEP_RAW_DAYS)
+            flush_interval: Segundos máximos entre volcados a disco
+            batch_size: Filas pendientes que fuerzan un volcado
+        """
+        kwargs.setdefault("queue_size", 10000)
+        super().__init__(**kwargs)
+        self.path = path or os.getenv("MONITOR_HISTORY_PATH", DEFAULT_HISTORY_PATH)
+        self.retention_days = retention_days or int(
+            os.getenv("MONITOR_HISTORY_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)
+        )
+        self.sweep_raw_days = sweep_raw_days or int(
+            os.getenv("MONITOR_HISTORY_SWEEP_RAW_DAYS", DEFAULT_SWEEP_RAW_DAYS)
+        )
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        # Un único hilo es dueño de la conexión SQLite
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history")
+        self._conn: Optional[sqlite3.Connection] = None
+
+        self._composes: Dict[str, Tuple[str, str]] = {}
+        self._pending_composes: Dict[str, Tuple[str, str]] = {}
+        self._pending_transitions: List[Tuple] = []
+        self._pending_sweeps: List[Tuple] = []
+
+        self._flush_task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self._last_maintenance = 0.0
+
+        self.rows_written = 0
+
+    # ========== ESCRITURA ==========
+
+    async def send(self, event: Dict):
+        """Sink del dispatcher: encola el evento para el próximo volcado"""
+        self.record_event(event)
+
+    def record_event(self, event: Dict):
+        """Encola un evento del monitor (status_change, added, removed, ...)"""
+        compose_id = event.get("compose_id")
+        self._remember_compose(compose_id, event.get("name"), event.get("project_name"))
+        self._pending_transitions.append((
+            _event_ts(event),
+            compose_id,
+            event.get("event", "status_change"),
+            event.get("previous_status"),
+            event.get("status")
+        ))
+        self._schedule_flush()
+
+    def record_baseline(self, composes: Iterable[Dict]):
+        """Registra el estado de partida de cada compose al arrancar el monitor"""
+        ts = int(time.time())
+        for compose in composes:
+            compose_id = compose.get("composeId")
+            self._remember_compose(compose_id, compose.get("name"), compose.get("project_name"))
+            self._pending_transitions.append((
+                ts, compose_id, "baseline", None, compose.get("composeStatus", "unknown")
+            ))
+        self._schedule_flush()
+
+    def record_sweep(self, duration: float, composes: int, changes: int):
+        """Encola la duración (segundos) de un sweep completo"""
+        self._pending_sweeps.append((int(time.time()), int(duration * 1000), composes, changes))
+        self._schedule_flush()
+
+    def _remember_compose(self, compose_id: str, name: Optional[str], project_name: Optional[str]):
+        meta = (name or "Unknown", project_name or "Unknown")
+        if self._composes.get(compose_id) != meta:
+            self._composes[compose_id] = meta
+            self._pending_composes[compose_id] = meta
+
+    def _pending_rows(self) -> int:
+        return len(self._pending_transitions) + len(self._pending_sweeps)
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        if self._pending_rows() >= self.batch_size:
+            self._wake.set()
+
+    async def _flush_loop(self):
+        """Vuelca cada flush_interval o antes si se llena un lote"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Vuelca a disco lo pendiente desde el hilo de SQLite"""
+        if not self._pending_rows() and not self._pending_composes:
+            return
+
+        composes = list(self._pending_composes.items())
+        transitions = self._pending_transitions
+        sweeps = self._pending_sweeps
+        self._pending_composes = {}
+        self._pending_transitions = []
+        self._pending_sweeps = []
+
+        maintenance = time.monotonic() - self._last_maintenance > MAINTENANCE_INTERVAL
+        if maintenance:
+            self._last_maintenance = time.monotonic()
+
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(
+                self._executor, self._write_batch, composes, transitions, sweeps, maintenance
+            )
+            self.rows_written += len(transitions) + len(sweeps)
+        except Exception as e:
+            logger.error(f"Error al escribir historial ({len(transitions) + len(sweeps)} filas): {e}")
+
+    # ========== HILO SQLITE ==========
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _write_batch(self, composes, transitions, sweeps, maintenance: bool):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO composes (compose_id, name, project_name) VALUES (?, ?, ?) "
+                "ON CONFLICT(compose_id) DO UPDATE SET name = excluded.name, "
+                "project_name = excluded.project_name",
+                [(cid, name, project) for cid, (name, project) in composes]
+            )
+            conn.executemany(
+                "INSERT INTO transitions (ts, compose_id, event, previous_status, status) "
+                "VALUES (?, ?, ?, ?, ?)",
+                transitions
+            )
+            conn.executemany(
+                "INSERT INTO sweeps (ts, duration_ms, composes, changes) VALUES (?, ?, ?, ?)",
+                sweeps
+            )
+        if maintenance:
+            self._apply_retention(conn)
+
+    def _apply_retention(self, conn: sqlite3.Connection):
+        """Resume sweeps viejos por hora y borra lo que excede la retención"""
+        now = int(time.time())
+        raw_cutoff = now - self.sweep_raw_days * 86400
+        # Solo horas completas, para no resumir una hora dos veces
+        raw_cutoff -= raw_cutoff % 3600
+        retention_cutoff = now - self.retention_days * 86400
+
+        with conn:
+            conn.execute(
+                "INSERT INTO sweep_rollups (hour, sweeps, avg_ms, max_ms, changes) "
+                "SELECT ts - ts % 3600 AS hour, COUNT(*), AVG(duration_ms), MAX(duration_ms), SUM(changes) "
+                "FROM sweeps WHERE ts < ? GROUP BY hour "
+                "ON CONFLICT(hour) DO UPDATE SET "
+                "avg_ms = (avg_ms * sweeps + excluded.avg_ms * excluded.sweeps) / (sweeps + excluded.sweeps), "
+                "sweeps = sweeps + excluded.sweeps, "
+                "max_ms = MAX(max_ms, excluded.max_ms), "
+                "changes = changes + excluded.changes",
+                (raw_cutoff,)
+            )
+            conn.execute("DELETE FROM sweeps WHERE ts < ?", (raw_cutoff,))
+            conn.execute("DELETE FROM sweep_rollups WHERE hour < ?", (retention_cutoff,))
+            conn.execute("DELETE FROM transitions WHERE ts < ?", (retention_cutoff,))
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    @staticmethod
+    def _query(conn: sqlite3.Connection, sql: str, params: Tuple) -> List[Dict]:
+        cursor = conn.execute(sql, params)
+        columns = [c[0] for c in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    async def _run_query(self, sql: str, params: Tuple) -> List[Dict]:
+        return await self.execute(self._query, sql, params)
+
+    async def execute(self, fn: Callable[..., Any], *args) -> Any:
+        """
+        Ejecuta ``fn(conn, *args)`` en el hilo de SQLite
+
+        Vuelca antes lo pendiente, de modo que ``fn`` ve todos los eventos
+        registrados hasta el momento.
+        """
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, lambda: fn(self._connect(), *args)
+        )
+
+    # ========== CONSULTAS ==========
+
+    async def get_transitions(
+        self,
+        compose_id: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Transiciones en orden cronológico
+
+        Args:
+            compose_id: Filtra por compose (None = todos)
+            since: Epoch inicial (inclusive)
+            until: Epoch final (exclusive)
+            limit: Máximo de filas
+        """
+        clauses, params = [], []
+        if compose_id is not None:
+            clauses.append("t.compose_id = ?")
+            params.append(compose_id)
+        if since is not None:
+            clauses.append("t.ts >= ?")
+            params.append(int(since))
+        if until is not None:
+            clauses.append("t.ts < ?")
+            params.append(int(until))
+
+        sql = (
+            "SELECT t.ts, t.compose_id, c.name, c.project_name, t.event, "
+            "t.previous_status, t.status FROM transitions t "
+            "LEFT JOIN composes c ON c.compose_id = t.compose_id"
+        )
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY t.ts, t.rowid"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+
+        return await self._run_query(sql, tuple(params))
+
+    async def count_status(
+        self,
+        status: str,
+        compose_id: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None
+    ) -> Dict[str, int]:
+        """Veces que cada compose entró en ``status`` en el rango indicado"""
+        clauses, params = ["status = ?", "event = 'status_change'"], [status]
+        if compose_id is not None:
+            clauses.append("compose_id = ?")
+            params.append(compose_id)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(int(since))
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(int(until))
+
+        rows = await self._run_query(
+            "SELECT compose_id, COUNT(*) AS n FROM transitions WHERE "
+            + " AND ".join(clauses) + " GROUP BY compose_id",
+            tuple(params)
+        )
+        return {row["compose_id"]: row["n"] for row in rows}
+
+    async def get_sweeps(self, since: Optional[float] = None, until: Optional[float] = None) -> List[Dict]:
+        """Sweeps en crudo del rango indicado"""
+        return await self._run_query(
+            "SELECT ts, duration_ms, composes, changes FROM sweeps "
+            "WHERE ts >= ? AND ts < ? ORDER BY ts",
+            (int(since or 0), int(until or time.time() + 1))
+        )
+
+    async def aclose(self):
+        """Vuelca lo pendiente, cierra la conexión y termina el hilo de SQLite"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+        if self._conn is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> Dict:
+        return {
+            "path": self.path,
+            "rows_written": self.rows_written,
+            "pending_rows": self._pending_rows()
+        }
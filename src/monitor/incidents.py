@@ -0,0 +1,127 @@
+"""
+Registro automático de incidentes resueltos en la base de conocimiento
+
+``IncidentRecorder`` es un sink del dispatcher que sigue los
+``status_change``: cuando un compose entra en un estado de caída guarda el
+momento y, si hay forma de leerlos, los patrones de error de sus logs;
+cuando sale de ese estado escribe el incidente como markdown con
+``KnowledgeBase.record_incident``, que lo indexa junto a los runbooks. Los
+análisis posteriores de fallos parecidos lo recuperan por similitud.
+
+Las caídas más cortas que ``min_outage`` no se registran (reinicios y
+deploys rápidos no aportan nada al índice).
+"""
+import logging
+import os
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+from .analytics import DOWN_STATUSES, format_duration
+from .dispatcher import NotificationSink
+from .history import _event_ts
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_OUTAGE = 60.0  # segundos
+MAX_LOG_CHARS = 3000
+
+
+class IncidentRecorder(NotificationSink):
+    """Convierte cada caída recuperada en un incidente indexado"""
+
+    name = "incidents"
+
+    def __init__(
+        self,
+        knowledge,
+        get_logs: Optional[Callable[[str], Awaitable[Optional[str]]]] = None,
+        min_outage: Optional[float] = None,
+        **kwargs
+    ):
+        """
+        Args:
+            knowledge: KnowledgeBase donde se guardan los incidentes
+            get_logs: Callback async compose_id -> resumen de errores de sus
+                logs, leído al empezar la caída
+            min_outage: Segundos mínimos de caída para registrarla
+                (KB_INCIDENT_MIN_OUTAGE)
+        """
+        kwargs.setdefault("events", {"status_change"})
+        super().__init__(**kwargs)
+        self.knowledge = knowledge
+        self.get_logs = get_logs
+        self.min_outage = min_outage if min_outage is not None else float(
+            os.getenv("KB_INCIDENT_MIN_OUTAGE", DEFAULT_MIN_OUTAGE)
+        )
+
+        # compose_id -> {"started", "previous_status", "logs"}
+        self._open: Dict[str, Dict] = {}
+
+        self.recorded = 0
+        self.ignored = 0
+
+    async def send(self, event: Dict):
+        compose_id = event.get("compose_id")
+        status = event.get("status")
+
+        if status in DOWN_STATUSES:
+            if compose_id not in self._open:
+                self._open[compose_id] = {
+                    "started": _event_ts(event),
+                    "previous_status": event.get("previous_status"),
+                    "status": status,
+                    "logs": await self._read_logs(compose_id)
+                }
+            return
+
+        outage = self._open.pop(compose_id, None)
+        if outage is None:
+            return
+
+        ended = _event_ts(event)
+        duration = ended - outage["started"]
+        if duration < self.min_outage:
+            self.ignored += 1
+            return
+
+        title = f"{event.get('name', 'Unknown')} ({event.get('project_name', 'Unknown')}) en {outage['status']}"
+        try:
+            path = await self.knowledge.record_incident(title, self._body(event, outage, ended, duration))
+        except Exception as e:
+            logger.warning(f"No se pudo registrar el incidente de {event.get('name')}: {e}")
+            return
+        self.recorded += 1
+        logger.info(f"📚 Incidente registrado: {path}")
+
+    async def _read_logs(self, compose_id: str) -> Optional[str]:
+        if self.get_logs is None:
+            return None
+        try:
+            return await self.get_logs(compose_id)
+        except Exception as e:
+            logger.debug(f"Sin logs para el incidente de {compose_id}: {e}")
+            return None
+
+    @staticmethod
+    def _body(event: Dict, outage: Dict, ended: int, duration: int) -> str:
+        def stamp(ts: int) -> str:
+            return datetime.fromtimestamp(ts).isoformat(timespec="seconds")
+
+        lines = [
+            "## Resumen",
+            "",
+            f"- Compose: {event.get('name', 'Unknown')} (`{event.get('compose_id')}`)",
+            f"- Proyecto: {event.get('project_name', 'Unknown')}",
+            f"- Estados: {outage['previous_status']} → {outage['status']} → {event.get('status')}",
+            f"- Caída: {stamp(outage['started'])} → {stamp(ended)} ({format_duration(duration)})",
+        ]
+        if outage["logs"]:
+            lines += ["", "## Errores en los logs", "", "```", outage["logs"][:MAX_LOG_CHARS], "```"]
+        return "\n".join(lines)
+
+    def stats(self) -> Dict:
+        return {
+            "open": len(self._open),
+            "recorded": self.recorded,
+            "ignored": self.ignored
+        }
@@ -0,0 +1,487 @@
+"""
+Ingesta de logs de contenedores y agrupación de patrones de error
+
+``LogCollector`` lee los logs de los contenedores de cada compose con el SDK
+de Docker (socket local o ``DOCKER_HOST``):
+
+- En modo seguimiento (``start``) mantiene un tail en streaming por
+  contenedor y cada ``sync_interval`` segundos detecta contenedores nuevos o
+  eliminados. Los contenedores detenidos se leen una vez (sus últimas líneas
+  suelen explicar la caída).
+- Sin seguimiento, ``summarize`` lee bajo demanda las últimas líneas.
+
+Cada servicio (proyecto/servicio de compose o de stack) guarda sus últimas
+``max_lines`` líneas en un buffer circular, y todas sus líneas pasan por un
+``LogTemplateMiner`` (estilo Drain) que las agrupa en plantillas:
+``connection refused to 10.0.0.3:5432`` y ``connection refused to
+10.0.0.7:6379`` son la misma plantilla ``connection refused to <*>``. Al LLM
+le llega un resumen de plantillas con su cantidad, no el texto crudo.
+
+El SDK de Docker es síncrono: los streams corren en un pool de hilos y el
+event loop solo coordina.
+"""
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUFFER_LINES = 1000
+DEFAULT_TAIL_LINES = 200
+DEFAULT_SYNC_INTERVAL = 30.0  # segundos
+DEFAULT_MAX_STREAMS = 64
+DEFAULT_SIMILARITY = 0.5
+DEFAULT_MAX_CLUSTERS = 200
+MAX_LINE_CHARS = 2000
+
+WILDCARD = "<*>"
+
+# Etiquetas con las que Docker identifica proyecto y servicio
+COMPOSE_PROJECT_LABEL = "com.docker.compose.project"
+COMPOSE_SERVICE_LABEL = "com.docker.compose.service"
+STACK_NAMESPACE_LABEL = "com.docker.stack.namespace"
+SWARM_SERVICE_LABEL = "com.docker.swarm.service.name"
+
+_ANSI = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+# Variables que se reemplazan por <*> antes de agrupar (el orden importa)
+_MASKS = [
+    re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"),
+    re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"),
+    re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"),
+    re.compile(r"\b0x[0-9a-fA-F]+\b|\b[0-9a-fA-F]{12,}\b"),
+    re.compile(r"(?<![A-Za-z])[-+]?\d+(?:\.\d+)?(?:ms|s|kb|mb|gb|b|%)?(?![A-Za-z])"),
+]
+_ERROR = re.compile(
+    r"\b(error|err|exception|fatal|panic|traceback|critical|crit|failed|failure|"
+    r"refused|timeout|timed out|oom|killed|denied|unhealthy|emerg|alert)\b",
+    re.IGNORECASE
+)
+_WARNING = re.compile(r"\b(warn|warning|deprecated)\b", re.IGNORECASE)
+
+
+def line_level(line: str) -> str:
+    """Severidad aproximada de una línea: error, warning o info"""
+    if _ERROR.search(line):
+        return "error"
+    if _WARNING.search(line):
+        return "warning"
+    return "info"
+
+
+def _tokenize(line: str) -> List[str]:
+    masked = line
+    for mask in _MASKS:
+        masked = mask.sub(WILDCARD, masked)
+    return masked.split()
+
+
+class LogCluster:
+    """Plantilla de log y sus apariciones"""
+
+    __slots__ = ("template", "count", "level", "sample", "first_seen", "last_seen")
+
+    def __init__(self, template: List[str], level: str, sample: str, now: float):
+        self.template = template
+        self.count = 0
+        self.level = level
+        self.sample = sample
+        self.first_seen = now
+        self.last_seen = now
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.template)
+
+
+class LogTemplateMiner:
+    """
+    Agrupación incremental de líneas en plantillas (algoritmo Drain simplificado)
+
+    Las líneas se enmascaran (fechas, IPs, números, IDs), se separan en
+    tokens y se buscan entre las plantillas con la misma cantidad de tokens
+    y el mismo primer token. Si la más parecida comparte al menos
+    ``similarity`` de los tokens, la línea se suma a ella y los tokens que
+    difieren pasan a ser ``<*>``; si no, se crea una plantilla nueva.
+    """
+
+    def __init__(self, similarity: float = DEFAULT_SIMILARITY, max_clusters: int = DEFAULT_MAX_CLUSTERS):
+        """
+        Args:
+            similarity: Fracción mínima de tokens iguales para agrupar
+            max_clusters: Plantillas máximas; al superarlo se descarta la
+                menos frecuente
+        """
+        self.similarity = similarity
+        self.max_clusters = max_clusters
+        self._groups: Dict[Tuple[int, str], List[LogCluster]] = {}
+        self.clusters = 0
+        self.evicted = 0
+
+    def add(self, line: str, now: Optional[float] = None) -> Optional[LogCluster]:
+        """Agrega una línea y devuelve su plantilla (None si la línea está vacía)"""
+        tokens = _tokenize(line)
+        if not tokens:
+            return None
+        now = time.time() if now is None else now
+
+        first = tokens[0] if not any(c.isdigit() for c in tokens[0]) else WILDCARD
+        group = self._groups.setdefault((len(tokens), first), [])
+
+        best, best_score = None, -1.0
+        for cluster in group:
+            same = sum(1 for a, b in zip(cluster.template, tokens) if a == b or a == WILDCARD)
+            score = same / len(tokens)
+            if score > best_score:
+                best, best_score = cluster, score
+
+        level = line_level(line)
+        if best is None or best_score < self.similarity:
+            best = LogCluster(tokens, level, line, now)
+            group.append(best)
+            self.clusters += 1
+        else:
+            best.template = [a if a == b else WILDCARD for a, b in zip(best.template, tokens)]
+            if level == "error" or (level == "warning" and best.level == "info"):
+                best.level = level
+
+        best.count += 1
+        best.last_seen = now
+        if self.clusters > self.max_clusters:
+            self._evict(keep=best)
+        return best
+
+    def _evict(self, keep: LogCluster):
+        """Descarta la plantilla menos frecuente, nunca la que acaba de recibir la línea"""
+        key, victim = min(
+            (
+                (key, cluster) for key, group in self._groups.items()
+                for cluster in group if cluster is not keep
+            ),
+            key=lambda item: (item[1].count, item[1].last_seen)
+        )
+        self._groups[key].remove(victim)
+        if not self._groups[key]:
+            del self._groups[key]
+        self.clusters -= 1
+        self.evicted += 1
+
+    def top(self, n: int = 10, levels: Optional[Tuple[str, ...]] = None) -> List[LogCluster]:
+        """Plantillas más relevantes: errores primero, después por cantidad"""
+        rank = {"error": 0, "warning": 1, "info": 2}
+        clusters = [
+            c for group in self._groups.values() for c in group
+            if levels is None or c.level in levels
+        ]
+        clusters.sort(key=lambda c: (rank[c.level], -c.count, -c.last_seen))
+        return clusters[:n]
+
+
+class ServiceLogs:
+    """Buffer circular y plantillas de un servicio"""
+
+    def __init__(self, project: str, service: str, max_lines: int):
+        self.project = project
+        self.service = service
+        self.lines: Deque[Tuple[float, str]] = deque(maxlen=max_lines)
+        self.miner = LogTemplateMiner()
+        self.total = 0
+        self.errors = 0
+        self.warnings = 0
+        # Los streams escriben desde hilos del pool
+        self.lock = threading.Lock()
+
+    def ingest(self, line: str, now: Optional[float] = None):
+        line = _ANSI.sub("", line).rstrip()[:MAX_LINE_CHARS]
+        if not line.strip():
+            return
+        now = time.time() if now is None else now
+        with self.lock:
+            self.lines.append((now, line))
+            cluster = self.miner.add(line, now)
+            self.total += 1
+            level = line_level(line)
+            if level == "error":
+                self.errors += 1
+            elif level == "warning":
+                self.warnings += 1
+        return cluster
+
+    def tail(self, n: int = 20) -> List[str]:
+        with self.lock:
+            return [line for _, line in list(self.lines)[-n:]]
+
+    def summary(self, max_patterns: int = 8, levels: Optional[Tuple[str, ...]] = None) -> str:
+        """Resumen compacto: totales y plantillas más frecuentes"""
+        with self.lock:
+            clusters = self.miner.top(max_patterns, levels)
+            lines = [
+                f"{self.service}: {self.total} líneas, {self.errors} errores, "
+                f"{self.warnings} warnings, {self.miner.clusters} patrones"
+            ]
+            for cluster in clusters:
+                lines.append(f"  {cluster.count}× [{cluster.level}] {cluster.text[:300]}")
+        return "\n".join(lines)
+
+
+def container_identity(labels: Dict[str, str], name: str = "") -> Optional[Tuple[str, str]]:
+    """(proyecto, servicio) de un contenedor según sus etiquetas de compose o stack"""
+    project = labels.get(COMPOSE_PROJECT_LABEL)
+    if project:
+        return project, labels.get(COMPOSE_SERVICE_LABEL) or name
+    project = labels.get(STACK_NAMESPACE_LABEL)
+    if project:
+        service = labels.get(SWARM_SERVICE_LABEL) or name
+        prefix = f"{project}_"
+        return project, service[len(prefix):] if service.startswith(prefix) else service
+    return None
+
+
+class LogCollector:
+    """Logs de los contenedores de cada compose, agrupados por servicio"""
+
+    def __init__(
+        self,
+        docker_client=None,
+        max_lines: Optional[int] = None,
+        tail: Optional[int] = None,
+        sync_interval: Optional[float] = None,
+        max_streams: Optional[int] = None
+    ):
+        """
+        Args:
+            docker_client: Cliente del SDK de Docker (por defecto
+                ``docker.from_env()``, que respeta DOCKER_HOST)
+            max_lines: Líneas guardadas por servicio (LOG_BUFFER_LINES)
+            tail: Líneas leídas al empezar a seguir un contenedor (LOG_TAIL_LINES)
+            sync_interval: Segundos entre búsquedas de contenedores nuevos
+                (LOG_SYNC_INTERVAL)
+            max_streams: Contenedores seguidos a la vez (LOG_MAX_STREAMS)
+        """
+        self._docker = docker_client
+        self.max_lines = max_lines or int(os.getenv("LOG_BUFFER_LINES", DEFAULT_BUFFER_LINES))
+        self.tail = tail or int(os.getenv("LOG_TAIL_LINES", DEFAULT_TAIL_LINES))
+        self.sync_interval = sync_interval or float(
+            os.getenv("LOG_SYNC_INTERVAL", DEFAULT_SYNC_INTERVAL)
+        )
+        self.max_streams = max_streams or int(os.getenv("LOG_MAX_STREAMS", DEFAULT_MAX_STREAMS))
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_streams, thread_name_prefix="logs")
+        self._services: Dict[Tuple[str, str], ServiceLogs] = {}
+        # container_id -> (stream abierto o None, futuro del hilo)
+        self._streams: Dict[str, list] = {}
+        # container_id -> instante en que terminó su stream (para no releerlo)
+        self._finished: Dict[str, float] = {}
+        self._sync_task: Optional[asyncio.Task] = None
+
+        self.syncs = 0
+        self.stream_errors = 0
+
+    @property
+    def docker(self):
+        if self._docker is None:
+            import docker
+            self._docker = docker.from_env()
+        return self._docker
+
+    def _buffer(self, project: str, service: str) -> ServiceLogs:
+        key = (project, service)
+        buffer = self._services.get(key)
+        if buffer is None:
+            buffer = self._services[key] = ServiceLogs(project, service, self.max_lines)
+        return buffer
+
+    # ========== SEGUIMIENTO EN STREAMING ==========
+
+    async def start(self):
+        """Empieza a seguir los logs de todos los contenedores de compose/stack"""
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.create_task(self._sync_loop())
+            logger.info("📜 Recolector de logs iniciado")
+
+    async def _sync_loop(self):
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Error al listar contenedores para logs: {e}")
+            await asyncio.sleep(self.sync_interval)
+
+    async def sync(self):
+        """Abre streams para contenedores nuevos y cierra los de contenedores eliminados"""
+        loop = asyncio.get_running_loop()
+        containers = await loop.run_in_executor(None, lambda: self.docker.containers.list(all=True))
+        self.syncs += 1
+
+        present = set()
+        for container in containers:
+            identity = container_identity(container.labels or {}, container.name)
+            if identity is None:
+                continue
+            present.add(container.id)
+            if container.id in self._streams:
+                continue
+
+            running = container.status == "running"
+            since = self._finished.get(container.id)
+            if since is not None and not running:
+                continue  # Ya leído y sigue detenido
+            if running and len(self._streams) >= self.max_streams:
+                continue
+
+            # El buffer se crea aquí, en el loop: los hilos del pool solo
+            # escriben en el suyo y nunca modifican _services
+            buffer = self._buffer(*identity)
+            entry = self._streams[container.id] = [None, None]
+            entry[1] = loop.run_in_executor(
+                self._executor, self._follow, container, buffer, running, since
+            )
+            entry[1].add_done_callback(lambda _, cid=container.id: self._stream_done(cid))
+
+        for container_id in list(self._streams):
+            if container_id not in present:
+                self._close_stream(container_id)
+        for container_id in list(self._finished):
+            if container_id not in present:
+                del self._finished[container_id]
+
+    def _follow(self, container, buffer: ServiceLogs, follow: bool, since: Optional[float]):
+        """Lee el stream de un contenedor (corre en un hilo del pool)"""
+        kwargs = {"stream": True, "follow": follow, "timestamps": False}
+        if since is not None:
+            kwargs["since"] = int(since)
+        else:
+            kwargs["tail"] = self.tail
+
+        try:
+            stream = container.logs(**kwargs)
+            entry = self._streams.get(container.id)
+            if entry is not None:
+                entry[0] = stream
+            pending = b""
+            for chunk in stream:
+                pending += chunk
+                *lines, pending = pending.split(b"\n")
+                for raw in lines:
+                    buffer.ingest(raw.decode("utf-8", "replace"))
+            if pending:
+                buffer.ingest(pending.decode("utf-8", "replace"))
+        except Exception as e:
+            if container.id in self._streams:
+                self.stream_errors += 1
+                logger.debug(f"Stream de logs de {container.name} terminado: {e}")
+
+    def _stream_done(self, container_id: str):
+        self._streams.pop(container_id, None)
+        self._finished[container_id] = time.time()
+
+    def _close_stream(self, container_id: str):
+        entry = self._streams.pop(container_id, None)
+        if entry and entry[0] is not None:
+            try:
+                entry[0].close()
+            except Exception:
+                pass
+
+    async def aclose(self):
+        """Detiene la sincronización y cierra todos los streams"""
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+        for container_id in list(self._streams):
+            self._close_stream(container_id)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ========== CONSULTAS ==========
+
+    async def collect(self, project: str) -> int:
+        """
+        Lee una vez las últimas líneas de los contenedores de un proyecto
+
+        Se usa cuando no hay seguimiento en streaming. Reemplaza los
+        buffers del proyecto.
+
+        Returns:
+            Contenedores leídos
+        """
+        def read() -> List[Tuple[Tuple[str, str], bytes]]:
+            found = []
+            for label in (COMPOSE_PROJECT_LABEL, STACK_NAMESPACE_LABEL):
+                for container in self.docker.containers.list(all=True, filters={"label": f"{label}={project}"}):
+                    identity = container_identity(container.labels or {}, container.name)
+                    if identity is not None:
+                        found.append((identity, container.logs(tail=self.tail, timestamps=False)))
+            return found
+
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(None, read)
+
+        for key in [k for k in self._services if k[0] == project]:
+            del self._services[key]
+        for identity, output in results:
+            buffer = self._buffer(*identity)
+            for line in output.decode("utf-8", "replace").splitlines():
+                buffer.ingest(line)
+        return len(results)
+
+    def services(self, project: str) -> List[ServiceLogs]:
+        return sorted(
+            (b for (p, _), b in self._services.items() if p == project),
+            key=lambda b: (-b.errors, b.service)
+        )
+
+    async def summarize(
+        self,
+        project: str,
+        max_patterns: int = 8,
+        errors_only: bool = False
+    ) -> str:
+        """
+        Resumen de patrones de log de un proyecto (appName del compose)
+
+        Si el proyecto no se está siguiendo, lee las últimas líneas bajo demanda.
+
+        Args:
+            project: Nombre del proyecto de Docker (appName en Dokploy)
+            max_patterns: Plantillas por servicio
+            errors_only: Solo errores y warnings; si no hay, las últimas líneas
+        """
+        if not self._sync_task or not self.services(project):
+            await self.collect(project)
+
+        buffers = self.services(project)
+        if not buffers:
+            return ""
+
+        parts = []
+        for buffer in buffers:
+            if errors_only and not (buffer.errors or buffer.warnings):
+                tail = buffer.tail(5)
+                if tail:
+                    parts.append(f"{buffer.service}: sin errores; últimas líneas:\n" +
+                                 "\n".join(f"  {line[:300]}" for line in tail))
+                continue
+            levels = ("error", "warning") if errors_only else None
+            parts.append(buffer.summary(max_patterns, levels))
+        return "\n".join(parts)
+
+    def stats(self) -> Dict:
+        return {
+            "streams": len(self._streams),
+            "services": len(self._services),
+            "lines": sum(b.total for b in self._services.values()),
+            "buffered": sum(len(b.lines) for b in self._services.values()),
+            "patterns": sum(b.miner.clusters for b in self._services.values()),
+            "syncs": self.syncs,
+            "stream_errors": self.stream_errors
+        }
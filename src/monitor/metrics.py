@@ -0,0 +1,462 @@
+"""
+Métricas de recursos de contenedores en buffers circulares multi-resolución
+
+``MetricsCollector`` abre un stream de ``docker stats`` por contenedor de
+compose o stack (Docker envía una muestra por segundo; un hilo por stream
+en lugar de una llamada bloqueante por contenedor y chequeo) y guarda cada
+contenedor en una ``MetricSeries``:
+
+- Campos: CPU %, memoria (bytes y % del límite), red y disco (bytes/s).
+- Tres resoluciones, cada una un array NumPy de tamaño fijo:
+  10 s durante 1 h, 1 min durante 24 h y 1 h durante 30 días. Las muestras
+  se promedian por intervalo y cada nivel alimenta al siguiente.
+- La memoria de cada serie se reserva al crearla y no crece
+  (``MetricSeries.bytes_per_series()``, ~90 KB); el número de series está
+  acotado por ``max_series``.
+
+Las consultas (percentiles y tendencias) eligen la resolución más fina que
+cubre la ventana pedida. Al estar promediadas, los percentiles de ventanas
+largas suavizan los picos de pocos segundos.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .logs import container_identity
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("cpu_pct", "mem_bytes", "mem_pct", "net_rx_bps", "net_tx_bps", "blk_read_bps", "blk_write_bps")
+FIELD_INDEX = {name: i for i, name in enumerate(FIELDS)}
+
+# (segundos por muestra, muestras guardadas)
+RESOLUTIONS = ((10, 360), (60, 1440), (3600, 720))
+
+DEFAULT_MAX_SERIES = 256
+DEFAULT_SYNC_INTERVAL = 30.0  # segundos
+DEFAULT_CPU_ALERT = 90.0  # % p95 en la última hora
+DEFAULT_MEM_ALERT = 90.0  # % del límite
+
+
+class _Ring:
+    """Buffer circular de una resolución, con el intervalo en curso acumulándose"""
+
+    __slots__ = ("step", "values", "times", "pos", "count", "_sum", "_n", "_bucket")
+
+    def __init__(self, step: int, capacity: int, width: int):
+        self.step = step
+        self.values = np.full((capacity, width), np.nan, dtype=np.float32)
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.pos = 0
+        self.count = 0
+        self._sum = np.zeros(width, dtype=np.float64)
+        self._n = np.zeros(width, dtype=np.int32)
+        self._bucket: Optional[int] = None
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.times.nbytes + self._sum.nbytes + self._n.nbytes
+
+    def add(self, ts: float, row: np.ndarray) -> Optional[Tuple[float, np.ndarray]]:
+        """Acumula una muestra; devuelve el intervalo cerrado (si se cerró uno)"""
+        bucket = int(ts // self.step)
+        closed = None
+        if self._bucket is not None and bucket != self._bucket:
+            closed = self._close()
+        self._bucket = bucket
+
+        valid = ~np.isnan(row)
+        self._sum[valid] += row[valid]
+        self._n[valid] += 1
+        return closed
+
+    def _close(self) -> Tuple[float, np.ndarray]:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(self._n > 0, self._sum / np.maximum(self._n, 1), np.nan).astype(np.float32)
+        ts = float(self._bucket * self.step)
+        self.values[self.pos] = mean
+        self.times[self.pos] = ts
+        self.pos = (self.pos + 1) % len(self.times)
+        self.count = min(self.count + 1, len(self.times))
+        self._sum[:] = 0
+        self._n[:] = 0
+        return ts, mean
+
+    def window(self, since: float, field: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(instantes, valores) de un campo desde ``since``, en orden temporal"""
+        mask = self.times >= since
+        times = self.times[mask]
+        values = self.values[mask, field]
+        order = np.argsort(times)
+        return times[order], values[order]
+
+
+class MetricSeries:
+    """Métricas de un contenedor en tres resoluciones de tamaño fijo"""
+
+    def __init__(self, resolutions: Sequence[Tuple[int, int]] = RESOLUTIONS):
+        self.rings = [_Ring(step, capacity, len(FIELDS)) for step, capacity in resolutions]
+        self.last = np.full(len(FIELDS), np.nan, dtype=np.float32)
+        self.last_ts = 0.0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def bytes_per_series(resolutions: Sequence[Tuple[int, int]] = RESOLUTIONS) -> int:
+        """Memoria reservada por serie (sin contar objetos de Python)"""
+        width = len(FIELDS)
+        return sum(capacity * (width * 4 + 8) + width * 12 for _, capacity in resolutions) + width * 4
+
+    @property
+    def nbytes(self) -> int:
+        return sum(ring.nbytes for ring in self.rings) + self.last.nbytes
+
+    def add(self, ts: float, row: np.ndarray):
+        with self.lock:
+            self.last = row
+            self.last_ts = ts
+            sample: Optional[Tuple[float, np.ndarray]] = (ts, row)
+            for ring in self.rings:
+                sample = ring.add(*sample)
+                if sample is None:
+                    break
+
+    def _ring_for(self, seconds: float) -> _Ring:
+        for ring in self.rings:
+            if ring.step * len(ring.times) >= seconds:
+                return ring
+        return self.rings[-1]
+
+    def window(self, field: str, seconds: float, now: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        now = time.time() if now is None else now
+        with self.lock:
+            return self._ring_for(seconds).window(now - seconds, FIELD_INDEX[field])
+
+    def percentiles(
+        self,
+        field: str,
+        seconds: float = 3600,
+        q: Sequence[float] = (50, 95, 99),
+        now: Optional[float] = None
+    ) -> Optional[Dict[str, float]]:
+        _, values = self.window(field, seconds, now)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return None
+        return {f"p{int(p)}": float(v) for p, v in zip(q, np.percentile(values, q))}
+
+    def trend(self, field: str, seconds: float = 3600, now: Optional[float] = None) -> Optional[float]:
+        """Pendiente por hora (regresión lineal) en la ventana, o None con pocos datos"""
+        times, values = self.window(field, seconds, now)
+        valid = ~np.isnan(values)
+        if valid.sum() < 3:
+            return None
+        times, values = times[valid], values[valid].astype(np.float64)
+        slope = np.polyfit((times - times[0]) / 3600.0, values, 1)[0]
+        return float(slope)
+
+
+def parse_stats(stats: Dict, previous: Optional[Dict], elapsed: float) -> np.ndarray:
+    """
+    Fila de métricas a partir de una muestra de ``docker stats``
+
+    Las tasas de red y disco se calculan contra la muestra anterior.
+    """
+    row = np.full(len(FIELDS), np.nan, dtype=np.float32)
+
+    cpu = stats.get("cpu_stats") or {}
+    precpu = stats.get("precpu_stats") or {}
+    cpu_delta = (cpu.get("cpu_usage") or {}).get("total_usage", 0) - (precpu.get("cpu_usage") or {}).get("total_usage", 0)
+    system_delta = cpu.get("system_cpu_usage", 0) - precpu.get("system_cpu_usage", 0)
+    cpus = cpu.get("online_cpus") or len((cpu.get("cpu_usage") or {}).get("percpu_usage") or []) or 1
+    if system_delta > 0 and cpu_delta >= 0:
+        row[0] = cpu_delta / system_delta * cpus * 100.0
+
+    memory = stats.get("memory_stats") or {}
+    if "usage" in memory:
+        detail = memory.get("stats") or {}
+        # Igual que docker stats: sin la caché de páginas inactivas
+        cache = detail.get("inactive_file", detail.get("total_inactive_file", detail.get("cache", 0)))
+        used = max(memory["usage"] - cache, 0)
+        row[1] = used
+        if memory.get("limit"):
+            row[2] = used / memory["limit"] * 100.0
+
+    if previous is not None and elapsed > 0:
+        rx, tx = _network_totals(stats)
+        prev_rx, prev_tx = _network_totals(previous)
+        if rx >= prev_rx and tx >= prev_tx:
+            row[3] = (rx - prev_rx) / elapsed
+            row[4] = (tx - prev_tx) / elapsed
+        read, write = _block_totals(stats)
+        prev_read, prev_write = _block_totals(previous)
+        if read >= prev_read and write >= prev_write:
+            row[5] = (read - prev_read) / elapsed
+            row[6] = (write - prev_write) / elapsed
+    return row
+
+
+def _network_totals(stats: Dict) -> Tuple[int, int]:
+    networks = (stats.get("networks") or {}).values()
+    return sum(n.get("rx_bytes", 0) for n in networks), sum(n.get("tx_bytes", 0) for n in networks)
+
+
+def _block_totals(stats: Dict) -> Tuple[int, int]:
+    read = write = 0
+    for entry in (stats.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []:
+        op = (entry.get("op") or "").lower()
+        if op == "read":
+            read += entry.get("value", 0)
+        elif op == "write":
+            write += entry.get("value", 0)
+    return read, write
+
+
+def format_bytes(value: float) -> str:
+    for unit in ("B", "K", "M", "G"):
+        if abs(value) < 1024:
+            return f"{value:.0f}{unit}"
+        value /= 1024
+    return f"{value:.1f}T"
+
+
+class MetricsCollector:
+    """Stats de los contenedores de cada compose, por contenedor"""
+
+    def __init__(
+        self,
+        docker_client=None,
+        max_series: Optional[int] = None,
+        sync_interval: Optional[float] = None,
+        cpu_alert: Optional[float] = None,
+        mem_alert: Optional[float] = None
+    ):
+        """
+        Args:
+            docker_client: Cliente del SDK de Docker (por defecto ``docker.from_env()``)
+            max_series: Contenedores con métricas (METRICS_MAX_SERIES); la
+                memoria total queda acotada a max_series * bytes_per_series()
+            sync_interval: Segundos entre búsquedas de contenedores nuevos
+                (METRICS_SYNC_INTERVAL)
+            cpu_alert: CPU % (p95 de la última hora) que se considera alta
+                (METRICS_CPU_ALERT)
+            mem_alert: Memoria en % del límite que se considera alta
+                (METRICS_MEM_ALERT)
+        """
+        self._docker = docker_client
+        self.max_series = max_series or int(os.getenv("METRICS_MAX_SERIES", DEFAULT_MAX_SERIES))
+        self.sync_interval = sync_interval or float(
+            os.getenv("METRICS_SYNC_INTERVAL", DEFAULT_SYNC_INTERVAL)
+        )
+        self.cpu_alert = cpu_alert or float(os.getenv("METRICS_CPU_ALERT", DEFAULT_CPU_ALERT))
+        self.mem_alert = mem_alert or float(os.getenv("METRICS_MEM_ALERT", DEFAULT_MEM_ALERT))
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_series, thread_name_prefix="metrics")
+        # Nombre del contenedor -> serie (el nombre se mantiene entre redeploys)
+        self.series: Dict[str, MetricSeries] = {}
+        self._identity: Dict[str, Tuple[str, str]] = {}
+        # Nombre del contenedor -> evento para detener su stream
+        self._streams: Dict[str, threading.Event] = {}
+        self._sync_task: Optional[asyncio.Task] = None
+
+        self.samples = 0
+        self.syncs = 0
+        self.stream_errors = 0
+
+    @property
+    def docker(self):
+        if self._docker is None:
+            import docker
+            self._docker = docker.from_env()
+        return self._docker
+
+    @property
+    def memory_bound(self) -> int:
+        """Bytes máximos reservados por las series"""
+        return self.max_series * MetricSeries.bytes_per_series()
+
+    async def start(self):
+        """Empieza a seguir las stats de todos los contenedores de compose/stack"""
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.create_task(self._sync_loop())
+            logger.info(
+                f"📈 Recolector de métricas iniciado "
+                f"(máx. {self.max_series} series, {format_bytes(self.memory_bound)})"
+            )
+
+    async def _sync_loop(self):
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Error al listar contenedores para métricas: {e}")
+            await asyncio.sleep(self.sync_interval)
+
+    async def sync(self):
+        """Abre un stream por contenedor en ejecución y cierra los que ya no están"""
+        loop = asyncio.get_running_loop()
+        containers = await loop.run_in_executor(None, lambda: self.docker.containers.list())
+        self.syncs += 1
+
+        running = set()
+        for container in containers:
+            identity = container_identity(container.labels or {}, container.name)
+            if identity is None:
+                continue
+            running.add(container.name)
+            self._identity[container.name] = identity
+            if container.name in self._streams:
+                continue
+            series = self._series(container.name)
+            if series is None:
+                continue
+
+            stop = self._streams[container.name] = threading.Event()
+            future = loop.run_in_executor(self._executor, self._follow, container, series, stop)
+            future.add_done_callback(lambda _, name=container.name, stop=stop: self._stream_done(name, stop))
+
+        for name in list(self._streams):
+            if name not in running:
+                self._streams.pop(name).set()
+
+    def _series(self, name: str) -> Optional[MetricSeries]:
+        series = self.series.get(name)
+        if series is not None:
+            return series
+        if len(self.series) >= self.max_series:
+            # Liberar la serie más vieja de un contenedor que ya no se sigue
+            idle = [n for n in self.series if n not in self._streams]
+            if not idle:
+                return None
+            victim = min(idle, key=lambda n: self.series[n].last_ts)
+            del self.series[victim]
+            self._identity.pop(victim, None)
+        series = self.series[name] = MetricSeries()
+        return series
+
+    def _follow(self, container, series: MetricSeries, stop: threading.Event):
+        """Lee el stream de stats de un contenedor (corre en un hilo del pool)"""
+        previous, previous_at = None, None
+        try:
+            for stats in container.stats(stream=True, decode=True):
+                if stop.is_set():
+                    break
+                now = time.time()
+                elapsed = now - previous_at if previous_at is not None else 0.0
+                series.add(now, parse_stats(stats, previous, elapsed))
+                previous, previous_at = stats, now
+                self.samples += 1
+        except Exception as e:
+            if not stop.is_set():
+                self.stream_errors += 1
+                logger.debug(f"Stream de stats de {container.name} terminado: {e}")
+
+    def _stream_done(self, name: str, stop: threading.Event):
+        if self._streams.get(name) is stop:
+            del self._streams[name]
+
+    async def aclose(self):
+        """Detiene la sincronización y todos los streams"""
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+        for stop in self._streams.values():
+            stop.set()
+        self._streams.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ========== CONSULTAS ==========
+
+    def project_stats(self, project: str, window: float = 3600) -> Dict[str, Dict]:
+        """
+        Resumen por contenedor de un proyecto (appName del compose)
+
+        Returns:
+            nombre del contenedor -> servicio, valores actuales, percentiles de
+            CPU y memoria en la ventana y tendencia de memoria (bytes/hora)
+        """
+        result = {}
+        now = time.time()
+        for name, (container_project, service) in sorted(self._identity.items()):
+            series = self.series.get(name)
+            if container_project != project or series is None or not series.last_ts:
+                continue
+            last = series.last
+            result[name] = {
+                "service": service,
+                "running": name in self._streams,
+                "age_s": round(now - series.last_ts, 1),
+                **{field: (None if np.isnan(last[i]) else float(last[i])) for i, field in enumerate(FIELDS)},
+                "cpu_pct_window": series.percentiles("cpu_pct", window, now=now),
+                "mem_pct_window": series.percentiles("mem_pct", window, now=now),
+                "mem_trend_per_hour": series.trend("mem_bytes", window, now=now)
+            }
+        return result
+
+    def latest(self, fields: Sequence[str] = ("cpu_pct", "mem_bytes")) -> Tuple[List[str], List[Tuple[str, str]], np.ndarray]:
+        """
+        Último valor de cada contenedor en seguimiento, en forma de matriz
+
+        Returns:
+            (nombres, (proyecto, servicio) de cada uno, matriz contenedores x campos)
+        """
+        names = [name for name in self.series if name in self._streams and name in self._identity]
+        columns = [FIELD_INDEX[field] for field in fields]
+        if not names:
+            return [], [], np.empty((0, len(columns)), dtype=np.float32)
+        matrix = np.vstack([self.series[name].last[columns] for name in names])
+        return names, [self._identity[name] for name in names], matrix
+
+    def warnings(self, project: str, window: float = 3600) -> List[str]:
+        """Problemas de recursos de un proyecto (CPU sostenida alta, memoria cerca del límite)"""
+        warnings = []
+        for name, item in self.project_stats(project, window).items():
+            if not item["running"]:
+                continue
+            cpu = item["cpu_pct_window"]
+            if cpu and cpu["p95"] >= self.cpu_alert:
+                warnings.append(f"{item['service']}: CPU p95 {cpu['p95']:.0f}%")
+            if item["mem_pct"] is not None and item["mem_pct"] >= self.mem_alert:
+                warnings.append(f"{item['service']}: memoria al {item['mem_pct']:.0f}% del límite")
+        return warnings
+
+    def summary(self, project: str, window: float = 3600) -> str:
+        """Resumen compacto de recursos para el contexto del LLM"""
+        parts = []
+        for item in self.project_stats(project, window).values():
+            if not item["running"]:
+                continue
+            text = item["service"]
+            if item["cpu_pct"] is not None:
+                cpu = item["cpu_pct_window"]
+                text += f" cpu {item['cpu_pct']:.0f}%" + (f"(p95 {cpu['p95']:.0f}%)" if cpu else "")
+            if item["mem_bytes"] is not None:
+                text += f" mem {format_bytes(item['mem_bytes'])}"
+                if item["mem_pct"] is not None:
+                    text += f"({item['mem_pct']:.0f}%)"
+                trend = item["mem_trend_per_hour"]
+                if trend is not None and abs(trend) >= 1024 * 1024:
+                    text += f" {'↑' if trend > 0 else '↓'}{format_bytes(abs(trend))}/h"
+            parts.append(text)
+        return "; ".join(parts)
+
+    def stats(self) -> Dict:
+        return {
+            "streams": len(self._streams),
+            "series": len(self.series),
+            "samples": self.samples,
+            "memory_bytes": sum(s.nbytes for s in self.series.values()),
+            "memory_bound_bytes": self.memory_bound,
+            "syncs": self.syncs,
+            "stream_errors": self.stream_errors
+        }
@@ -0,0 +1,445 @@
+"""
+Auto-remediación declarativa a partir de los eventos del monitor
+
+``RemediationEngine`` es un sink más del dispatcher: cada evento se compara
+con las reglas de un YAML y, si alguna coincide, se ejecuta su acción sobre
+el compose (``start``, ``stop``, ``redeploy`` o ``restart`` = stop + start)
+en una tarea aparte, sin bloquear la cola del sink.
+
+Formato de las reglas::
+
+    rules:
+      - name: reiniciar-caidos
+        match:                 # campos del evento; glob o lista de globs
+          event: status_change
+          status: error
+          project_name: "prod-*"
+        action: restart
+        delay: 30              # espera y vuelve a comprobar antes de actuar
+        verify: 180            # segundos para que el compose llegue a `expect`
+        expect: done
+        cooldown: 900          # opcional, pisa REMEDIATION_COOLDOWN
+
+Salvaguardas:
+    - Cooldown por compose: tras una acción no se vuelve a tocar ese compose
+      durante ``cooldown`` segundos, sea cual sea la regla.
+    - Límite global de acciones simultáneas.
+    - Circuit breaker por regla y compose: tras ``breaker_failures`` fallos
+      seguidos (error de la API o verificación fallida) la regla deja de
+      aplicarse a ese compose durante ``breaker_reset`` segundos; después
+      se permite un único intento y un éxito lo cierra.
+    - Modo dry-run (por defecto): se decide y se audita, pero no se llama a
+      la API.
+
+Cada decisión queda en un log de auditoría JSONL.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime
+from fnmatch import fnmatchcase
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import yaml
+
+from .dispatcher import NotificationSink
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_PATH = "config/remediation.yaml"
+DEFAULT_AUDIT_PATH = "data/remediation_audit.jsonl"
+DEFAULT_COOLDOWN = 600.0  # segundos
+DEFAULT_MAX_CONCURRENT = 2
+DEFAULT_BREAKER_FAILURES = 3
+DEFAULT_BREAKER_RESET = 3600.0  # segundos
+DEFAULT_VERIFY_INTERVAL = 10.0  # segundos
+RECENT_ACTIONS = 50
+
+ACTIONS = {"start", "stop", "redeploy", "restart"}
+
+
+class RemediationRule:
+    """Regla de remediación validada"""
+
+    def __init__(self, spec: Dict):
+        if not isinstance(spec, dict) or not spec.get("name"):
+            raise ValueError(f"Regla de remediación sin nombre: {spec}")
+
+        self.name = str(spec["name"])
+        self.action = spec.get("action")
+        if self.action not in ACTIONS:
+            raise ValueError(
+                f"Acción desconocida en la regla {self.name}: {self.action} "
+                f"(válidas: {', '.join(sorted(ACTIONS))})"
+            )
+
+        match = spec.get("match") or {}
+        if not isinstance(match, dict) or not match:
+            raise ValueError(f"La regla {self.name} necesita un bloque 'match'")
+        self.match = {
+            key: [str(p) for p in (value if isinstance(value, list) else [value])]
+            for key, value in match.items()
+        }
+
+        self.delay = float(spec.get("delay", 0))
+        self.verify = float(spec.get("verify", 0))
+        self.expect = str(spec.get("expect", "done"))
+        self.cooldown = float(spec["cooldown"]) if "cooldown" in spec else None
+
+    def matches(self, event: Dict) -> bool:
+        return all(
+            any(fnmatchcase(str(event.get(key)), pattern) for pattern in patterns)
+            for key, patterns in self.match.items()
+        )
+
+    def status_matches(self, status: Optional[str]) -> bool:
+        """True si el estado actual sigue cumpliendo la condición de la regla"""
+        patterns = self.match.get("status")
+        return patterns is None or any(fnmatchcase(str(status), p) for p in patterns)
+
+
+class _Breaker:
+    __slots__ = ("failures", "opened_at")
+
+    def __init__(self):
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+
+def load_rules(path: str) -> List[RemediationRule]:
+    """Lee y valida las reglas de un YAML (lista vacía si no existe)"""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    return [RemediationRule(spec) for spec in data.get("rules") or []]
+
+
+class RemediationEngine(NotificationSink):
+    """Ejecuta las acciones de las reglas que coinciden con cada evento"""
+
+    name = "remediation"
+
+    def __init__(
+        self,
+        client,
+        rules: Optional[List[RemediationRule]] = None,
+        rules_path: Optional[str] = None,
+        audit_path: Optional[str] = None,
+        dry_run: Optional[bool] = None,
+        cooldown: Optional[float] = None,
+        max_concurrent: Optional[int] = None,
+        breaker_failures: Optional[int] = None,
+        breaker_reset: Optional[float] = None,
+        verify_interval: Optional[float] = None,
+        get_status: Optional[Callable[[str], Awaitable[Optional[str]]]] = None,
+        notify: Optional[Callable[[str], Awaitable]] = None,
+        **kwargs
+    ):
+        """
+        Args:
+            client: DokployClient con start/stop/deploy_compose y get_compose
+            rules: Reglas ya cargadas (si no, se leen de ``rules_path``)
+            rules_path: YAML de reglas (REMEDIATION_RULES_PATH)
+            audit_path: Log de auditoría JSONL (REMEDIATION_AUDIT_PATH)
+            dry_run: Solo decidir y auditar, sin llamar a la API
+                (REMEDIATION_DRY_RUN, true por defecto)
+            cooldown: Segundos sin tocar un compose tras una acción
+                (REMEDIATION_COOLDOWN)
+            max_concurrent: Acciones en curso a la vez (REMEDIATION_MAX_CONCURRENT)
+            breaker_failures: Fallos seguidos que abren el circuito de una
+                regla para un compose (REMEDIATION_BREAKER_FAILURES)
+            breaker_reset: Segundos que el circuito permanece abierto
+                (REMEDIATION_BREAKER_RESET)
+            verify_interval: Segundos entre consultas al verificar
+            get_status: Callback async compose_id -> estado actual; por
+                defecto se consulta ``client.get_compose``
+            notify: Callback async que recibe un texto por cada acción
+        """
+        kwargs.setdefault("events", {"status_change", "deployment", "anomaly"})
+        kwargs.setdefault("policy", "drop_newest")
+        super().__init__(**kwargs)
+
+        self.client = client
+        self.rules_path = rules_path or os.getenv("REMEDIATION_RULES_PATH", DEFAULT_RULES_PATH)
+        self.rules = rules if rules is not None else load_rules(self.rules_path)
+        self.audit_path = audit_path or os.getenv("REMEDIATION_AUDIT_PATH", DEFAULT_AUDIT_PATH)
+        self.dry_run = dry_run if dry_run is not None else (
+            os.getenv("REMEDIATION_DRY_RUN", "true").lower() == "true"
+        )
+        self.cooldown = cooldown if cooldown is not None else float(
+            os.getenv("REMEDIATION_COOLDOWN", DEFAULT_COOLDOWN)
+        )
+        self.max_concurrent = max_concurrent or int(
+            os.getenv("REMEDIATION_MAX_CONCURRENT", DEFAULT_MAX_CONCURRENT)
+        )
+        self.breaker_failures = breaker_failures or int(
+            os.getenv("REMEDIATION_BREAKER_FAILURES", DEFAULT_BREAKER_FAILURES)
+        )
+        self.breaker_reset = breaker_reset or float(
+            os.getenv("REMEDIATION_BREAKER_RESET", DEFAULT_BREAKER_RESET)
+        )
+        self.verify_interval = verify_interval or DEFAULT_VERIFY_INTERVAL
+        self.get_status = get_status or self._fetch_status
+        self.notify = notify
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._last_action: Dict[str, float] = {}
+        self._breakers: Dict[Tuple[str, str], _Breaker] = {}
+        self.recent: Deque[Dict] = deque(maxlen=RECENT_ACTIONS)
+
+        self.counters = {
+            "matched": 0,
+            "executed": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "dry_runs": 0,
+            "skipped": 0,
+            "busy": 0,
+        }
+
+        mode = "dry-run" if self.dry_run else "activa"
+        logger.info(f"🩺 Auto-remediación {mode}: {len(self.rules)} reglas de {self.rules_path}")
+
+    # ---- Entrada de eventos ----
+
+    async def send(self, event: Dict):
+        """Lanza la regla que coincide sin esperar a que termine"""
+        compose_id = event.get("compose_id")
+        if not compose_id:
+            return
+
+        rule = next((r for r in self.rules if r.matches(event)), None)
+        if rule is None:
+            return
+        self.counters["matched"] += 1
+
+        # Una sola remediación en curso por compose
+        if compose_id in self._tasks:
+            self.counters["busy"] += 1
+            return
+
+        reason = self._blocked(rule, compose_id)
+        if reason:
+            await self._skip(rule, event, reason)
+            return
+
+        task = asyncio.create_task(self._remediate(rule, event), name=f"remediate-{compose_id}")
+        self._tasks[compose_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(compose_id, None))
+
+    def _blocked(self, rule: RemediationRule, compose_id: str) -> Optional[str]:
+        """Motivo por el que no se puede actuar ahora (None = adelante)"""
+        now = time.monotonic()
+        cooldown = rule.cooldown if rule.cooldown is not None else self.cooldown
+        last = self._last_action.get(compose_id)
+        if last is not None and now - last < cooldown:
+            return f"cooldown ({cooldown - (now - last):.0f}s restantes)"
+
+        breaker = self._breakers.get((rule.name, compose_id))
+        if breaker is not None and breaker.opened_at is not None:
+            if now - breaker.opened_at < self.breaker_reset:
+                return f"circuito abierto tras {breaker.failures} fallos"
+        return None
+
+    # ---- Ejecución ----
+
+    async def _remediate(self, rule: RemediationRule, event: Dict):
+        compose_id = event["compose_id"]
+        try:
+            if rule.delay:
+                await asyncio.sleep(rule.delay)
+                # El compose puede haberse recuperado solo durante la espera
+                if "status" in rule.match:
+                    status = await self.get_status(compose_id)
+                    if not rule.status_matches(status):
+                        await self._audit(rule, event, "recovered", f"estado actual: {status}")
+                        return
+                reason = self._blocked(rule, compose_id)
+                if reason:
+                    await self._skip(rule, event, reason)
+                    return
+
+            async with self._semaphore:
+                self._last_action[compose_id] = time.monotonic()
+
+                if self.dry_run:
+                    self.counters["dry_runs"] += 1
+                    await self._audit(rule, event, "dry_run", f"se ejecutaría {rule.action}")
+                    return
+
+                self.counters["executed"] += 1
+                started = time.monotonic()
+                try:
+                    await self._run_action(rule.action, compose_id)
+                    detail = await self._verify(rule, compose_id)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    detail = f"{type(e).__name__}: {e}"
+                    ok = False
+                else:
+                    ok = detail is None
+                    detail = detail or (f"estado {rule.expect}" if rule.verify else "acción aceptada")
+
+                duration = time.monotonic() - started
+                await self._record_result(rule, event, ok, detail, duration)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error en la remediación de {event.get('name')} ({rule.name}): {e}")
+
+    async def _run_action(self, action: str, compose_id: str):
+        if action in ("stop", "restart"):
+            await self.client.stop_compose(compose_id)
+        if action in ("start", "restart"):
+            await self.client.start_compose(compose_id)
+        if action == "redeploy":
+            await self.client.deploy_compose(compose_id)
+
+    async def _verify(self, rule: RemediationRule, compose_id: str) -> Optional[str]:
+        """Espera a que el compose llegue al estado esperado (None = verificado)"""
+        if not rule.verify:
+            return None
+
+        deadline = time.monotonic() + rule.verify
+        status = None
+        while True:
+            status = await self.get_status(compose_id)
+            if fnmatchcase(str(status), rule.expect):
+                return None
+            if time.monotonic() + self.verify_interval > deadline:
+                return f"sigue en {status} tras {rule.verify:g}s"
+            await asyncio.sleep(self.verify_interval)
+
+    async def _fetch_status(self, compose_id: str) -> Optional[str]:
+        compose = await self.client.get_compose(compose_id)
+        return compose.get("composeStatus")
+
+    async def _record_result(self, rule: RemediationRule, event: Dict, ok: bool, detail: str, duration: float):
+        """Actualiza el circuit breaker y audita el resultado"""
+        key = (rule.name, event["compose_id"])
+        breaker = self._breakers.setdefault(key, _Breaker())
+
+        if ok:
+            self.counters["succeeded"] += 1
+            breaker.failures = 0
+            breaker.opened_at = None
+            await self._audit(rule, event, "success", detail, duration)
+            return
+
+        self.counters["failed"] += 1
+        breaker.failures += 1
+        await self._audit(rule, event, "failed", detail, duration)
+
+        # Abierto o semiabierto (el intento de prueba falló): volver a abrir
+        if breaker.failures >= self.breaker_failures:
+            breaker.opened_at = time.monotonic()
+            logger.warning(
+                f"⛔ Circuito abierto: {rule.name} en {event.get('name')} "
+                f"tras {breaker.failures} fallos seguidos"
+            )
+            await self._audit(
+                rule, event, "breaker_open",
+                f"{breaker.failures} fallos seguidos, pausa de {self.breaker_reset:.0f}s"
+            )
+
+    async def _skip(self, rule: RemediationRule, event: Dict, reason: str):
+        self.counters["skipped"] += 1
+        await self._audit(rule, event, "skipped", reason)
+
+    # ---- Auditoría ----
+
+    async def _audit(
+        self,
+        rule: RemediationRule,
+        event: Dict,
+        outcome: str,
+        detail: str,
+        duration: Optional[float] = None
+    ):
+        record = {
+            "ts": datetime.now().isoformat(timespec="seconds"),
+            "rule": rule.name,
+            "action": rule.action,
+            "outcome": outcome,
+            "dry_run": self.dry_run,
+            "compose_id": event.get("compose_id"),
+            "name": event.get("name"),
+            "project_name": event.get("project_name"),
+            "trigger": event.get("event"),
+            "status": event.get("status"),
+            "anomaly": event.get("anomaly"),
+            "detail": detail,
+            "duration_s": round(duration, 1) if duration is not None else None
+        }
+        self.recent.append(record)
+        logger.info(f"🩺 {format_record(record)}")
+
+        try:
+            await asyncio.to_thread(self._append, record)
+        except Exception as e:
+            logger.warning(f"No se pudo escribir la auditoría de remediación: {e}")
+
+        if self.notify is not None and outcome != "skipped":
+            try:
+                await self.notify(format_record(record))
+            except Exception as e:
+                logger.warning(f"No se pudo notificar la remediación: {e}")
+
+    def _append(self, record: Dict):
+        directory = os.path.dirname(self.audit_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.audit_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    # ---- Ciclo de vida ----
+
+    async def aclose(self):
+        """Cancela las remediaciones pendientes"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "rules": len(self.rules),
+            "dry_run": self.dry_run,
+            "in_progress": len(self._tasks),
+            "open_breakers": sum(
+                1 for b in self._breakers.values()
+                if b.opened_at is not None and now - b.opened_at < self.breaker_reset
+            ),
+            **self.counters
+        }
+
+
+OUTCOME_ICONS = {
+    "success": "✅",
+    "failed": "❌",
+    "dry_run": "🧪",
+    "skipped": "⏭️",
+    "recovered": "💚",
+    "breaker_open": "⛔",
+}
+
+
+def format_record(record: Dict) -> str:
+    """Texto legible de una entrada de auditoría"""
+    icon = OUTCOME_ICONS.get(record["outcome"], "🩺")
+    text = (
+        f"{icon} Remediación {record['action']} de {record['name']} "
+        f"({record['project_name']}) por la regla {record['rule']}: "
+        f"{record['outcome']} - {record['detail']}"
+    )
+    if record.get("duration_s") is not None:
+        text += f" ({record['duration_s']}s)"
+    return text
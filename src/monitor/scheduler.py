@@ -0,0 +1,187 @@
+"""
+Planificador adaptativo de chequeos por compose
+
+Cada compose tiene su propio intervalo de chequeo y su próxima fecha de
+chequeo en un heap:
+
+- Composes en transición (deploy en curso) o con error reciente son
+  "calientes" y se chequean al intervalo mínimo.
+- Composes que cambiaron hace poco se chequean al intervalo base.
+- Composes estables durante más de ``stable_after`` segundos retroceden
+  exponencialmente hasta ``max_interval``.
+
+Las fechas se calculan a partir de la fecha prevista anterior (no de la
+hora en que terminó el trabajo), de modo que la cadencia no deriva.
+"""
+import heapq
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Estados de Dokploy que indican un deploy en curso
+TRANSITIONAL_STATUSES = {"running"}
+
+# Estados que indican un fallo
+ERROR_STATUSES = {"error"}
+
+
+class AdaptiveScheduler:
+    """Heap de próximos chequeos con intervalo adaptativo por compose"""
+
+    def __init__(
+        self,
+        base_interval: float = 60.0,
+        min_interval: float = 10.0,
+        max_interval: float = 600.0,
+        backoff_factor: float = 2.0,
+        stable_after: float = 3600.0,
+        error_hold: float = 900.0
+    ):
+        """
+        Args:
+            base_interval: Intervalo normal en segundos
+            min_interval: Intervalo para composes en transición o con error reciente
+            max_interval: Intervalo máximo para composes estables
+            backoff_factor: Multiplicador del intervalo en cada chequeo estable
+            stable_after: Segundos sin cambios a partir de los que se retrocede
+            error_hold: Segundos que un compose en error se chequea al mínimo
+        """
+        self.base_interval = base_interval
+        self.min_interval = min(min_interval, base_interval)
+        self.max_interval = max(max_interval, base_interval)
+        self.backoff_factor = backoff_factor
+        self.stable_after = stable_after
+        self.error_hold = error_hold
+
+        self._heap: List[Tuple[float, str]] = []
+        self._due: Dict[str, float] = {}
+        # Fecha prevista de los composes extraídos por pop_due y aún no
+        # reprogramados, para que update parta de ella y no de la hora actual
+        self._popped: Dict[str, float] = {}
+        self._intervals: Dict[str, float] = {}
+        self._statuses: Dict[str, str] = {}
+        self._last_change: Dict[str, float] = {}
+        self._error_since: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, compose_id: str) -> bool:
+        return compose_id in self._due
+
+    def update(
+        self,
+        compose_id: str,
+        status: str,
+        changed: bool,
+        now: Optional[float] = None
+    ) -> float:
+        """
+        Registra el resultado de un chequeo y programa el siguiente
+
+        Args:
+            compose_id: ID del compose chequeado
+            status: Estado observado
+            changed: Si el estado cambió respecto al chequeo anterior
+            now: Instante del chequeo (time.monotonic)
+
+        Returns:
+            Instante del próximo chequeo
+        """
+        now = time.monotonic() if now is None else now
+
+        if changed or compose_id not in self._last_change:
+            self._last_change[compose_id] = now
+
+        if status in ERROR_STATUSES:
+            self._error_since.setdefault(compose_id, now)
+        else:
+            self._error_since.pop(compose_id, None)
+
+        self._statuses[compose_id] = status
+        interval = self._next_interval(compose_id, status, now)
+        self._intervals[compose_id] = interval
+
+        # Cadencia por deadline: partir de la fecha prevista (la del heap o la
+        # que se extrajo con pop_due) y saltar los turnos que ya pasaron
+        previous_due = self._due.get(compose_id)
+        if previous_due is None:
+            previous_due = self._popped.pop(compose_id, now)
+        due = min(previous_due, now) + interval
+        if due <= now:
+            due += (int((now - due) // interval) + 1) * interval
+
+        self._due[compose_id] = due
+        heapq.heappush(self._heap, (due, compose_id))
+        return due
+
+    def _next_interval(self, compose_id: str, status: str, now: float) -> float:
+        """Calcula el intervalo del próximo chequeo"""
+        if self._is_hot(compose_id, status, now):
+            return self.min_interval
+
+        stable_for = now - self._last_change[compose_id]
+        if stable_for < self.stable_after:
+            return self.base_interval
+
+        previous = self._intervals.get(compose_id, self.base_interval)
+        return min(self.max_interval, max(self.base_interval, previous * self.backoff_factor))
+
+    def _is_hot(self, compose_id: str, status: str, now: float) -> bool:
+        if status in TRANSITIONAL_STATUSES:
+            return True
+        error_since = self._error_since.get(compose_id)
+        return error_since is not None and now - error_since < self.error_hold
+
+    def is_hot(self, compose_id: str, now: Optional[float] = None) -> bool:
+        """True si el compose está en transición o con un error reciente"""
+        now = time.monotonic() if now is None else now
+        status = self._statuses.get(compose_id)
+        return status is not None and self._is_hot(compose_id, status, now)
+
+    def pop_due(self, now: Optional[float] = None) -> List[str]:
+        """Extrae los composes cuyo chequeo ya venció"""
+        now = time.monotonic() if now is None else now
+        due = []
+
+        while self._heap and self._heap[0][0] <= now:
+            when, compose_id = heapq.heappop(self._heap)
+            # Entradas obsoletas (reprogramadas o eliminadas) se descartan
+            if self._due.get(compose_id) != when:
+                continue
+            del self._due[compose_id]
+            self._popped[compose_id] = when
+            due.append(compose_id)
+
+        return due
+
+    def next_due(self) -> Optional[float]:
+        """Instante del próximo chequeo programado (None si no hay ninguno)"""
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def interval_of(self, compose_id: str) -> Optional[float]:
+        """Intervalo actual de un compose"""
+        return self._intervals.get(compose_id)
+
+    def remove(self, compose_id: str):
+        """Deja de planificar un compose"""
+        self._due.pop(compose_id, None)
+        self._popped.pop(compose_id, None)
+        self._intervals.pop(compose_id, None)
+        self._statuses.pop(compose_id, None)
+        self._last_change.pop(compose_id, None)
+        self._error_since.pop(compose_id, None)
+
+    def stats(self, now: Optional[float] = None) -> Dict:
+        """Resumen del estado del planificador"""
+        now = time.monotonic() if now is None else now
+        next_due = self.next_due()
+        hot = sum(1 for cid in self._statuses if self.is_hot(cid, now))
+        return {
+            "scheduled": len(self._due),
+            "hot": hot,
+            "next_check_in": round(max(0.0, next_due - now), 1) if next_due is not None else None,
+            "min_interval": self.min_interval,
+            "max_interval": self.max_interval
+        }
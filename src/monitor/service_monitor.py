@@ -5,12 +5,48 @@ Monitorea el estado de los composes y detecta anomalías
 """
 import asyncio
 import logging
-from typing import Dict, List, Optional, Set
+import os
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Iterable, List, Optional, Set, Tuple
 from datetime import datetime
 from ..integrations.dokploy_client import DokployClient
+from .scheduler import AdaptiveScheduler
+from .snapshot import ComposeSnapshot, SnapshotDiff
+from .dispatcher import CallbackSink, EventDispatcher, LogSink, WebhookSink
+from .history import HistoryStore
+from .metrics import MetricsCollector, format_bytes
+from .anomaly import AnomalyDetector
 
 logger = logging.getLogger(__name__)
 
+# Máximo de composes verificados en paralelo en un chequeo de health por lotes
+DEFAULT_HEALTH_CONCURRENCY = 8
+
+# Límites del intervalo adaptativo (segundos)
+DEFAULT_MIN_INTERVAL = 10
+DEFAULT_MAX_INTERVAL = 600
+DEFAULT_STABLE_AFTER = 3600
+
+# Antigüedad máxima del estado en memoria antes de consultar Dokploy en vivo
+DEFAULT_MAX_STATE_AGE = 300
+
+# Segundos tras un cambio, una acción o un deployment durante los que se
+# siguen consultando los deployments de un compose en cada chequeo
+DEFAULT_DEPLOY_WATCH = 1800
+
+# Métricas de contenedor analizadas por el detector de anomalías y su
+# desviación mínima (cambios menores nunca son anomalías)
+ANOMALY_METRICS = ("cpu_pct", "mem_bytes")
+ANOMALY_MIN_STD = {
+    "cpu_pct": 2.0,  # puntos de CPU
+    "mem_bytes": 16 * 1024 * 1024,
+    "status_changes_1h": 1.0,
+    "sweep_seconds": 0.1,
+}
+# Pseudo-compose para las series que no pertenecen a un compose
+DOKPLOY_API = {"composeId": None, "name": "Dokploy API", "project_name": "-"}
+
 
 class ServiceMonitor:
     """Monitor de servicios Dokploy con detección de cambios"""
@@ -19,72 +55,475 @@ class ServiceMonitor:
         self,
         dokploy_client: DokployClient,
         check_interval: int = 60,
-        on_status_change=None
+        on_status_change=None,
+        on_event=None,
+        health_concurrency: Optional[int] = None,
+        min_interval: Optional[float] = None,
+        max_interval: Optional[float] = None,
+        stable_after: Optional[float] = None,
+        dispatcher: Optional[EventDispatcher] = None,
+        max_state_age: Optional[float] = None,
+        history: Optional[HistoryStore] = None,
+        metrics: Optional[MetricsCollector] = None,
+        anomalies: Optional[AnomalyDetector] = None,
+        deploy_watch: Optional[float] = None
     ):
         """
         Args:
             dokploy_client: Cliente de Dokploy
             check_interval: Intervalo de chequeo en segundos (default: 60)
             on_status_change: Callback async cuando cambia el estado de un compose
+            on_event: Callback async para todos los eventos de cambio
+                (status_change, added, removed, deployment)
+            health_concurrency: Máximo de composes verificados en paralelo
+                por check_many_health (default: MONITOR_HEALTH_CONCURRENCY o 8)
+            min_interval: Intervalo para composes en deploy o con error reciente
+            max_interval: Intervalo máximo para composes estables
+            stable_after: Segundos sin cambios tras los que un compose retrocede
+            dispatcher: Dispatcher de eventos (por defecto: log + webhook si
+                MONITOR_WEBHOOK_URL está configurada)
+            max_state_age: Segundos que el estado en memoria se considera
+                válido para responder consultas (MONITOR_MAX_STATE_AGE)
+            history: Almacén persistente de transiciones y tiempos de sweep
+            metrics: Recolector de métricas de contenedores; si está, el health
+                de un compose también considera CPU y memoria
+            anomalies: Detector de anomalías; si está, tras cada sweep se
+                analizan CPU y memoria de los contenedores, la frecuencia de
+                cambios de estado de cada compose y la duración del sweep, y
+                se publican eventos ``anomaly`` en el dispatcher
+            deploy_watch: Segundos tras un cambio de estado, una acción del
+                cliente o un deployment durante los que los deployments del
+                compose se consultan en cada chequeo, aunque el estado no
+                cambie (MONITOR_DEPLOY_WATCH)
+
+        El loop de monitoreo planifica cada compose por separado: los composes
+        "calientes" se consultan individualmente al intervalo mínimo y el resto
+        se refresca con un único /project.all cuando vence el primero de ellos.
         """
         self.client = dokploy_client
         self.check_interval = check_interval
         self.on_status_change = on_status_change
+        self.on_event = on_event
+
+        # Los eventos se entregan en background para no frenar los sweeps
+        self.dispatcher = dispatcher or self._default_dispatcher()
+        if on_status_change:
+            self.dispatcher.add_sink(CallbackSink(
+                on_status_change, name="on_status_change", events={"status_change"}
+            ))
+        if on_event:
+            self.dispatcher.add_sink(CallbackSink(on_event, name="on_event"))
+
+        self.history = history
+        self.metrics = metrics
+        self.anomalies = anomalies
+        if history is not None:
+            self.dispatcher.add_sink(history)
+        self.health_concurrency = health_concurrency or int(
+            os.getenv("MONITOR_HEALTH_CONCURRENCY", DEFAULT_HEALTH_CONCURRENCY)
+        )
+
+        # Estado anterior de los composes (compose_id -> composeStatus)
+        self.snapshot = ComposeSnapshot()
+        self.previous_states: Dict[str, str] = self.snapshot.statuses
+
+        # Instante (time.time) del último cambio observado por compose
+        self._changed_at: Dict[str, float] = {}
+        # Instantes de los cambios de estado recientes por compose (anomalías)
+        self._transition_times: Dict[str, Deque[float]] = {}
+
+        # Último deployment visto por compose: (deploymentId, status, createdAt
+        # en epoch). Los composes aún no consultados parten del arranque del
+        # monitor, así que su primer deployment nuevo también se informa
+        self._deploy_watermarks: Dict[str, Tuple[Optional[str], Optional[str], float]] = {}
+        self.started_at = time.time()
+        # Instante (time.time) del último deployment nuevo o en curso por compose
+        self._deployed_at: Dict[str, float] = {}
+        self.deploy_watch = deploy_watch or float(
+            os.getenv("MONITOR_DEPLOY_WATCH", DEFAULT_DEPLOY_WATCH)
+        )
 
-        # Estado anterior de los composes
-        self.previous_states: Dict[str, str] = {}
+        # Planificación adaptativa de chequeos
+        self.scheduler = AdaptiveScheduler(
+            base_interval=check_interval,
+            min_interval=min_interval or float(
+                os.getenv("MONITOR_MIN_INTERVAL", DEFAULT_MIN_INTERVAL)
+            ),
+            max_interval=max_interval or float(
+                os.getenv("MONITOR_MAX_INTERVAL", DEFAULT_MAX_INTERVAL)
+            ),
+            stable_after=stable_after or float(
+                os.getenv("MONITOR_STABLE_AFTER", DEFAULT_STABLE_AFTER)
+            )
+        )
+        # Estado en memoria para consultas (ver get_composes)
+        self.max_state_age = max_state_age or float(
+            os.getenv("MONITOR_MAX_STATE_AGE", DEFAULT_MAX_STATE_AGE)
+        )
+        self.last_sweep_at: Optional[float] = None
+        self._services_cache: Dict[str, Tuple[float, List[Dict]]] = {}
+        self.sweep_count = 0
+        self.probe_count = 0
 
         # Control de monitoreo
         self.is_running = False
         self._monitor_task: Optional[asyncio.Task] = None
 
-    async def check_all_composes(self) -> List[Dict]:
+    async def check_all_composes(self, force_refresh: bool = False) -> List[Dict]:
         """
         Verifica el estado de todos los composes
+
+        Args:
+            force_refresh: Ignora la caché de topología del cliente
+
         Returns:
             Lista de composes con su estado actual
         """
         try:
-            composes = await self.client.get_all_composes()
-
-            results = []
-            for compose in composes:
-                compose_id = compose.get("composeId")
-                name = compose.get("name", "Unknown")
-                current_status = compose.get("composeStatus", "unknown")
-
-                # Detectar cambio de estado
-                previous_status = self.previous_states.get(compose_id)
-                status_changed = previous_status and previous_status != current_status
-
-                result = {
-                    "compose_id": compose_id,
-                    "name": name,
-                    "status": current_status,
-                    "previous_status": previous_status,
-                    "status_changed": status_changed,
-                    "project_name": compose.get("project_name", "Unknown"),
-                    "checked_at": datetime.now().isoformat()
-                }
-
-                # Notificar cambio de estado
-                if status_changed and self.on_status_change:
-                    try:
-                        await self.on_status_change(result)
-                    except Exception as e:
-                        logger.error(f"Error en callback on_status_change: {e}")
+            events = await self._sweep(force_refresh=force_refresh)
+        except Exception as e:
+            logger.error(f"Error al verificar composes: {e}")
+            return []
 
-                # Actualizar estado previo
-                self.previous_states[compose_id] = current_status
+        changes = {
+            e["compose_id"]: e["previous_status"]
+            for e in events if e["event"] == "status_change"
+        }
+        checked_at = datetime.now().isoformat()
 
-                results.append(result)
+        results = []
+        for compose_id, status in self.snapshot.statuses.items():
+            compose = self.snapshot.get(compose_id)
+            results.append({
+                "compose_id": compose_id,
+                "name": compose.get("name", "Unknown"),
+                "status": status,
+                "previous_status": changes.get(compose_id, status),
+                "status_changed": compose_id in changes,
+                "project_name": compose.get("project_name", "Unknown"),
+                "checked_at": checked_at
+            })
 
-            return results
+        return results
 
-        except Exception as e:
-            logger.error(f"Error al verificar composes: {e}")
+    async def _sweep(self, force_refresh: bool = False) -> List[Dict]:
+        """
+        Refresca el árbol completo y devuelve solo los eventos de cambio
+
+        Propaga los errores del cliente (a diferencia de check_all_composes).
+        """
+        started = time.monotonic()
+        composes = await self.client.get_all_composes(force_refresh=force_refresh)
+        self.sweep_count += 1
+        self.last_sweep_at = time.monotonic()
+
+        # El primer sweep solo establece la línea base: no hay "added"
+        baseline = len(self.snapshot) == 0
+        diff = self.snapshot.apply(composes)
+        if baseline and self.history is not None:
+            self.history.record_baseline(composes)
+
+        changed_ids = {c.compose_id for c in diff.changed}
+        for compose in composes:
+            compose_id = compose.get("composeId")
+            self.scheduler.update(
+                compose_id,
+                self.snapshot.statuses[compose_id],
+                compose_id in changed_ids
+            )
+
+        events = await self._emit_diff(
+            diff, baseline=baseline, observed=[c.get("composeId") for c in composes]
+        )
+
+        duration = time.monotonic() - started
+        if self.history is not None:
+            self.history.record_sweep(duration, len(composes), len(events))
+        self._detect_anomalies(composes, duration)
+
+        return events
+
+    async def _probe_composes(self, compose_ids: List[str]) -> List[Dict]:
+        """
+        Consulta individualmente (/compose.one) los composes indicados
+
+        Returns:
+            Eventos de cambio detectados
+        """
+        semaphore = asyncio.Semaphore(self.health_concurrency)
+
+        async def probe(compose_id: str) -> Optional[Dict]:
+            async with semaphore:
+                try:
+                    return await self.client.get_compose(compose_id)
+                except Exception as e:
+                    logger.warning(f"Error al consultar compose {compose_id}: {e}")
+                    # Se deja en manos del próximo sweep completo
+                    self.scheduler.update(compose_id, "unknown", False)
+                    return None
+
+        fetched = await asyncio.gather(*(probe(cid) for cid in compose_ids))
+
+        observed = []
+        for compose_id, compose in zip(compose_ids, fetched):
+            if compose is None or compose_id not in self.snapshot:
+                continue
+            self.probe_count += 1
+            # /compose.one no trae el proyecto: completar con el último sweep
+            merged = {**self.snapshot.get(compose_id), **compose}
+            merged["composeId"] = compose_id
+            observed.append(merged)
+
+        diff = self.snapshot.apply(observed, complete=False)
+        changed_ids = {c.compose_id for c in diff.changed}
+        for compose in observed:
+            compose_id = compose["composeId"]
+            self.scheduler.update(
+                compose_id,
+                self.snapshot.statuses[compose_id],
+                compose_id in changed_ids
+            )
+
+        return await self._emit_diff(diff, observed=[c["composeId"] for c in observed])
+
+    async def _emit_diff(
+        self,
+        diff: SnapshotDiff,
+        baseline: bool = False,
+        observed: Iterable[str] = ()
+    ) -> List[Dict]:
+        """
+        Convierte un diff en eventos, consulta deployments y notifica
+
+        Args:
+            observed: Composes consultados en este chequeo; los que tuvieron
+                actividad reciente revisan sus deployments aunque su estado
+                no haya cambiado (un deploy rápido vuelve a "done" entre dos
+                chequeos)
+        """
+        watched = [] if baseline else self._deployment_watch(observed)
+        if diff.empty and not watched:
+            return []
+
+        checked_at = datetime.now().isoformat()
+        events = []
+
+        # Los servicios de un compose que cambió pueden ser otros
+        for change in diff.changed:
+            self._services_cache.pop(change.compose_id, None)
+
+        for compose in diff.removed:
+            compose_id = compose.get("composeId")
+            # Olvidar todo lo asociado al compose eliminado
+            self.scheduler.remove(compose_id)
+            self._deploy_watermarks.pop(compose_id, None)
+            self._deployed_at.pop(compose_id, None)
+            self._services_cache.pop(compose_id, None)
+            self._changed_at.pop(compose_id, None)
+            self._transition_times.pop(compose_id, None)
+            events.append(self._make_event("removed", compose, checked_at, {
+                "status": None,
+                "previous_status": compose.get("composeStatus", "unknown")
+            }))
+
+        if not baseline:
+            for compose_id in diff.added:
+                compose = self.snapshot.get(compose_id)
+                events.append(self._make_event("added", compose, checked_at, {
+                    "status": self.snapshot.statuses[compose_id],
+                    "previous_status": None
+                }))
+
+        for change in diff.changed:
+            events.append(self._make_event("status_change", self.snapshot.get(change.compose_id), checked_at, {
+                "status": change.status,
+                "previous_status": change.previous_status,
+                "status_changed": True
+            }))
+
+        # Deployments de los composes que se movieron o tuvieron actividad reciente
+        touched = [c.compose_id for c in diff.changed]
+        if not baseline:
+            touched += diff.added
+        touched += [cid for cid in watched if cid not in touched]
+
+        now = time.time()
+        for compose_id in [c.compose_id for c in diff.changed] + ([] if baseline else diff.added):
+            self._changed_at[compose_id] = now
+        for change in diff.changed:
+            self._transition_times.setdefault(change.compose_id, deque(maxlen=64)).append(now)
+        events.extend(await self._check_deployments(touched, checked_at))
+
+        for event in events:
+            self._notify(event)
+
+        return events
+
+    def _deployment_watch(self, compose_ids: Iterable[str]) -> List[str]:
+        """Composes con actividad reciente cuyos deployments hay que revisar"""
+        now = time.time()
+        client_actions = getattr(self.client, "last_action", {})
+        watched = []
+        for compose_id in compose_ids:
+            recent = max(
+                self._changed_at.get(compose_id, 0.0),
+                self._deployed_at.get(compose_id, 0.0),
+                client_actions.get(compose_id, 0.0)
+            )
+            if self.scheduler.is_hot(compose_id) or now - recent <= self.deploy_watch:
+                watched.append(compose_id)
+        return watched
+
+    @staticmethod
+    def _created_ts(deployment: Dict) -> float:
+        """createdAt de un deployment (ISO 8601) en epoch; 0 si no se entiende"""
+        created = deployment.get("createdAt")
+        if not created:
+            return 0.0
+        try:
+            return datetime.fromisoformat(str(created).replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return 0.0
+
+    async def _check_deployments(self, compose_ids: List[str], checked_at: str) -> List[Dict]:
+        """
+        Compara el historial de deployments con la última marca vista
+
+        Emite un evento por cada deployment posterior a la marca y cuando el
+        último deployment conocido cambia de estado. Un compose que se
+        consulta por primera vez parte de la hora de arranque del monitor.
+        """
+        if not compose_ids:
             return []
 
+        semaphore = asyncio.Semaphore(self.health_concurrency)
+
+        async def fetch(compose_id: str) -> List[Dict]:
+            async with semaphore:
+                try:
+                    return await self.client.get_compose_deployments(compose_id) or []
+                except Exception as e:
+                    logger.warning(f"Error al obtener deployments de {compose_id}: {e}")
+                    return []
+
+        histories = await asyncio.gather(*(fetch(cid) for cid in compose_ids))
+
+        events = []
+        for compose_id, deployments in zip(compose_ids, histories):
+            if not deployments:
+                continue
+
+            deployments = sorted(deployments, key=self._created_ts)
+            latest = deployments[-1]
+            last_id, last_status, last_created = self._deploy_watermarks.get(
+                compose_id, (None, None, self.started_at)
+            )
+            self._deploy_watermarks[compose_id] = (
+                latest.get("deploymentId"),
+                latest.get("status"),
+                max(self._created_ts(latest), last_created)
+            )
+
+            fresh = [
+                d for d in deployments
+                if self._created_ts(d) > last_created
+                or (last_id is not None and d.get("deploymentId") == last_id
+                    and d.get("status") != last_status)
+            ]
+            if fresh or latest.get("status") == "running":
+                self._deployed_at[compose_id] = time.time()
+
+            compose = self.snapshot.get(compose_id) or {"composeId": compose_id}
+            for deployment in fresh:
+                events.append(self._make_event("deployment", compose, checked_at, {
+                    "status": self.snapshot.statuses.get(compose_id),
+                    "deployment_id": deployment.get("deploymentId"),
+                    "deployment_status": deployment.get("status"),
+                    "title": deployment.get("title"),
+                    "created_at": deployment.get("createdAt")
+                }))
+
+        return events
+
+    def _detect_anomalies(self, composes: List[Dict], sweep_seconds: float):
+        """Pasa las series del sweep por el detector y publica las anomalías"""
+        if self.anomalies is None:
+            return
+
+        now = time.time()
+        keys: List[str] = []
+        values: List[float] = []
+        min_std: List[float] = []
+        owners: Dict[str, Tuple[Dict, str, str]] = {}
+
+        def add(key: str, value: float, compose: Dict, metric: str, kind: str):
+            keys.append(key)
+            values.append(value)
+            min_std.append(ANOMALY_MIN_STD[kind])
+            owners[key] = (compose, metric, kind)
+
+        for compose in composes:
+            compose_id = compose.get("composeId")
+            times = self._transition_times.get(compose_id)
+            recent = sum(1 for t in times if now - t <= 3600) if times else 0
+            add(f"{compose_id}:status_changes_1h", recent, compose, "cambios de estado/h", "status_changes_1h")
+        add("dokploy:sweep_seconds", sweep_seconds, DOKPLOY_API, "duración del sweep (s)", "sweep_seconds")
+
+        if self.metrics is not None:
+            by_app = {c.get("appName"): c for c in composes if c.get("appName")}
+            names, identities, matrix = self.metrics.latest(ANOMALY_METRICS)
+            for name, (project, service), row in zip(names, identities, matrix):
+                compose = by_app.get(project)
+                if compose is None:
+                    continue
+                for field, value in zip(ANOMALY_METRICS, row):
+                    add(f"{name}:{field}", float(value), compose, f"{service} {field}", field)
+
+        checked_at = datetime.now().isoformat()
+        for anomaly in self.anomalies.update(keys, values, now, min_std=min_std):
+            compose, metric, kind = owners[anomaly.key]
+            fmt = format_bytes if kind == "mem_bytes" else (lambda v: f"{v:.2f}".rstrip("0").rstrip("."))
+            self._notify(self._make_event("anomaly", compose, checked_at, {
+                "status": compose.get("composeStatus"),
+                "previous_status": None,
+                "metric": metric,
+                "series": anomaly.key,
+                "anomaly": anomaly.kind,
+                "state": anomaly.state,
+                "value": round(anomaly.value, 3),
+                "baseline": round(anomaly.baseline, 3),
+                "score": round(anomaly.score, 2),
+                "value_text": fmt(anomaly.value),
+                "baseline_text": fmt(anomaly.baseline)
+            }))
+
+    @staticmethod
+    def _make_event(kind: str, compose: Dict, checked_at: str, fields: Dict) -> Dict:
+        """Construye un evento de cambio con los campos comunes"""
+        event = {
+            "event": kind,
+            "compose_id": compose.get("composeId"),
+            "name": compose.get("name", "Unknown"),
+            "project_name": compose.get("project_name", "Unknown"),
+            "status_changed": False,
+            "checked_at": checked_at
+        }
+        event.update(fields)
+        return event
+
+    def _notify(self, event: Dict):
+        """Publica un evento en el dispatcher sin esperar a la entrega"""
+        self.dispatcher.publish(event)
+
+    @staticmethod
+    def _default_dispatcher() -> EventDispatcher:
+        """Dispatcher con log y, si está configurado, webhook local"""
+        sinks = [LogSink()]
+        webhook_url = os.getenv("MONITOR_WEBHOOK_URL")
+        if webhook_url:
+            sinks.append(WebhookSink(webhook_url))
+        return EventDispatcher(sinks)
+
     async def check_compose_health(self, compose_id: str) -> Dict:
         """
         Verifica el health de un compose específico
@@ -103,6 +542,15 @@ class ServiceMonitor:
             status = health.get("status", "unknown")
 
             health["healthy"] = status == "done" and services_count > 0
+
+            compose = self.snapshot.get(compose_id)
+            if self.metrics is not None and compose and compose.get("appName"):
+                project = compose["appName"]
+                health["resources"] = self.metrics.project_stats(project)
+                health["resource_warnings"] = self.metrics.warnings(project)
+                if health["resource_warnings"]:
+                    health["healthy"] = False
+
             health["checked_at"] = datetime.now().isoformat()
 
             return health
@@ -116,6 +564,36 @@ class ServiceMonitor:
                 "checked_at": datetime.now().isoformat()
             }
 
+    async def check_many_health(self, compose_ids: Iterable[str]) -> AsyncIterator[Dict]:
+        """
+        Verifica el health de varios composes en paralelo
+
+        Como máximo ``health_concurrency`` composes se consultan a la vez.
+        Los resultados se entregan a medida que terminan (no en el orden de
+        entrada) y un fallo en un compose no cancela el resto del lote:
+        ese compose se entrega con ``healthy=False`` y el campo ``error``.
+
+        Args:
+            compose_ids: IDs de los composes a verificar
+
+        Yields:
+            Información de health de cada compose
+        """
+        semaphore = asyncio.Semaphore(self.health_concurrency)
+
+        async def bounded_check(compose_id: str) -> Dict:
+            async with semaphore:
+                return await self.check_compose_health(compose_id)
+
+        tasks = [asyncio.create_task(bounded_check(cid)) for cid in compose_ids]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Si el consumidor abandona el iterador, no dejar tareas huérfanas
+            for task in tasks:
+                task.cancel()
+
     async def get_unhealthy_composes(self) -> List[Dict]:
         """
         Obtiene lista de composes con problemas
@@ -133,32 +611,64 @@ class ServiceMonitor:
         return unhealthy
 
     async def _monitor_loop(self):
-        """Loop principal de monitoreo"""
-        logger.info(f"🔍 Monitor iniciado (intervalo: {self.check_interval}s)")
+        """
+        Loop principal de monitoreo
+
+        Despierta en la fecha del próximo chequeo planificado. Si vence algún
+        compose estable se hace un sweep completo (una sola petición para todo
+        el árbol); si solo vencen composes calientes se consultan uno a uno.
+        """
+        logger.info(
+            f"🔍 Monitor iniciado (intervalo: {self.check_interval}s, "
+            f"adaptativo {self.scheduler.min_interval:g}-{self.scheduler.max_interval:g}s)"
+        )
+
+        # El primer sweep es inmediato y descubre todos los composes
+        next_sweep = time.monotonic()
 
         while self.is_running:
             try:
-                # Verificar todos los composes
-                results = await self.check_all_composes()
+                now = time.monotonic()
+                due = self.scheduler.pop_due(now)
+                cold = [cid for cid in due if not self.scheduler.is_hot(cid, now)]
 
-                # Log de resumen
-                total = len(results)
-                changed = sum(1 for r in results if r.get("status_changed"))
+                if cold or now >= next_sweep:
+                    try:
+                        events = await self._sweep(force_refresh=True)
+                    except Exception as e:
+                        # Reintentar pronto: los composes vencidos siguen sin chequear
+                        logger.error(f"Error al verificar composes: {e}")
+                        next_sweep = now + self.scheduler.min_interval
+                        await asyncio.sleep(self.scheduler.min_interval)
+                        continue
+
+                    # Sweep de descubrimiento al menos cada max_interval
+                    while next_sweep <= now:
+                        next_sweep += self.scheduler.max_interval
+
+                    # Log de resumen
+                    total = len(self.snapshot)
 
-                if changed > 0:
-                    logger.info(f"✅ Chequeo completado: {total} composes, {changed} cambios detectados")
-                else:
-                    logger.debug(f"✅ Chequeo completado: {total} composes, sin cambios")
+                    if events:
+                        logger.info(f"✅ Chequeo completado: {total} composes, {len(events)} cambios detectados")
+                    else:
+                        logger.debug(f"✅ Chequeo completado: {total} composes, sin cambios")
 
-                # Esperar antes del próximo chequeo
-                await asyncio.sleep(self.check_interval)
+                elif due:
+                    events = await self._probe_composes(due)
+                    logger.debug(f"🔎 {len(due)} composes en transición consultados, {len(events)} cambios")
+
+                # Dormir hasta el próximo vencimiento
+                next_due = self.scheduler.next_due()
+                wake_at = next_sweep if next_due is None else min(next_sweep, next_due)
+                await asyncio.sleep(max(0.0, wake_at - time.monotonic()))
 
             except asyncio.CancelledError:
                 logger.info("⏹️ Monitor detenido")
                 break
             except Exception as e:
                 logger.error(f"❌ Error en monitor loop: {e}")
-                await asyncio.sleep(self.check_interval)
+                await asyncio.sleep(self.scheduler.min_interval)
 
     async def start(self):
         """Inicia el monitoreo en background"""
@@ -171,20 +681,128 @@ class ServiceMonitor:
         logger.info("🚀 Monitor de servicios iniciado")
 
     async def stop(self):
-        """Detiene el monitoreo"""
-        if not self.is_running:
-            return
+        """Detiene el monitoreo y entrega los eventos pendientes"""
+        if self.is_running:
+            self.is_running = False
 
-        self.is_running = False
+            if self._monitor_task:
+                self._monitor_task.cancel()
+                try:
+                    await self._monitor_task
+                except asyncio.CancelledError:
+                    pass
+
+            logger.info("⏹️ Monitor de servicios detenido")
+
+        await self.dispatcher.stop()
+
+    async def aclose(self):
+        """Detiene el monitoreo y cierra la sesión HTTP del cliente Dokploy"""
+        await self.stop()
+        await self.client.aclose()
 
-        if self._monitor_task:
-            self._monitor_task.cancel()
+    # ========== ESTADO EN MEMORIA ==========
+
+    def state_age(self) -> Optional[float]:
+        """Segundos desde el último sweep completo (None si no hubo ninguno)"""
+        if self.last_sweep_at is None:
+            return None
+        return time.monotonic() - self.last_sweep_at
+
+    async def _ensure_fresh_state(self, max_age: Optional[float] = None):
+        """Hace un sweep en vivo si el estado en memoria es demasiado viejo"""
+        max_age = self.max_state_age if max_age is None else max_age
+        age = self.state_age()
+        if age is None or age > max_age:
             try:
-                await self._monitor_task
-            except asyncio.CancelledError:
-                pass
+                await self._sweep(force_refresh=True)
+            except Exception as e:
+                if not len(self.snapshot):
+                    raise
+                logger.warning(f"Usando estado en memoria de hace {age:.0f}s: {e}")
+
+    async def get_composes(self, max_age: Optional[float] = None) -> List[Dict]:
+        """
+        Composes desde el estado en memoria del monitor
+
+        Solo consulta Dokploy si el último sweep es más viejo que ``max_age``
+        (por defecto ``max_state_age``).
+
+        Returns:
+            Composes con el mismo formato que DokployClient.get_all_composes
+        """
+        await self._ensure_fresh_state(max_age)
+        return [self.snapshot.get(cid) for cid in self.snapshot.statuses]
+
+    def resolve_compose(self, reference: str) -> Optional[str]:
+        """
+        composeId a partir de un ID o nombre (name/appName, sin distinguir mayúsculas)
+
+        Solo mira el estado en memoria; si no hay coincidencia devuelve la
+        referencia tal cual por si es un ID que el monitor aún no vio.
+        """
+        if reference in self.snapshot:
+            return reference
+
+        wanted = reference.strip().lower()
+        for compose_id in self.snapshot.statuses:
+            compose = self.snapshot.get(compose_id)
+            if wanted in ((compose.get("name") or "").lower(), (compose.get("appName") or "").lower()):
+                return compose_id
+        return reference
+
+    def recent_changes(self, within: float = 3600) -> Dict[str, float]:
+        """
+        Composes que cambiaron (estado o alta) en los últimos ``within`` segundos
 
-        logger.info("⏹️ Monitor de servicios detenido")
+        Returns:
+            compose_id -> segundos desde el último cambio
+        """
+        now = time.time()
+        return {
+            compose_id: now - changed_at
+            for compose_id, changed_at in self._changed_at.items()
+            if now - changed_at <= within
+        }
+
+    async def get_compose_services(self, compose_id: str, max_age: Optional[float] = None) -> List[Dict]:
+        """Servicios de un compose, cacheados hasta que el compose cambie de estado"""
+        max_age = self.max_state_age if max_age is None else max_age
+        cached = self._services_cache.get(compose_id)
+        if cached is not None and time.monotonic() - cached[0] <= max_age:
+            return cached[1]
+
+        services = await self.client.get_compose_services(compose_id)
+        self._services_cache[compose_id] = (time.monotonic(), services)
+        return services
+
+    async def get_compose_status(self, compose_id: str, max_age: Optional[float] = None) -> Dict:
+        """
+        Estado de un compose con el formato de DokployClient.get_compose_health
+
+        Nombre y estado salen del estado en memoria; los servicios, de una
+        caché que se invalida cuando el compose cambia de estado.
+        """
+        await self._ensure_fresh_state(max_age)
+        compose = self.snapshot.get(compose_id)
+
+        if compose is None:
+            # Compose desconocido para el monitor: consulta directa
+            compose, services = await asyncio.gather(
+                self.client.get_compose(compose_id),
+                self.get_compose_services(compose_id, max_age)
+            )
+        else:
+            services = await self.get_compose_services(compose_id, max_age)
+
+        return {
+            "compose_id": compose_id,
+            "name": compose.get("name", "Unknown"),
+            "status": compose.get("composeStatus", "unknown"),
+            "project_name": compose.get("project_name", "Unknown"),
+            "services_count": len(services),
+            "services": services
+        }
 
     async def get_monitoring_stats(self) -> Dict:
         """
@@ -193,7 +811,8 @@ class ServiceMonitor:
         Returns:
             Estadísticas de monitoreo
         """
-        composes = await self.client.get_all_composes()
+        composes = await self.get_composes()
+        state_age = self.state_age()
 
         status_counts = {}
         for compose in composes:
@@ -205,7 +824,14 @@ class ServiceMonitor:
             "monitoring_active": self.is_running,
             "check_interval": self.check_interval,
             "status_distribution": status_counts,
-            "tracked_composes": len(self.previous_states)
+            "tracked_composes": len(self.previous_states),
+            "state_age": round(state_age, 1) if state_age is not None else None,
+            "scheduler": self.scheduler.stats(),
+            "upstream_sweeps": self.sweep_count,
+            "upstream_probes": self.probe_count,
+            "notifications": self.dispatcher.stats(),
+            "topology_cache": self.client.topology_stats(),
+            "anomalies": self.anomalies.stats() if self.anomalies is not None else None
         }
 
 
@@ -253,6 +879,7 @@ if __name__ == "__main__":
         else:
             print("  ✅ Todos los composes están saludables")
 
+        await monitor.aclose()
         print("\n✅ Tests completados!")
 
     asyncio.run(test())
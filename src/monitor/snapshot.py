@@ -0,0 +1,87 @@
+"""
+Snapshot compacto del estado de los composes y diff entre sweeps
+"""
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+
+class StatusChange(NamedTuple):
+    """Cambio de estado de un compose entre dos observaciones"""
+    compose_id: str
+    previous_status: str
+    status: str
+
+
+class SnapshotDiff(NamedTuple):
+    """Diferencias estructurales entre el snapshot anterior y el actual"""
+    added: List[str]
+    removed: List[Dict]
+    changed: List[StatusChange]
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+
+class ComposeSnapshot:
+    """
+    Último estado conocido de cada compose
+
+    Guarda solo el estado por compose y una referencia al último dict
+    recibido de Dokploy (sin copiarlo). Para los composes sin cambios el
+    coste de ``apply`` es una búsqueda y una comparación de strings.
+    """
+
+    def __init__(self):
+        self.statuses: Dict[str, str] = {}
+        self.composes: Dict[str, Dict] = {}
+
+    def __len__(self) -> int:
+        return len(self.statuses)
+
+    def __contains__(self, compose_id: str) -> bool:
+        return compose_id in self.statuses
+
+    def get(self, compose_id: str) -> Optional[Dict]:
+        """Último dict recibido para un compose"""
+        return self.composes.get(compose_id)
+
+    def apply(self, composes: Iterable[Dict], complete: bool = True) -> SnapshotDiff:
+        """
+        Incorpora una observación y devuelve lo que cambió
+
+        Args:
+            composes: Composes observados (con composeId y composeStatus)
+            complete: True si la observación cubre todo el árbol; en ese caso
+                los composes ausentes se consideran eliminados y se descartan
+
+        Returns:
+            Diff respecto al estado anterior
+        """
+        added: List[str] = []
+        changed: List[StatusChange] = []
+        seen = set()
+
+        statuses = self.statuses
+        for compose in composes:
+            compose_id = compose.get("composeId")
+            status = compose.get("composeStatus", "unknown")
+            seen.add(compose_id)
+            self.composes[compose_id] = compose
+
+            previous = statuses.get(compose_id)
+            if previous == status:
+                continue
+
+            statuses[compose_id] = status
+            if previous is None:
+                added.append(compose_id)
+            else:
+                changed.append(StatusChange(compose_id, previous, status))
+
+        removed: List[Dict] = []
+        if complete and len(statuses) > len(seen):
+            for compose_id in [cid for cid in statuses if cid not in seen]:
+                del statuses[compose_id]
+                removed.append(self.composes.pop(compose_id, {"composeId": compose_id}))
+
+        return SnapshotDiff(added, removed, changed)
@@ -69,6 +69,17 @@ async def main():
         print(f"    Servicios: {health.get('services_count')}")
         print(f"    Saludable: {health.get('healthy')}")
 
+    # Test 5: Health de todos los composes en paralelo
+    if results:
+        print(f"\n🏥 Test 5: Health por lotes ({len(results)} composes)")
+        print("-" * 60)
+        compose_ids = [r['compose_id'] for r in results]
+        async for health in monitor.check_many_health(compose_ids):
+            icon = "✅" if health.get('healthy') else "❌"
+            print(f"  {icon} {health.get('name', health['compose_id'])}: {health.get('status', health.get('error'))}")
+
+    await monitor.aclose()
+
     print("\n" + "=" * 60)
     print("✅ Tests completados!")
 
@@ -0,0 +1,129 @@
+"""
+Servidor de Dokploy falso (aiohttp) para los tests de integración
+
+Implementa los endpoints que usa DokployClient sobre un estado en memoria.
+``start`` y ``deploy`` pasan el compose a "running" y, tras
+``action_delay`` segundos (o los de ``delays``), a "done" ("error" si el
+compose está en ``broken``); ``stop`` lo deja en "idle".
+"""
+import asyncio
+import os
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from aiohttp import web
+
+from src.integrations.dokploy_client import DokployClient
+
+
+def compose(compose_id: str, name: str, project: str = "prod", status: str = "done") -> Dict:
+    return {"composeId": compose_id, "name": name, "appName": f"{name}-x",
+            "project": project, "composeStatus": status}
+
+
+class FakeDokploy:
+    def __init__(self, composes: Iterable[Dict], action_delay: float = 0.0):
+        self.composes: Dict[str, Dict] = {c["composeId"]: dict(c) for c in composes}
+        self.action_delay = action_delay
+        # compose_id -> segundos hasta el estado final (pisa action_delay)
+        self.delays: Dict[str, float] = {}
+        self.broken = set()
+        self.deployments: Dict[str, List[Dict]] = {}
+        self.calls: List[tuple] = []
+        self.requests = Counter()
+        # Composes con una acción en curso (de la orden al estado final observado)
+        self.active = set()
+        self.peak_active = 0
+        self.url: Optional[str] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._env: Dict[str, Optional[str]] = {}
+
+    # ---- Ciclo de vida ----
+
+    async def __aenter__(self) -> "FakeDokploy":
+        app = web.Application()
+        app.router.add_get("/api/project.all", self._project_all)
+        app.router.add_get("/api/compose.one", self._compose_one)
+        app.router.add_get("/api/deployment.allByCompose", self._deployments)
+        for action in ("start", "stop", "deploy"):
+            app.router.add_post(f"/api/compose.{action}", self._action(action))
+
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/api"
+
+        for key, value in {"DOKPLOY_API_URL": self.url, "DOKPLOY_API_KEY": "test"}.items():
+            self._env[key] = os.environ.get(key)
+            os.environ[key] = value
+        return self
+
+    async def __aexit__(self, *exc):
+        for key, value in self._env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        await self._runner.cleanup()
+
+    def client(self, **kwargs) -> DokployClient:
+        kwargs.setdefault("topology_ttl", 0.01)
+        kwargs.setdefault("topology_stale_ttl", 0.01)
+        return DokployClient(**kwargs)
+
+    # ---- Endpoints ----
+
+    async def _project_all(self, request):
+        self.requests["project.all"] += 1
+        projects: Dict[str, List[Dict]] = {}
+        for c in self.composes.values():
+            projects.setdefault(c["project"], []).append(self._public(c))
+        return web.json_response([
+            {"name": name, "projectId": name, "environments": [
+                {"name": "production", "environmentId": f"{name}-env", "compose": items}
+            ]}
+            for name, items in projects.items()
+        ])
+
+    async def _compose_one(self, request):
+        self.requests["compose.one"] += 1
+        return web.json_response(self._public(self.composes[request.query["composeId"]]))
+
+    async def _deployments(self, request):
+        self.requests["deployment.allByCompose"] += 1
+        return web.json_response(self.deployments.get(request.query["composeId"], []))
+
+    def _action(self, action: str):
+        async def handler(request):
+            compose_id = (await request.json())["composeId"]
+            self.requests[f"compose.{action}"] += 1
+            self.calls.append((action, compose_id))
+            self.active.add(compose_id)
+            self.peak_active = max(self.peak_active, len(self.active))
+
+            if action == "stop":
+                self._settle(compose_id, "idle")
+            else:
+                self.composes[compose_id]["composeStatus"] = "running"
+                final = "error" if compose_id in self.broken else "done"
+                if action == "deploy":
+                    self.deployments.setdefault(compose_id, []).append({
+                        "deploymentId": f"d{len(self.calls)}", "status": final,
+                        "title": f"deploy {compose_id}",
+                        "createdAt": datetime.now(timezone.utc).isoformat()
+                    })
+                delay = self.delays.get(compose_id, self.action_delay)
+                asyncio.get_running_loop().call_later(delay, self._settle, compose_id, final)
+            return web.json_response(True)
+        return handler
+
+    def _settle(self, compose_id: str, status: str):
+        self.composes[compose_id]["composeStatus"] = status
+        self.active.discard(compose_id)
+
+    @staticmethod
+    def _public(c: Dict) -> Dict:
+        return {k: v for k, v in c.items() if k != "project"}
@@ -0,0 +1,42 @@
+"""
+Tests de UptimeAnalytics sobre un HistoryStore en un directorio temporal
+"""
+import asyncio
+from datetime import datetime, timezone
+
+from src.monitor.analytics import HOUR, UptimeAnalytics
+from src.monitor.history import HistoryStore
+
+
+def event(ts: int, previous: str, status: str) -> dict:
+    return {
+        "compose_id": "c1", "name": "api", "project_name": "prod",
+        "event": "status_change", "previous_status": previous, "status": status,
+        "checked_at": datetime.fromtimestamp(ts, timezone.utc).isoformat()
+    }
+
+
+def test_late_transition_lands_in_its_hour(tmp_path):
+    async def scenario():
+        history = HistoryStore(path=str(tmp_path / "history.db"))
+        analytics = UptimeAnalytics(history, rollup_lag=600)
+        start = 1_700_000_000 - 1_700_000_000 % HOUR
+
+        history._pending_transitions.append((start, "c1", "baseline", None, "done"))
+        await history.flush()
+
+        # La hora acaba de cerrar, pero la caída de su último minuto sigue en cola
+        await history.execute(analytics._refresh, start + HOUR + 60)
+        history.record_event(event(start + HOUR - 60, "done", "error"))
+        history.record_event(event(start + HOUR + 120, "error", "done"))
+        await history.flush()
+
+        await history.execute(analytics._refresh, start + 2 * HOUR + 700)
+        stats = await history.execute(analytics._window_totals, start, start + 2 * HOUR, None)
+        await history.aclose()
+        return analytics._metrics(stats["c1"])
+
+    metrics = asyncio.run(scenario())
+    assert metrics["failures"] == 1
+    assert metrics["recoveries"] == 1
+    assert metrics["down_s"] == 180
@@ -0,0 +1,85 @@
+"""
+Tests de BulkExecutor: etapas por nombre y ejecución contra un Dokploy falso
+"""
+import asyncio
+import time
+
+from fake_dokploy import FakeDokploy, compose
+from src.monitor.bulk import BulkExecutor, select_composes
+from src.monitor.deploy_tracker import DeployTracker
+
+NAMES = ["postgres-main", "redis-cache", "api-users", "api-orders", "backend-worker"] + [
+    f"web-{i}" for i in range(7)
+]
+
+
+def stage_names(plan):
+    return [[item.name for item in stage] for stage in plan.stages]
+
+
+def test_stages_match_whole_words():
+    composes = [
+        {"composeId": name, "name": name}
+        for name in ("feedback-web", "minio-server", "users-db", "mongodb", "api-orders", "webserver")
+    ]
+    bulk = BulkExecutor(client=None, tracker=None)
+
+    assert stage_names(bulk.plan(composes, "deploy")) == [
+        ["minio-server", "mongodb", "users-db"],
+        ["api-orders"],
+        ["feedback-web", "webserver"],
+    ]
+
+
+def test_stop_runs_stages_in_reverse():
+    composes = [{"composeId": name, "name": name} for name in ("postgres-main", "api-users", "web-1")]
+    bulk = BulkExecutor(client=None, tracker=None)
+
+    assert stage_names(bulk.plan(composes, "stop")) == [["web-1"], ["api-users"], ["postgres-main"]]
+    assert stage_names(bulk.plan(composes, "start")) == [["postgres-main"], ["api-users"], ["web-1"]]
+
+
+def run_project_deploy(broken=()):
+    composes = [compose(name, name, project="saas") for name in NAMES]
+
+    async def scenario():
+        async with FakeDokploy(composes, action_delay=0.3) as dokploy:
+            dokploy.broken.update(broken)
+            client = dokploy.client()
+            tracker = DeployTracker(client, min_interval=0.05, max_interval=0.1, grace=0.2)
+            bulk = BulkExecutor(client, tracker, parallelism=4)
+
+            selected = select_composes(await client.get_all_composes(), project="saas")
+            plan = bulk.plan(selected, "deploy")
+            started = time.monotonic()
+            await bulk.execute(plan)
+            elapsed = time.monotonic() - started
+
+            await tracker.aclose()
+            await client.aclose()
+            return plan, elapsed, dokploy
+
+    return asyncio.run(scenario())
+
+
+def test_project_deploy_runs_stages_in_parallel():
+    plan, elapsed, dokploy = run_project_deploy()
+
+    assert plan.counts()["ok"] == 12
+    assert stage_names(plan)[:2] == [["postgres-main", "redis-cache"], ["api-orders", "api-users", "backend-worker"]]
+    # Las bases de datos terminan antes de que empiece cualquier API
+    deployed = [compose_id for _, compose_id in dokploy.calls]
+    assert set(deployed[:2]) == {"postgres-main", "redis-cache"}
+    assert dokploy.peak_active <= 4
+    # 4 tandas de ~0.3 s frente a 12 en serie
+    assert elapsed < 12 * 0.3
+
+
+def test_failed_stage_skips_the_rest():
+    plan, _, dokploy = run_project_deploy(broken={"redis-cache"})
+
+    counts = plan.counts()
+    assert counts["ok"] == 1
+    assert counts["failed"] == 1
+    assert counts["skipped"] == 10
+    assert {compose_id for _, compose_id in dokploy.calls} == {"postgres-main", "redis-cache"}
@@ -0,0 +1,114 @@
+"""
+Tests de DeployTracker contra un Dokploy falso
+"""
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from fake_dokploy import FakeDokploy, compose
+from src.monitor.deploy_tracker import DeployTracker
+
+
+def test_concurrent_waits_share_polling():
+    composes = [compose(f"c{i}", f"app{i}") for i in range(30)]
+
+    async def scenario():
+        async with FakeDokploy(composes) as dokploy:
+            dokploy.delays = {f"c{i}": 0.1 + (i % 6) * 0.1 for i in range(30)}
+            client = dokploy.client()
+            await client.get_all_composes()
+            tracker = DeployTracker(client, min_interval=0.05, max_interval=0.2, grace=0.1)
+
+            async def user(compose_id):
+                await client.deploy_compose(compose_id)
+                return await tracker.track(compose_id, "deploy")
+
+            # Tres usuarios esperando cada compose
+            results = await asyncio.gather(*(user(f"c{i % 30}") for i in range(90)))
+            await tracker.aclose()
+            await client.aclose()
+            return results, tracker.stats(), dokploy.requests
+
+    results, stats, requests = asyncio.run(scenario())
+    assert len(results) == 90
+    assert all(r.ok and r.status == "done" for r in results)
+    assert stats["completed"] == 30
+    assert stats["joined"] == 60
+    # Una consulta de estado por vuelta para todos, un historial por compose
+    assert requests["deployment.allByCompose"] == 30
+    assert stats["api_calls"] == stats["polls"] + 30
+    assert stats["polls"] < 30
+
+
+def test_stale_running_deployment_times_out():
+    async def scenario():
+        async with FakeDokploy([compose("c1", "api")]) as dokploy:
+            # El compose ya está en "done" pero su último deployment quedó colgado
+            dokploy.deployments["c1"] = [{
+                "deploymentId": "d1", "status": "running", "title": "deploy colgado",
+                "createdAt": datetime.now(timezone.utc).isoformat()
+            }]
+            client = dokploy.client()
+            tracker = DeployTracker(client, min_interval=0.05, max_interval=0.1, timeout=1, grace=0.1)
+            result = await asyncio.wait_for(tracker.track("c1", "deploy"), timeout=5)
+            stats = tracker.stats()
+            await tracker.aclose()
+            await client.aclose()
+            return result, stats
+
+    result, stats = asyncio.run(scenario())
+    assert not result.ok
+    assert result.status == "done"
+    assert result.detail == "sin terminar tras 1s"
+    assert stats["in_progress"] == 0
+
+
+
+class UnreachableDokploy:
+    """Cliente cuyas consultas fallan siempre"""
+
+    topology = SimpleNamespace(peek=lambda: None)
+
+    async def get_all_composes(self, force_refresh=False):
+        raise ConnectionError("Dokploy no responde")
+
+
+def test_timeout_applies_when_polling_keeps_failing():
+    async def scenario():
+        tracker = DeployTracker(UnreachableDokploy(), min_interval=0.05, max_interval=0.1, timeout=0.2)
+        result = await asyncio.wait_for(tracker.track("c1", "deploy"), timeout=2)
+        stats = tracker.stats()
+        await tracker.aclose()
+        return result, stats
+
+    result, stats = asyncio.run(scenario())
+    assert not result.ok
+    assert result.status == "None"
+    assert result.detail.startswith("sin terminar")
+    assert stats["in_progress"] == 0
+
+
+def test_unreadable_compose_does_not_stall_the_others():
+    async def scenario():
+        async with FakeDokploy([compose("c1", "api")], action_delay=0.1) as dokploy:
+            client = dokploy.client()
+            await client.get_all_composes()
+            tracker = DeployTracker(client, min_interval=0.05, max_interval=0.1, timeout=0.6, grace=0.1)
+
+            async def deploy():
+                await client.deploy_compose("c1")
+                return await tracker.track("c1", "deploy")
+
+            # "ghost" no está en la topología y compose.one falla para él
+            results = await asyncio.wait_for(
+                asyncio.gather(deploy(), tracker.track("ghost", "deploy")), timeout=3
+            )
+            await tracker.aclose()
+            await client.aclose()
+            return results
+
+    deployed, ghost = asyncio.run(scenario())
+    assert deployed.ok and deployed.status == "done"
+    assert deployed.duration < 0.6
+    assert not ghost.ok
+    assert ghost.detail.startswith("sin terminar")
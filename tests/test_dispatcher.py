@@ -0,0 +1,50 @@
+"""
+Tests de la cola por sink del dispatcher (política coalesce)
+"""
+from src.monitor.dispatcher import NotificationSink, _SinkQueue, format_event
+
+
+class Sink(NotificationSink):
+    name = "test"
+
+    async def send(self, event):
+        pass
+
+
+def status(previous, current, compose_id="c1"):
+    return {
+        "event": "status_change", "compose_id": compose_id, "name": "api",
+        "project_name": "prod", "previous_status": previous, "status": current
+    }
+
+
+def test_coalesce_only_when_queue_is_full():
+    queue = _SinkQueue(Sink(policy="coalesce", queue_size=10))
+    queue.put(status("done", "error"))
+    queue.put(status("error", "done"))
+
+    assert len(queue.entries) == 2
+    assert queue.coalesced == 0
+
+
+def test_merged_flap_keeps_intermediate_status():
+    queue = _SinkQueue(Sink(policy="coalesce", queue_size=1))
+    queue.put(status("done", "error"))
+    queue.put(status("error", "done"))
+
+    assert len(queue.entries) == 1
+    event = queue.entries[0][1]
+    assert (event["previous_status"], event["via"], event["status"]) == ("done", ["error"], "done")
+    assert event["transitions"] == 2
+    assert "done → error → done" in format_event(event)
+
+
+def test_distinct_deployments_are_not_merged():
+    queue = _SinkQueue(Sink(policy="coalesce", queue_size=2))
+    for deployment_id in ("d1", "d2"):
+        queue.put({"event": "deployment", "compose_id": "c1", "deployment_id": deployment_id})
+    queue.put(status("done", "running"))
+
+    deployments = [e[1]["deployment_id"] for e in queue.entries if e[1]["event"] == "deployment"]
+    assert deployments == ["d2"]  # d1 se descartó por antigüedad, no se fusionó con d2
+    assert queue.coalesced == 0
@@ -0,0 +1,70 @@
+"""
+Tests de GPTOSSClient con un modelo falso
+"""
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+from dotenv import dotenv_values
+
+from src.llm.conversation import ConversationMemory, is_follow_up
+from src.llm.gpt_oss_client import GPTOSSClient
+from src.llm.response_cache import ResponseCache
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        return SimpleNamespace(content=f"respuesta {self.calls}", usage_metadata=None)
+
+
+def client() -> GPTOSSClient:
+    gpt = GPTOSSClient(cache=ResponseCache(max_entries=10, path=""), memory=ConversationMemory(path=""))
+    gpt.llm = FakeLLM()
+    return gpt
+
+
+def test_follow_up_detection():
+    assert is_follow_up("¿y el otro?")
+    assert is_follow_up("reinícialo")
+    assert is_follow_up("explica eso")
+    assert not is_follow_up("¿qué es un volumen de docker?")
+    assert not is_follow_up("¿cómo configuro healthchecks en docker compose?")
+
+
+def test_standalone_questions_hit_the_cache_within_a_chat():
+    async def scenario():
+        gpt = client()
+        first = await gpt.ask("¿qué es un volumen de docker?", chat_id=1)
+        await gpt.ask("¿cómo configuro healthchecks en docker compose?", chat_id=1)
+        again = await gpt.ask("¿qué es un volumen de docker?", chat_id=1)
+        other_chat = await gpt.ask("¿qué es un volumen de docker?", chat_id=2)
+        return gpt, first, again, other_chat
+
+    gpt, first, again, other_chat = asyncio.run(scenario())
+    assert first == again == other_chat
+    assert gpt.llm.calls == 2
+    assert gpt.cache.hits == 2
+
+
+def test_follow_ups_skip_the_cache():
+    async def scenario():
+        gpt = client()
+        await gpt.ask("¿qué es un volumen de docker?", chat_id=1)
+        await gpt.ask("explica eso con un ejemplo", chat_id=1)
+        await gpt.ask("¿qué es un bind mount?", chat_id=2)
+        await gpt.ask("explica eso con un ejemplo", chat_id=2)
+        return gpt
+
+    gpt = asyncio.run(scenario())
+    assert gpt.llm.calls == 4
+    assert gpt.cache.hits == 0
+
+
+def test_env_example_keeps_conversations_in_memory():
+    values = dotenv_values(Path(__file__).resolve().parent.parent / ".env.example")
+    assert values["LLM_MEMORY_PATH"] == ""
+    assert ConversationMemory(path=values["LLM_MEMORY_PATH"]).path == ""
@@ -0,0 +1,23 @@
+"""
+Tests de HistoryStore sobre un directorio temporal
+"""
+import asyncio
+import sqlite3
+
+from src.monitor.history import HistoryStore
+
+
+def test_aclose_flushes_and_stops_the_sqlite_thread(tmp_path):
+    path = tmp_path / "history.db"
+
+    async def scenario():
+        history = HistoryStore(path=str(path))
+        history.record_event({"compose_id": "c1", "name": "api", "project_name": "prod",
+                              "event": "status_change", "previous_status": "done", "status": "error"})
+        await history.aclose()
+        return history
+
+    history = asyncio.run(scenario())
+    assert history._executor._shutdown
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT compose_id, status FROM transitions").fetchall() == [("c1", "error")]
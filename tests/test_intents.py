@@ -0,0 +1,49 @@
+"""
+Tests del router de intenciones
+"""
+import pytest
+
+from src.bot.intents import IntentRouter
+
+COMPOSES = [
+    {"composeId": "c1", "name": "granada", "project_name": "prod", "composeStatus": "done"},
+    {"composeId": "c2", "name": "postgres", "project_name": "prod", "composeStatus": "error"},
+]
+
+
+@pytest.mark.parametrize("text, intent, status", [
+    ("¿Cuántos composes tengo?", "count", None),
+    ("¿cuántos servicios hay?", "count", None),
+    ("how many of my composes are failing?", "count", "error"),
+    ("¿cuántos composes hay caídos?", "count", "error"),
+    ("¿cuántos proyectos tengo?", "count_projects", None),
+    ("¿Cuáles composes están fallando?", "list", "error"),
+    ("dame mis servicios", "list", None),
+    ("muéstrame los composes detenidos", "list", "idle"),
+    ("list my apps", "list", None),
+    ("estado de granada", "status", None),
+    ("¿cómo está granada?", "status", None),
+])
+def test_inventory_questions_are_answered(text, intent, status):
+    result = IntentRouter().classify(text, COMPOSES)
+    assert result is not None
+    assert (result.name, result.status) == (intent, status)
+
+
+@pytest.mark.parametrize("text", [
+    "Dame un ejemplo de docker compose con dos servicios",
+    "¿Qué servicios necesito para un stack de monitoreo?",
+    "muéstrame un docker-compose.yml para postgres",
+    "list the steps to deploy an app",
+    "¿cuántos servicios puede tener un compose como máximo?",
+    "¿cuántos proyectos puede tener Dokploy?",
+    "¿por qué falla granada?",
+    "¿Qué hago si mi compose está caído?",
+    "¿qué pasa si un compose está en error?",
+    "hay una forma de listar los composes con error desde la cli?",
+    "¿cuántos servicios up puede manejar un servidor de 4GB?",
+    "¿cuáles servicios fallan más en producción normalmente?",
+    "¿cómo reinicio los composes caídos?",
+])
+def test_general_questions_go_to_the_llm(text):
+    assert IntentRouter().classify(text, COMPOSES) is None
@@ -0,0 +1,138 @@
+"""
+Tests de KnowledgeBase (con HashingEmbedder, sin Ollama) y del registro de incidentes
+"""
+import asyncio
+import os
+
+from src.llm.knowledge_base import HashingEmbedder, KnowledgeBase, chunk_markdown
+from src.monitor.incidents import IncidentRecorder
+
+RUNBOOKS = {
+    "postgres.md": "# Postgres\n\n## Conexiones agotadas\n\n"
+                   "Si aparece too many connections, reiniciar pgbouncer y revisar max_connections.\n",
+    "redis.md": "# Redis\n\n## Memoria llena\n\n"
+                "Con OOM command not allowed, revisar maxmemory y la política de desalojo de redis.\n",
+    "nginx.md": "# Nginx\n\n## 502 Bad Gateway\n\n"
+                "El upstream no responde: comprobar que el contenedor de la aplicación está arriba.\n",
+}
+
+
+def knowledge(tmp_path) -> KnowledgeBase:
+    runbooks = tmp_path / "runbooks"
+    runbooks.mkdir(exist_ok=True)
+    for name, text in RUNBOOKS.items():
+        path = runbooks / name
+        if not path.exists():
+            path.write_text(text, encoding="utf-8")
+    return KnowledgeBase(
+        index_dir=str(tmp_path / "kb"),
+        sources=[str(runbooks)],
+        incidents_dir=str(tmp_path / "incidents"),
+        embedder=HashingEmbedder()
+    )
+
+
+def status_change(status: str, previous: str, checked_at: str) -> dict:
+    return {"event": "status_change", "compose_id": "c1", "name": "api", "project_name": "prod",
+            "status": status, "previous_status": previous, "checked_at": checked_at}
+
+
+def test_chunk_markdown_sections_code_and_long_paragraphs():
+    text = (
+        "Intro\n\n# Guía\n\n## Deploy\n\nPaso uno.\n\n```bash\n# no es un título\nmake\n```\n\n"
+        "## Rollback\n\n" + "\n\n".join(["x" * 60] * 4)
+    )
+    chunks = chunk_markdown(text, max_chars=130)
+
+    assert chunks[0] == {"title": "(inicio)", "text": "Intro"}
+    assert chunks[1]["title"] == "Guía > Deploy"
+    assert "# no es un título" in chunks[1]["text"]
+    rollback = [c for c in chunks if c["title"] == "Guía > Rollback"]
+    assert len(rollback) == 2
+    assert all(len(c["text"]) <= 130 for c in rollback)
+
+
+def test_refresh_skips_unchanged_files(tmp_path):
+    async def scenario():
+        kb = knowledge(tmp_path)
+        first = await kb.refresh()
+        second = await kb.refresh()
+
+        (tmp_path / "runbooks" / "redis.md").write_text(
+            RUNBOOKS["redis.md"] + "\n## Latencia\n\nRevisar SLOWLOG.\n", encoding="utf-8"
+        )
+        third = await kb.refresh()
+
+        # Un índice nuevo sobre la misma carpeta carga el de disco y no reindexa
+        reopened = await knowledge(tmp_path).refresh()
+        return first, second, third, reopened
+
+    first, second, third, reopened = asyncio.run(scenario())
+    assert first["changed"] == 3 and first["embedded"] == first["chunks"]
+    assert second == {"changed": 0, "removed": 0, "embedded": 0, "chunks": first["chunks"]}
+    assert third["changed"] == 1
+    # Solo el fragmento nuevo de redis.md necesita un embedding
+    assert third["embedded"] == 1
+    assert reopened["changed"] == 0 and reopened["embedded"] == 0
+
+
+def test_search_returns_top_k_most_similar(tmp_path):
+    async def scenario():
+        kb = knowledge(tmp_path)
+        await kb.refresh()
+        best = await kb.search("redis OOM command not allowed maxmemory", k=1, min_score=0)
+        top = await kb.search("redis OOM command not allowed maxmemory", k=2, min_score=0)
+        return best, top
+
+    best, top = asyncio.run(scenario())
+    assert len(best) == 1
+    assert best[0].source.endswith("redis.md")
+    assert len(top) == 2
+    assert top[0] == best[0]
+    assert top[0].score >= top[1].score
+
+
+def test_recorded_incident_is_searchable(tmp_path):
+    async def scenario():
+        kb = knowledge(tmp_path)
+        await kb.refresh()
+        path = await kb.record_incident("worker sin memoria", "El worker de colas murió por OOMKilled.")
+        results = await kb.search("worker de colas OOMKilled", k=1, min_score=0)
+        return path, results
+
+    path, results = asyncio.run(scenario())
+    assert os.path.dirname(path) == str(tmp_path / "incidents")
+    assert results[0].source == os.path.normpath(path)
+
+
+def test_incident_recorder_records_long_outages_only(tmp_path):
+    async def scenario():
+        kb = knowledge(tmp_path)
+
+        async def get_logs(compose_id):
+            return "12x FATAL: too many connections for role <*>"
+
+        recorder = IncidentRecorder(kb, get_logs=get_logs, min_outage=60)
+
+        # Caída corta: se ignora
+        await recorder.send(status_change("error", "done", "2026-01-01T10:00:00"))
+        await recorder.send(status_change("done", "error", "2026-01-01T10:00:30"))
+
+        # Caída larga: se registra con los patrones de error
+        await recorder.send(status_change("error", "done", "2026-01-01T11:00:00"))
+        await recorder.send(status_change("error", "error", "2026-01-01T11:01:00"))
+        await recorder.send(status_change("done", "error", "2026-01-01T11:05:00"))
+
+        results = await kb.search("api too many connections", k=1, min_score=0)
+        return recorder.stats(), results
+
+    stats, results = asyncio.run(scenario())
+    assert stats == {"open": 0, "recorded": 1, "ignored": 1}
+
+    (incident,) = os.listdir(tmp_path / "incidents")
+    text = (tmp_path / "incidents" / incident).read_text(encoding="utf-8")
+    assert text.startswith("# Incidente: api (prod) en error")
+    assert "done → error → done" in text
+    assert "2026-01-01T11:00:00 → 2026-01-01T11:05:00" in text
+    assert "too many connections" in text
+    assert "incidents" in results[0].source
@@ -0,0 +1,151 @@
+"""
+Tests end-to-end de RemediationEngine contra un Dokploy falso
+"""
+import asyncio
+import json
+
+from fake_dokploy import FakeDokploy, compose
+from src.monitor.remediation import RemediationEngine, RemediationRule
+
+RULE_SPEC = {
+    "name": "reiniciar-caidos",
+    "match": {"event": "status_change", "status": "error"},
+    "action": "restart",
+    "verify": 2,
+    "expect": "done",
+}
+RULE = RemediationRule(RULE_SPEC)
+
+
+def down(compose_id: str) -> dict:
+    return {"event": "status_change", "compose_id": compose_id, "name": compose_id,
+            "project_name": "prod", "status": "error"}
+
+
+def engine_for(dokploy: FakeDokploy, tmp_path, **kwargs) -> RemediationEngine:
+    kwargs.setdefault("dry_run", False)
+    kwargs.setdefault("cooldown", 0)
+    return RemediationEngine(
+        dokploy.client(), rules=[RULE], audit_path=str(tmp_path / "audit.jsonl"),
+        verify_interval=0.02, **kwargs
+    )
+
+
+async def settle(engine: RemediationEngine):
+    while engine._tasks:
+        await asyncio.gather(*engine._tasks.values(), return_exceptions=True)
+
+
+def audit(tmp_path) -> list:
+    with open(tmp_path / "audit.jsonl", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_cooldown_blocks_repeated_actions(tmp_path):
+    async def scenario():
+        async with FakeDokploy([compose("c1", "api", status="error")]) as dokploy:
+            engine = engine_for(dokploy, tmp_path, cooldown=0.3)
+            await engine.send(down("c1"))
+            await settle(engine)
+            await engine.send(down("c1"))
+            await settle(engine)
+            await asyncio.sleep(0.35)
+            await engine.send(down("c1"))
+            await settle(engine)
+            await engine.client.aclose()
+            return dokploy.calls, engine.stats()
+
+    calls, stats = asyncio.run(scenario())
+    assert calls == [("stop", "c1"), ("start", "c1")] * 2
+    assert stats["succeeded"] == 2
+    assert stats["skipped"] == 1
+    assert [r["outcome"] for r in audit(tmp_path)] == ["success", "skipped", "success"]
+
+
+def test_concurrency_cap(tmp_path):
+    async def scenario(max_concurrent):
+        composes = [compose(f"c{i}", f"app{i}", status="error") for i in range(4)]
+        async with FakeDokploy(composes, action_delay=0.1) as dokploy:
+            engine = engine_for(dokploy, tmp_path, max_concurrent=max_concurrent)
+            for i in range(4):
+                await engine.send(down(f"c{i}"))
+            await settle(engine)
+            await engine.client.aclose()
+            return dokploy.peak_active, engine.stats()
+
+    peak, stats = asyncio.run(scenario(1))
+    assert peak == 1
+    assert stats["succeeded"] == 4
+
+    peak, stats = asyncio.run(scenario(2))
+    assert peak == 2
+    assert stats["succeeded"] == 4
+
+
+def test_breaker_opens_half_opens_and_closes(tmp_path):
+    async def scenario():
+        async with FakeDokploy([compose("c1", "api", status="error")]) as dokploy:
+            dokploy.broken.add("c1")
+            engine = engine_for(dokploy, tmp_path, breaker_failures=2, breaker_reset=0.3)
+            engine.rules = [RemediationRule({**RULE_SPEC, "verify": 0.1})]
+
+            async def attempt():
+                await engine.send(down("c1"))
+                await settle(engine)
+
+            await attempt()  # fallo 1
+            await attempt()  # fallo 2: se abre
+            await attempt()  # abierto: se omite
+            opened = engine.stats()["open_breakers"]
+
+            await asyncio.sleep(0.35)
+            await attempt()  # semiabierto: el intento de prueba falla y vuelve a abrir
+            await attempt()  # abierto otra vez
+
+            await asyncio.sleep(0.35)
+            dokploy.broken.discard("c1")
+            await attempt()  # semiabierto: éxito, se cierra
+            await attempt()  # cerrado: se ejecuta
+            await engine.client.aclose()
+            return opened, engine.stats(), len(dokploy.calls)
+
+    opened, stats, calls = asyncio.run(scenario())
+    assert opened == 1
+    assert stats["open_breakers"] == 0
+    assert stats["failed"] == 3
+    assert stats["succeeded"] == 2
+    assert stats["skipped"] == 2
+    assert calls == 2 * 5
+    assert [r["outcome"] for r in audit(tmp_path)] == [
+        "failed", "failed", "breaker_open", "skipped",
+        "failed", "breaker_open", "skipped",
+        "success", "success",
+    ]
+
+
+def test_dry_run_never_calls_the_api(tmp_path):
+    async def scenario():
+        async with FakeDokploy([compose("c1", "api", status="error")]) as dokploy:
+            notes = []
+
+            async def notify(text):
+                notes.append(text)
+
+            engine = engine_for(dokploy, tmp_path, dry_run=True, notify=notify)
+            await engine.send(down("c1"))
+            await settle(engine)
+            await engine.client.aclose()
+            return dokploy.calls, engine.stats(), notes
+
+    calls, stats, notes = asyncio.run(scenario())
+    assert calls == []
+    assert stats["dry_runs"] == 1
+    assert stats["executed"] == 0
+    assert len(notes) == 1 and "🧪" in notes[0]
+
+    (record,) = audit(tmp_path)
+    assert record["outcome"] == "dry_run"
+    assert record["dry_run"] is True
+    assert record["compose_id"] == "c1"
+    assert record["rule"] == "reiniciar-caidos"
+    assert record["detail"] == "se ejecutaría restart"
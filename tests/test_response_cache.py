@@ -0,0 +1,62 @@
+"""
+Tests de ResponseCache con la firma de estado de ContextBuilder
+"""
+from pathlib import Path
+
+from dotenv import dotenv_values
+
+from src.llm.context_builder import ContextBuilder
+from src.llm.response_cache import ResponseCache
+
+
+def context(status: str, age: float) -> dict:
+    return {
+        "composes": [
+            {"composeId": "c1", "name": "api", "project_name": "prod", "composeStatus": status},
+            {"composeId": "c2", "name": "db", "project_name": "prod", "composeStatus": "done"},
+        ],
+        "recent_changes": {"c1": age},
+    }
+
+
+def test_entries_survive_other_questions_and_clock_ticks():
+    builder = ContextBuilder()
+    cache = ResponseCache(max_entries=10, path="")
+
+    # El texto del prompt cambia con la pregunta y con la edad del cambio...
+    assert builder.build("¿cómo está db?", context("done", 30)) != builder.build("¿y api?", context("done", 150))
+
+    # ...pero la firma de estado no
+    cache.put("¿cómo está db?", builder.snapshot(context("done", 30)), "db está bien")
+    assert cache.get("¿y api?", builder.snapshot(context("done", 150))) is None
+    assert cache.get("¿cómo está db?", builder.snapshot(context("done", 600))) == "db está bien"
+    assert cache.invalidations == 0
+
+
+def test_status_change_invalidates_entries():
+    builder = ContextBuilder()
+    cache = ResponseCache(max_entries=10, path="")
+
+    cache.put("¿cómo está api?", builder.snapshot(context("done", 30)), "api está bien")
+    assert cache.get("¿cómo está api?", builder.snapshot(context("error", 30))) is None
+    assert cache.invalidations == 1
+    assert len(cache) == 0
+
+
+def test_resource_changes_invalidate_entries():
+    builder = ContextBuilder()
+    cache = ResponseCache(max_entries=10, path="")
+    busy = {**context("done", 30), "resources": {"c1": "web cpu 90% mem 1.5 GiB"}}
+    idle = {**context("done", 30), "resources": {"c1": "web cpu 2% mem 200 MiB"}}
+
+    assert builder.snapshot(busy) != builder.snapshot(context("done", 30))
+    cache.put("¿por qué va lenta api?", builder.snapshot(busy), "api está al 90% de CPU")
+    assert cache.get("¿por qué va lenta api?", builder.snapshot(busy)) == "api está al 90% de CPU"
+    assert cache.get("¿por qué va lenta api?", builder.snapshot(idle)) is None
+    assert cache.invalidations == 1
+
+
+def test_env_example_keeps_the_cache_in_memory():
+    values = dotenv_values(Path(__file__).resolve().parent.parent / ".env.example")
+    assert values["LLM_CACHE_PATH"] == ""
+    assert ResponseCache(path=values["LLM_CACHE_PATH"]).path == ""
@@ -0,0 +1,35 @@
+"""
+Tests de AdaptiveScheduler: cadencia por deadline sin deriva
+"""
+from src.monitor.scheduler import AdaptiveScheduler
+
+
+def test_next_check_is_based_on_deadline_not_on_work_end():
+    scheduler = AdaptiveScheduler(base_interval=60, min_interval=10)
+    scheduler.update("c1", "done", False, now=0.0)  # vence en 60
+
+    # El chequeo se despacha a tiempo pero el trabajo termina 7 s después
+    assert scheduler.pop_due(now=60.0) == ["c1"]
+    due = scheduler.update("c1", "done", False, now=67.0)
+
+    assert due == 120.0
+
+
+def test_missed_slots_are_skipped():
+    scheduler = AdaptiveScheduler(base_interval=60, min_interval=10)
+    scheduler.update("c1", "done", False, now=0.0)
+
+    # El loop estuvo bloqueado y se saltó varios turnos
+    assert scheduler.pop_due(now=200.0) == ["c1"]
+    due = scheduler.update("c1", "done", False, now=205.0)
+
+    assert due == 240.0
+
+
+def test_removed_compose_forgets_popped_deadline():
+    scheduler = AdaptiveScheduler(base_interval=60, min_interval=10)
+    scheduler.update("c1", "done", False, now=0.0)
+    scheduler.pop_due(now=60.0)
+    scheduler.remove("c1")
+
+    assert scheduler.update("c1", "done", False, now=500.0) == 560.0
@@ -0,0 +1,99 @@
+"""
+Tests de ServiceMonitor con un cliente de Dokploy falso
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from src.monitor.dispatcher import EventDispatcher, NotificationSink
+from src.monitor.service_monitor import ServiceMonitor
+
+
+def iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class FakeClient:
+    def __init__(self):
+        self.status = "done"
+        self.deployments = []
+        self.last_action = {}
+        self.deployment_calls = 0
+
+    async def get_all_composes(self, force_refresh: bool = False):
+        return [{
+            "composeId": "c1", "name": "api", "appName": "api-x",
+            "project_name": "prod", "composeStatus": self.status
+        }]
+
+    async def get_compose_deployments(self, compose_id: str):
+        self.deployment_calls += 1
+        return list(self.deployments)
+
+
+class Collector(NotificationSink):
+    name = "collector"
+
+    def __init__(self):
+        super().__init__()
+        self.received = []
+
+    async def send(self, event):
+        self.received.append(event)
+
+
+def make_monitor(client):
+    collector = Collector()
+    monitor = ServiceMonitor(client, dispatcher=EventDispatcher([collector]))
+    return monitor, collector
+
+
+def test_quick_deploy_without_status_change_is_reported():
+    async def scenario():
+        client = FakeClient()
+        monitor, collector = make_monitor(client)
+        await monitor.check_all_composes()  # línea base
+
+        # Deploy lanzado por el bot que vuelve a "done" antes del siguiente sweep
+        client.last_action["c1"] = time.time()
+        client.deployments = [{
+            "deploymentId": "d1", "status": "done", "title": "Manual",
+            "createdAt": iso(time.time() + 1)
+        }]
+        await monitor.check_all_composes()
+        await monitor.dispatcher.drain()
+        await monitor.dispatcher.stop()
+        return collector.received
+
+    events = asyncio.run(scenario())
+    assert [(e["event"], e["deployment_id"]) for e in events] == [("deployment", "d1")]
+
+
+def test_deployments_before_startup_are_not_reported():
+    async def scenario():
+        client = FakeClient()
+        client.deployments = [{
+            "deploymentId": "old", "status": "done", "createdAt": iso(time.time() - 3600)
+        }]
+        monitor, collector = make_monitor(client)
+        await monitor.check_all_composes()
+        client.status = "running"
+        await monitor.check_all_composes()
+        await monitor.dispatcher.drain()
+        await monitor.dispatcher.stop()
+        return collector.received
+
+    events = asyncio.run(scenario())
+    assert [e["event"] for e in events] == ["status_change"]
+
+
+def test_idle_compose_does_not_poll_deployments():
+    async def scenario():
+        client = FakeClient()
+        monitor, _ = make_monitor(client)
+        for _ in range(3):
+            await monitor.check_all_composes()
+        await monitor.dispatcher.stop()
+        return client.deployment_calls
+
+    assert asyncio.run(scenario()) == 0
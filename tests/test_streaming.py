@@ -0,0 +1,58 @@
+"""
+Tests de StreamingReply con mensajes de Telegram falsos
+"""
+import asyncio
+import time
+
+from src.bot.streaming import CURSOR, StreamingReply
+
+
+class FakeSent:
+    def __init__(self, edits):
+        self.edits = edits
+
+    async def edit_text(self, text):
+        self.edits.append((time.monotonic(), text))
+
+
+class FakeMessage:
+    def __init__(self):
+        self.edits = []
+
+    async def reply_text(self, text):
+        return FakeSent(self.edits)
+
+
+def test_first_chunk_is_shown_immediately():
+    async def scenario():
+        message = FakeMessage()
+        reply = StreamingReply(message, edit_interval=10)
+        await reply.start()
+        await reply.set_placeholder("⏳ En cola")
+        await reply.write("Hola")
+        edits = list(message.edits)
+        await reply.finish()
+        return reply, edits
+
+    reply, edits = asyncio.run(scenario())
+    assert edits[-1][1] == "Hola" + CURSOR
+    assert reply.time_to_first_token < 1
+
+
+def test_pending_text_is_flushed_when_the_interval_expires():
+    async def scenario():
+        message = FakeMessage()
+        reply = StreamingReply(message, edit_interval=0.2)
+        await reply.start()
+        await reply.write("Hola")
+        await reply.write(" mundo")
+        # El modelo se queda callado: el texto pendiente no espera al siguiente fragmento
+        await asyncio.sleep(0.4)
+        shown = message.edits[-1][1]
+        await reply.finish()
+        return shown, message.edits
+
+    shown, edits = asyncio.run(scenario())
+    assert shown == "Hola mundo" + CURSOR
+    assert edits[-1][1] == "Hola mundo"
+    assert edits[1][0] - edits[0][0] >= 0.2
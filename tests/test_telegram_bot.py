@@ -0,0 +1,65 @@
+"""
+Tests de la configuración del bot de Telegram
+"""
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from dotenv import dotenv_values
+
+from src.bot.telegram_bot import InfraGuardianBot, parse_chat_ids
+
+ENV_EXAMPLE = Path(__file__).resolve().parent.parent / ".env.example"
+
+
+def test_parse_chat_ids_skips_invalid_entries():
+    assert parse_chat_ids("123, -100200300,,abc, 45 ") == [123, -100200300, 45]
+    assert parse_chat_ids("") == []
+
+
+def test_env_example_alert_chat_ids_is_empty():
+    values = dotenv_values(ENV_EXAMPLE)
+    assert values["TELEGRAM_ALERT_CHAT_IDS"] == ""
+    assert parse_chat_ids(values["TELEGRAM_ALERT_CHAT_IDS"]) == []
+
+
+class FakeMessage:
+    def __init__(self):
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+class FakeAnalytics:
+    def __init__(self):
+        self.calls = 0
+
+    async def project_stats(self, since):
+        self.calls += 1
+        return {}
+
+    async def compose_stats(self, since):
+        self.calls += 1
+        return {}
+
+
+@pytest.mark.parametrize("arg", ["0", "-3", "nan", "inf", "91", "siete"])
+def test_uptime_rejects_out_of_range_windows(arg):
+    bot = SimpleNamespace(analytics=FakeAnalytics())
+    update = SimpleNamespace(message=FakeMessage())
+
+    asyncio.run(InfraGuardianBot.uptime(bot, update, SimpleNamespace(args=[arg])))
+
+    assert bot.analytics.calls == 0
+    assert update.message.replies[0].startswith("❌ Uso: /uptime")
+
+
+def test_uptime_accepts_fractional_days():
+    bot = SimpleNamespace(analytics=FakeAnalytics())
+    update = SimpleNamespace(message=FakeMessage())
+
+    asyncio.run(InfraGuardianBot.uptime(bot, update, SimpleNamespace(args=["0.5"])))
+
+    assert bot.analytics.calls == 2
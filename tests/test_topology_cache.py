@@ -0,0 +1,55 @@
+"""
+Tests de TopologyCache: single-flight e invalidación durante una carga
+"""
+import asyncio
+
+from src.integrations.topology_cache import TopologyCache
+
+
+def test_concurrent_reads_share_one_load():
+    async def scenario():
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return [calls]
+
+        cache = TopologyCache(loader, ttl=10)
+        results = await asyncio.gather(*(cache.get() for _ in range(10)))
+        return calls, results
+
+    calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert all(r == [1] for r in results)
+
+
+def test_invalidate_discards_load_started_before_write():
+    async def scenario():
+        state = {"value": "antes"}
+        release = asyncio.Event()
+
+        async def loader():
+            value = state["value"]
+            await release.wait()
+            return value
+
+        cache = TopologyCache(loader, ttl=10)
+        stale_read = asyncio.create_task(cache.get())
+        await asyncio.sleep(0)
+
+        # Escritura mientras la carga anterior sigue en vuelo
+        state["value"] = "después"
+        cache.invalidate()
+        fresh_read = asyncio.create_task(cache.get())
+        await asyncio.sleep(0)
+
+        release.set()
+        await asyncio.gather(stale_read, fresh_read)
+        return fresh_read.result(), await cache.get(), cache.upstream_calls
+
+    fresh, cached, calls = asyncio.run(scenario())
+    assert fresh == "después"
+    assert cached == "después"
+    assert calls == 2